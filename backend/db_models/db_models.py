@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, LargeBinary, UniqueConstraint
 from datetime import datetime
 from backend.database import Base
 from uuid import uuid4
@@ -6,16 +6,75 @@ from uuid import uuid4
 
 class ErrorLog(Base):
     __tablename__ = "error_logs"
+    # Match the project listing filters, each ending in the (created_timestamp, id) pagination key
+    __table_args__ = (
+        Index("ix_error_logs_project_created", "project_id", "created_timestamp", "id"),
+        Index("ix_error_logs_project_status_created", "project_id", "status", "created_timestamp", "id"),
+        Index("ix_error_logs_project_type_created", "project_id", "error_type", "created_timestamp", "id"),
+        Index("ix_error_logs_project_source_created", "project_id", "source", "created_timestamp", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"))
     log_id = Column(String, unique=True, default=lambda: str(uuid4())) # Short UUID string
     created_timestamp = Column(DateTime, default=datetime.now) # UTC timezone
-    status = Column(String, default="pending") # "pending", "resolved", "ignored"
+    status = Column(String, default="pending") # "queued", "pending", "parse_failed", "resolved", "ignored"
     error_type = Column(String) # The type of error
     error_message = Column(String) # The message of the error
     source = Column(String) # The source file of the error
     line_number = Column(Integer) # The line number of the error
-    traceback = Column(String) # The traceback of the error
+    traceback = Column(String) # The traceback of the error, the raw input while queued
+    group_id = Column(Integer, ForeignKey("error_groups.id"), index=True) # The issue this report is a sample of
+
+
+# Durable queue of error logs waiting to be parsed by the background workers
+class ErrorLogIngestJob(Base):
+    __tablename__ = "error_log_ingest_queue"
+    id = Column(Integer, primary_key=True, index=True)
+    error_log_id = Column(Integer, ForeignKey("error_logs.id", ondelete="CASCADE"), unique=True)
+    enqueued_at = Column(DateTime, default=datetime.now) # UTC timezone
+    locked_at = Column(DateTime, index=True) # Set while a worker is parsing it
+    attempts = Column(Integer, default=0)
+    last_error = Column(String)
+
+
+class ErrorGroup(Base):
+    __tablename__ = "error_groups"
+    __table_args__ = (UniqueConstraint("project_id", "fingerprint"),)
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"))
+    fingerprint = Column(String) # sha256 of the normalized traceback
+    status = Column(String, default="pending") # "pending", "resolved", "ignored"
+    error_type = Column(String) # The type of error
+    error_message = Column(String) # The message of the first report
+    source = Column(String) # The source file of the error
+    line_number = Column(Integer) # The line number of the error
+    first_seen = Column(DateTime, default=datetime.now) # UTC timezone
+    last_seen = Column(DateTime, default=datetime.now) # UTC timezone
+    occurrence_count = Column(Integer, default=0) # Every report, including the ones no longer kept as samples
+
+
+# Error log counts per project, hour and (error_type, source, status), kept up to date on every report, status change and delete
+# Grouped reports are counted under their group's error_type, source and status, including the samples pruned since
+class ErrorLogRollup(Base):
+    __tablename__ = "error_log_rollups"
+    __table_args__ = (UniqueConstraint("project_id", "bucket", "error_type", "source", "status"),)
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"))
+    bucket = Column(DateTime) # Start of the hour the error logs were created in
+    error_type = Column(String, default="") # "" while unknown, so the unique constraint holds
+    source = Column(String, default="")
+    status = Column(String, default="")
+    count = Column(Integer, default=0)
+
+
+# Reports per group and hour, kept when the samples are pruned, the rollups of grouped error logs are rebuilt from these
+class ErrorGroupBucket(Base):
+    __tablename__ = "error_group_buckets"
+    __table_args__ = (UniqueConstraint("group_id", "bucket"),)
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("error_groups.id"))
+    bucket = Column(DateTime) # Start of the hour the reports came in
+    count = Column(Integer, default=0)
 
 
 class Project(Base):
@@ -26,3 +85,25 @@ class Project(Base):
     project_description = Column(String)
     project_created_at = Column(DateTime, default=datetime.now) # UTC timezone
     project_updated_at = Column(DateTime, default=datetime.now) # UTC timezone
+
+
+class ErrorLogParseCache(Base):
+    __tablename__ = "error_log_parse_cache"
+    id = Column(Integer, primary_key=True, index=True)
+    fingerprint = Column(String, unique=True, index=True) # sha256 of the normalized traceback
+    created_timestamp = Column(DateTime, default=datetime.now) # UTC timezone
+    error_type = Column(String) # The type of error
+    error_message = Column(String) # The message of the error
+    source = Column(String) # The source file of the error
+    line_number = Column(Integer) # The line number of the error
+    traceback = Column(String) # The traceback of the error
+
+
+class EmbeddingCache(Base):
+    __tablename__ = "embedding_cache"
+    __table_args__ = (UniqueConstraint("model", "text_hash"),)
+    id = Column(Integer, primary_key=True, index=True)
+    model = Column(String) # The embedding model that produced the vector
+    text_hash = Column(String) # sha256 of the embedded text
+    embedding = Column(LargeBinary) # float32 array
+    created_timestamp = Column(DateTime, default=datetime.now) # UTC timezone
@@ -0,0 +1,83 @@
+"""
+Parses uploaded files into chunks, one part of a file at a time.
+These functions run in worker processes, so this module only imports what parsing needs.
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import os
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+TEXT_PART_SIZE = int(os.getenv("DOCUMENT_TEXT_PART_SIZE", str(4 * 1024 * 1024))) # Bytes of a text file parsed per task
+PDF_PART_PAGES = int(os.getenv("DOCUMENT_PDF_PART_PAGES", "20")) # Pages of a PDF parsed per task
+
+# Files parsed as plain text, anything else that isn't a PDF goes through Unstructured
+TEXT_SUFFIXES = {"", ".txt", ".log", ".md", ".rst", ".json", ".jsonl", ".ndjson", ".csv", ".tsv", ".yaml", ".yml", ".xml", ".html", ".py", ".out", ".err"}
+
+TEXT_SPLITTER = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+Chunk = Tuple[str, Dict[str, Any]] # text and metadata, plain values so they pickle cheaply
+
+
+def file_kind(filename: str) -> str:
+    suffix = Path(filename).suffix.lower()
+    if suffix == ".pdf":
+        return "pdf"
+    if suffix in TEXT_SUFFIXES:
+        return "text"
+    return "unstructured"
+
+
+def count_file_parts(path: str, filename: str) -> int:
+    kind = file_kind(filename)
+    if kind == "text":
+        return max(1, -(-os.path.getsize(path) // TEXT_PART_SIZE))
+    if kind == "pdf":
+        from pypdf import PdfReader
+        return max(1, -(-len(PdfReader(path).pages) // PDF_PART_PAGES))
+    # Unstructured can't parse part of a file
+    return 1
+
+
+def read_text_part(path: str, part: int) -> str:
+    # parts are cut at line breaks: a part skips the partial line it starts in and finishes the one it ends in
+    start, end = part * TEXT_PART_SIZE, (part + 1) * TEXT_PART_SIZE
+    with open(path, "rb") as file:
+        if start:
+            file.seek(start - 1)
+            file.readline()
+        if file.tell() >= end:
+            return ""
+        data = file.read(end - file.tell())
+        if data and not data.endswith(b"\n"):
+            data += file.readline()
+    return data.decode("utf-8", errors="replace")
+
+
+def parse_file_part(path: str, filename: str, part: int) -> List[Chunk]:
+    """
+    Parses and splits one part of a file. Returns the chunks with the filename and where in the file they came from.
+    """
+    kind = file_kind(filename)
+    if kind == "text":
+        pages = [(read_text_part(path, part), {"part": part})]
+    elif kind == "pdf":
+        from pypdf import PdfReader
+        reader = PdfReader(path)
+        first_page = part * PDF_PART_PAGES
+        pages = [
+            (reader.pages[page].extract_text() or "", {"page": page + 1})
+            for page in range(first_page, min(first_page + PDF_PART_PAGES, len(reader.pages)))
+        ]
+    else:
+        from langchain_community.document_loaders import UnstructuredFileLoader
+        pages = [(doc.page_content, {}) for doc in UnstructuredFileLoader(path).lazy_load()]
+
+    chunks = []
+    for text, location in pages:
+        for chunk in TEXT_SPLITTER.split_text(text):
+            chunks.append((chunk, {"source": filename, **location}))
+    return chunks
@@ -0,0 +1,114 @@
+from typing import Optional
+import hashlib
+import re
+
+from backend.helpers.traceback_parser import FRAME_PATTERN, TRACEBACK_HEADER, parse_python_traceback
+from backend.pydantic_models.error_models import ErrorLogBase
+
+
+# Values that change between reports of the same error
+ADDRESS_PATTERN = re.compile(r"0x[0-9a-fA-F]+")
+UUID_PATTERN = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+NUMBER_PATTERN = re.compile(r"\d+")
+TMP_PATH_PATTERN = re.compile(r"(?:/private)?(?:/tmp|/var/tmp|/var/folders)/(?:[^\s\"'/]+/)*|[A-Za-z]:\\[^\s\"']*\\Temp\\(?:[^\s\"'\\]+\\)*", re.IGNORECASE)
+# Everything up to site-packages depends on the host's interpreter or virtualenv location
+PACKAGES_PATH_PATTERN = re.compile(r"^.*[\\/](site-packages|dist-packages)[\\/]")
+
+# Exception names when the traceback isn't a standard CPython one
+EXCEPTION_NAME_PATTERN = re.compile(r"\b([A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt|Warning))\b")
+
+
+# What the placeholders of normalize_text stand for, to find a normalized text in another report
+PLACEHOLDER_PATTERNS = {
+    "<tmp>/": f"(?i:{TMP_PATH_PATTERN.pattern})",
+    "<uuid>": UUID_PATTERN.pattern,
+    "<address>": ADDRESS_PATTERN.pattern,
+    "<n>": NUMBER_PATTERN.pattern,
+}
+PLACEHOLDER_SPLIT_PATTERN = re.compile("(" + "|".join(re.escape(placeholder) for placeholder in PLACEHOLDER_PATTERNS) + ")")
+# After the source of a frame, "File "app.py", line 3" or "app.py:3"
+LINE_NUMBER_SUFFIX = r'(?:", line |, line |:)(\d+)'
+
+
+def normalize_text(text: str) -> str:
+    text = TMP_PATH_PATTERN.sub("<tmp>/", text)
+    text = UUID_PATTERN.sub("<uuid>", text)
+    text = ADDRESS_PATTERN.sub("<address>", text)
+    text = NUMBER_PATTERN.sub("<n>", text)
+    return " ".join(text.split())
+
+
+def normalize_path(path: str) -> str:
+    path = TMP_PATH_PATTERN.sub("<tmp>/", path)
+    return PACKAGES_PATH_PATTERN.sub(r"\1/", path).replace("\\", "/")
+
+
+def fingerprint_traceback(text: str) -> str:
+    """
+    Builds a stable fingerprint for a raw traceback from the exception type and its normalized frames.
+    Line numbers, memory addresses and temporary paths are left out so repeat reports of the same error match.
+    Of a chained traceback only the last one counts, the exception that was raised, so the traceback stored for a report
+    fingerprints the same as the report itself. Text without any Python frames is fingerprinted from its normalized content instead.
+    """
+    parsed = parse_python_traceback(text)
+    frames = []
+    for line in (text[text.rfind(TRACEBACK_HEADER):] if parsed else text).splitlines():
+        match = FRAME_PATTERN.match(line)
+        if match:
+            frames.append(f"{normalize_path(match.group('source'))}:{match.group('function') or ''}")
+
+    if parsed:
+        error_type = parsed.error_type
+    else:
+        names = EXCEPTION_NAME_PATTERN.findall(text)
+        error_type = names[-1] if names else ""
+
+    if frames:
+        key = "\n".join([error_type] + frames)
+    else:
+        key = f"{error_type}\n{normalize_text(text)}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def template_pattern(text: str) -> str:
+    # a regex for the text with the values normalize_text leaves out free to differ
+    parts = PLACEHOLDER_SPLIT_PATTERN.split(normalize_text(text))
+    return "".join(
+        PLACEHOLDER_PATTERNS[part] if part in PLACEHOLDER_PATTERNS else r"\s+".join(re.escape(word) for word in part.split(" "))
+        for part in parts
+    )
+
+
+def last_match(pattern: str, text: str) -> Optional[re.Match]:
+    # the innermost exception and frame come last
+    matches = list(re.finditer(pattern, text))
+    return matches[-1] if matches else None
+
+
+def rebase_cached_error_log(cached: ErrorLogBase, text: str) -> Optional[ErrorLogBase]:
+    """
+    Reuses a cached parse for another report with the same fingerprint. The error type and source come from the cache,
+    the message, line number and path of the source are taken from the new report, where the cached ones appear with other values.
+    Returns None when they can't be found in the new report, it has to be parsed again.
+    """
+    error_message = cached.error_message
+    if error_message:
+        match = last_match(template_pattern(error_message), text)
+        if not match:
+            return None
+        error_message = match.group(0)
+
+    source, line_number = cached.source, cached.line_number
+    if line_number is not None:
+        if not source:
+            return None
+        frames = [match for match in map(FRAME_PATTERN.match, text.splitlines()) if match and normalize_path(match.group("source")) == normalize_path(source)]
+        if frames:
+            source, line_number = frames[-1].group("source"), int(frames[-1].group("line_number"))
+        else:
+            match = last_match(f"({template_pattern(source)}){LINE_NUMBER_SUFFIX}", text)
+            if not match:
+                return None
+            source, line_number = match.group(1), int(match.group(2))
+
+    return cached.model_copy(update={"error_message": error_message, "source": source, "line_number": line_number, "traceback": text})
@@ -1,10 +1,12 @@
 from langgraph.graph.state import CompiledStateGraph
-from IPython.display import Image
-import PIL.Image
 from io import BytesIO
 
 
 def save_langgraph_graph(path: str, graph: CompiledStateGraph) -> None:
+    # only used by scripts.render_graphs, draw_mermaid_png renders through mermaid.ink
+    from IPython.display import Image
+    import PIL.Image
+
     mermaid = graph.get_graph().draw_mermaid_png()
     buffer = BytesIO(Image(mermaid).data)
     img = PIL.Image.open(buffer)
@@ -1,9 +1,19 @@
 from langchain_core.tools import tool
 from datetime import datetime
-from backend.database import get_db
-from backend.db_models.db_models import Project
+from sqlalchemy import func, literal, select, tuple_, union_all
+from backend.db_models.db_models import ErrorGroup, ErrorGroupBucket, ErrorLog, Project
+from backend.helpers.pagination import decode_cursor, encode_cursor
+from backend.pydantic_models.error_models import ErrorLogFilterBase
 from backend.pydantic_models.project_models import ProjectResponse, ProjectCreate, ProjectUpdate
-from typing import List, Any
+from backend.services.error_log_queries import filter_error_logs
+from backend.services.tool_runtime import tool_session
+from typing import List, Any, Literal
+import os
+
+
+# The query tools answer in the database so only their results reach the prompt, these keep the results small
+LANG_TOOLS_MAX_ROWS = int(os.getenv("LANG_TOOLS_MAX_ROWS", "25")) # Rows or groups a query tool returns at most, rows continue with the cursor
+LANG_TOOLS_MAX_TEXT = 200 # Characters kept of long text columns, e.g. descriptions and error messages
 
 
 @tool
@@ -47,9 +57,9 @@ def get_projects():
     Parameters: None
     Returns: List[ProjectResponse]
     """
-    db = next(get_db())
-    projects = db.query(Project).all()
-    return [ProjectResponse.model_validate(project) for project in projects]
+    with tool_session() as db:
+        projects = db.query(Project).all()
+        return [ProjectResponse.model_validate(project) for project in projects]
 
 @tool
 def get_project(project_id: int = None, project_uuid: str = None):
@@ -60,14 +70,14 @@ def get_project(project_id: int = None, project_uuid: str = None):
     Parameters: project_id: int = None, project_uuid: str = None
     Returns: ProjectResponse
     """
-    db = next(get_db())
-    if project_id:
-        project = db.query(Project).filter(Project.id == project_id).first()
-    elif project_uuid:
-        project = db.query(Project).filter(Project.project_uuid == project_uuid).first()
-    else:
-        return "No project id or uuid provided"
-    return ProjectResponse.model_validate(project)
+    with tool_session() as db:
+        if project_id:
+            project = db.query(Project).filter(Project.id == project_id).first()
+        elif project_uuid:
+            project = db.query(Project).filter(Project.project_uuid == project_uuid).first()
+        else:
+            return "No project id or uuid provided"
+        return ProjectResponse.model_validate(project)
 
 @tool
 def create_project(project_name: str, project_description: str):
@@ -78,12 +88,12 @@ def create_project(project_name: str, project_description: str):
     Parameters: project_name: str, project_description: str
     Returns: ProjectResponse
     """
-    db = next(get_db())
-    new_project = Project(project_name=project_name, project_description=project_description)
-    db.add(new_project)
-    db.commit()
-    db.refresh(new_project)
-    return ProjectResponse.model_validate(new_project)
+    with tool_session() as db:
+        new_project = Project(project_name=project_name, project_description=project_description)
+        db.add(new_project)
+        db.commit()
+        db.refresh(new_project)
+        return ProjectResponse.model_validate(new_project)
 
 @tool
 def update_project(project_id: int = None, project_uuid: str = None, project_name: str = None, project_description: str = None):
@@ -94,26 +104,28 @@ def update_project(project_id: int = None, project_uuid: str = None, project_nam
     Parameters: project_id: int = None, project_uuid: str = None, project_name: str = None, project_description: str = None
     Returns: ProjectResponse
     """
-    db = next(get_db())
-    if project_id:
-        project = db.query(Project).filter(Project.id == project_id).first()
-        if not project:
-            return f"Project with id {project_id} not found"
-    elif project_uuid:
-        project = db.query(Project).filter(Project.project_uuid == project_uuid).first()
-        if not project:
-            return f"Project with uuid {project_uuid} not found"
-    else:
-        return "No project id or uuid provided"
-    
-    for key, value in project.model_dump(exclude_unset=True).items():
-        setattr(project, key, value)
-
-    project.project_updated_at = datetime.now()
-
-    db.commit()
-    db.refresh(project)
-    return ProjectResponse.model_validate(project)
+    with tool_session() as db:
+        if project_id:
+            project = db.query(Project).filter(Project.id == project_id).first()
+            if not project:
+                return f"Project with id {project_id} not found"
+        elif project_uuid:
+            project = db.query(Project).filter(Project.project_uuid == project_uuid).first()
+            if not project:
+                return f"Project with uuid {project_uuid} not found"
+        else:
+            return "No project id or uuid provided"
+
+        # only the fields that were given
+        update = ProjectUpdate(project_name=project_name, project_description=project_description)
+        for key, value in update.model_dump(exclude_none=True).items():
+            setattr(project, key, value)
+
+        project.project_updated_at = datetime.now()
+
+        db.commit()
+        db.refresh(project)
+        return ProjectResponse.model_validate(project)
 
 @tool
 def delete_projects(project_ids: List[int] = None, project_uuids: List[str] = None):
@@ -124,15 +136,207 @@ def delete_projects(project_ids: List[int] = None, project_uuids: List[str] = No
     Parameters: project_ids: List[int] = None, project_uuids: List[str] = None
     Returns: List[ProjectResponse]
     """
-    db = next(get_db())
-    if project_ids:
-        projects = db.query(Project).filter(Project.id.in_(project_ids)).all()
-    elif project_uuids:
-        projects = db.query(Project).filter(Project.project_uuid.in_(project_uuids)).all()
-    else:
-        return "No project ids or uuids provided"
-    for project in projects:
-        db.delete(project)
-    db.commit()
-    return [ProjectResponse.model_validate(project) for project in projects]
+    with tool_session() as db:
+        if project_ids:
+            projects = db.query(Project).filter(Project.id.in_(project_ids)).all()
+        elif project_uuids:
+            projects = db.query(Project).filter(Project.project_uuid.in_(project_uuids)).all()
+        else:
+            return "No project ids or uuids provided"
+        deleted = [ProjectResponse.model_validate(project) for project in projects]
+        for project in projects:
+            db.delete(project)
+        db.commit()
+        return deleted
+
+
+
+def _limit(limit: int) -> int:
+    return max(1, min(limit or LANG_TOOLS_MAX_ROWS, LANG_TOOLS_MAX_ROWS))
+
+
+def _text(value: str) -> str:
+    if value and len(value) > LANG_TOOLS_MAX_TEXT:
+        return value[:LANG_TOOLS_MAX_TEXT] + "..."
+    return value
+
+
+def _filter_projects(query, name_contains: str = None, description_contains: str = None, created_after: datetime = None, created_before: datetime = None):
+    if name_contains:
+        query = query.filter(Project.project_name.icontains(name_contains, autoescape=True))
+    if description_contains:
+        query = query.filter(Project.project_description.icontains(description_contains, autoescape=True))
+    if created_after:
+        query = query.filter(Project.project_created_at >= created_after)
+    if created_before:
+        query = query.filter(Project.project_created_at < created_before)
+    return query
+
+
+def _filter_error_logs(query, project_id: int = None, status: str = None, error_type: str = None, source: str = None, message_contains: str = None, created_after: datetime = None, created_before: datetime = None):
+    filters = ErrorLogFilterBase(status=status, error_type=error_type, source=source, created_after=created_after, created_before=created_before)
+    query = filter_error_logs(query, filters)
+    if project_id:
+        query = query.filter(ErrorLog.project_id == project_id)
+    if message_contains:
+        query = query.filter(ErrorLog.error_message.icontains(message_contains, autoescape=True))
+    return query
+
+
+def _reports(project_id: int = None, status: str = None, error_type: str = None, source: str = None, message_contains: str = None, created_after: datetime = None, created_before: datetime = None):
+    """
+    Every error log report that matches, with a count column to sum: the reports of each error group per hour, including the ones
+    no longer kept as samples, matched on the group's status, type, source and first message, and the error logs that aren't in a group.
+    """
+    grouped = select(
+        ErrorGroup.project_id, ErrorGroup.status, ErrorGroup.error_type, ErrorGroup.source,
+        ErrorGroupBucket.count.label("count"),
+    ).join(ErrorGroupBucket, ErrorGroupBucket.group_id == ErrorGroup.id)
+    ungrouped = select(
+        ErrorLog.project_id, ErrorLog.status, ErrorLog.error_type, ErrorLog.source,
+        literal(1).label("count"),
+    ).filter(ErrorLog.group_id.is_(None))
+
+    parts = []
+    for query, model, created_column in ((grouped, ErrorGroup, ErrorGroupBucket.bucket), (ungrouped, ErrorLog, ErrorLog.created_timestamp)):
+        if project_id:
+            query = query.filter(model.project_id == project_id)
+        if status:
+            query = query.filter(model.status == status)
+        if error_type:
+            query = query.filter(model.error_type == error_type)
+        if source:
+            query = query.filter(model.source == source)
+        if message_contains:
+            query = query.filter(model.error_message.icontains(message_contains, autoescape=True))
+        if created_after:
+            query = query.filter(created_column >= created_after)
+        if created_before:
+            query = query.filter(created_column < created_before)
+        parts.append(query)
+    return union_all(*parts).subquery()
+
+
+def _page(db, query, created_column, id_column, limit: int, cursor: str = None) -> tuple[list, str]:
+    # newest first, continuing after the cursor's (created, id) like the error log listing
+    if cursor:
+        query = query.filter(tuple_(created_column, id_column) < tuple_(*decode_cursor(cursor)))
+    rows = db.scalars(query.order_by(created_column.desc(), id_column.desc()).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(getattr(rows[-1], created_column.key), rows[-1].id)
+    return rows, next_cursor
+
+@tool
+def query_projects(name_contains: str = None, description_contains: str = None, created_after: datetime = None, created_before: datetime = None, limit: int = 10, cursor: str = None):
+    """
+    Find projects in the database, filtered by text in their name or description (case insensitive) and by when they were created.
+    Returns up to limit projects, newest first, and a next_cursor to pass back as cursor for the next page (null on the last page).
+    Use count_projects to count them instead.
+
+    Parameters: name_contains: str = None, description_contains: str = None, created_after: datetime = None, created_before: datetime = None, limit: int = 10, cursor: str = None
+    Returns: {"rows": List[dict], "next_cursor": str}
+    """
+    with tool_session() as db:
+        query = _filter_projects(select(Project), name_contains, description_contains, created_after, created_before)
+        projects, next_cursor = _page(db, query, Project.project_created_at, Project.id, _limit(limit), cursor)
+        rows = [
+            {
+                "id": project.id,
+                "project_uuid": project.project_uuid,
+                "project_name": project.project_name,
+                "project_description": _text(project.project_description),
+                "project_created_at": project.project_created_at.isoformat(),
+            }
+            for project in projects
+        ]
+        return {"rows": rows, "next_cursor": next_cursor}
+
+@tool
+def count_projects(name_contains: str = None, description_contains: str = None, created_after: datetime = None, created_before: datetime = None):
+    """
+    Count the projects in the database, filtered by text in their name or description (case insensitive) and by when they were created.
+    Returns the number of matching projects.
+
+    Parameters: name_contains: str = None, description_contains: str = None, created_after: datetime = None, created_before: datetime = None
+    Returns: int
+    """
+    with tool_session() as db:
+        query = _filter_projects(select(func.count()).select_from(Project), name_contains, description_contains, created_after, created_before)
+        return db.scalar(query)
+
+@tool
+def query_error_logs(project_id: int = None, status: str = None, error_type: str = None, source: str = None, message_contains: str = None, created_after: datetime = None, created_before: datetime = None, limit: int = 10, cursor: str = None):
+    """
+    Find error logs in the database, filtered by project id, status ("queued", "pending", "parse_failed", "resolved", "ignored"), error type, source file,
+    text in the error message (case insensitive) and by when they were created. Tracebacks are left out.
+    Returns up to limit error logs, newest first, and a next_cursor to pass back as cursor for the next page (null on the last page).
+    Only the latest reports of each issue are kept, use count_error_logs or group_error_logs to count them instead.
+
+    Parameters: project_id: int = None, status: str = None, error_type: str = None, source: str = None, message_contains: str = None, created_after: datetime = None, created_before: datetime = None, limit: int = 10, cursor: str = None
+    Returns: {"rows": List[dict], "next_cursor": str}
+    """
+    with tool_session() as db:
+        query = _filter_error_logs(select(ErrorLog), project_id, status, error_type, source, message_contains, created_after, created_before)
+        error_logs, next_cursor = _page(db, query, ErrorLog.created_timestamp, ErrorLog.id, _limit(limit), cursor)
+        rows = [
+            {
+                "id": error_log.id,
+                "project_id": error_log.project_id,
+                "created_timestamp": error_log.created_timestamp.isoformat(),
+                "status": error_log.status,
+                "error_type": error_log.error_type,
+                "error_message": _text(error_log.error_message),
+                "source": error_log.source,
+                "line_number": error_log.line_number,
+            }
+            for error_log in error_logs
+        ]
+        return {"rows": rows, "next_cursor": next_cursor}
+
+@tool
+def count_error_logs(project_id: int = None, status: str = None, error_type: str = None, source: str = None, message_contains: str = None, created_after: datetime = None, created_before: datetime = None):
+    """
+    Count the error reports in the database, filtered by project id, status, error type, source file, text in the error message (case insensitive) and by when they were created.
+    Every report is counted, also the repeats of an issue that query_error_logs no longer lists. Repeats are matched on their issue's status, type, source and first message,
+    and on the hour they came in.
+    Returns the number of matching reports.
+
+    Parameters: project_id: int = None, status: str = None, error_type: str = None, source: str = None, message_contains: str = None, created_after: datetime = None, created_before: datetime = None
+    Returns: int
+    """
+    with tool_session() as db:
+        reports = _reports(project_id, status, error_type, source, message_contains, created_after, created_before)
+        return db.scalar(select(func.coalesce(func.sum(reports.c.count), 0)))
+
+@tool
+def group_error_logs(group_by: Literal["error_type", "source", "status", "project_id"], project_id: int = None, status: str = None, error_type: str = None, source: str = None, message_contains: str = None, created_after: datetime = None, created_before: datetime = None, top: int = 10):
+    """
+    Count the error reports in the database per error type, source file, status or project, most common first, with the same filters as count_error_logs.
+    Like count_error_logs, every report is counted, also the repeats of an issue that query_error_logs no longer lists.
+    Use it for questions like "which error happens most" or "which projects have the most errors".
+    Returns the top groups with their counts, and the number of groups and reports left out of the top.
+
+    Parameters: group_by: "error_type" | "source" | "status" | "project_id", project_id: int = None, status: str = None, error_type: str = None, source: str = None, message_contains: str = None, created_after: datetime = None, created_before: datetime = None, top: int = 10
+    Returns: {"groups": List[{"value", "count"}], "other_groups": int, "other_count": int}
+    """
+    with tool_session() as db:
+        reports = _reports(project_id, status, error_type, source, message_contains, created_after, created_before)
+        column = reports.c[group_by]
+        total = func.sum(reports.c.count)
+        # buckets of deleted reports can be down to 0
+        counts = select(column, total.label("count")).group_by(column).having(total > 0).subquery()
+        top_groups = db.execute(select(counts).order_by(counts.c.count.desc(), counts.c[group_by]).limit(_limit(top))).all()
+        total_groups, total_count = db.execute(select(func.count(), func.coalesce(func.sum(counts.c.count), 0))).one()
 
+        groups = [{"value": value, "count": count} for value, count in top_groups]
+        if group_by == "project_id":
+            names = dict(db.execute(select(Project.id, Project.project_name).filter(Project.id.in_([group["value"] for group in groups]))).all())
+            for group in groups:
+                group["project_name"] = names.get(group["value"])
+        return {
+            "groups": groups,
+            "other_groups": total_groups - len(groups),
+            "other_count": total_count - sum(group["count"] for group in groups),
+        }
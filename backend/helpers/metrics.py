@@ -0,0 +1,18 @@
+from collections import Counter
+from threading import Lock
+from typing import Dict
+
+
+# Process-wide counters, e.g. how many error logs bypassed the LLM
+_counters = Counter()
+_lock = Lock()
+
+
+def increment(name: str, amount: int = 1) -> None:
+    with _lock:
+        _counters[name] += amount
+
+
+def get_counters(prefix: str = "") -> Dict[str, int]:
+    with _lock:
+        return {name: value for name, value in sorted(_counters.items()) if name.startswith(prefix)}
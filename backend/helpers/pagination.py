@@ -0,0 +1,19 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import Tuple
+
+
+# Cursors are the (created_timestamp, id) of the last row on a page, opaque to the client
+def encode_cursor(created_timestamp: datetime, id: int) -> str:
+    return urlsafe_b64encode(f"{created_timestamp.isoformat()}|{id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Raises ValueError if the cursor wasn't created by encode_cursor.
+    """
+    try:
+        created_timestamp, id = urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_timestamp), int(id)
+    except (UnicodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor '{cursor}'") from e
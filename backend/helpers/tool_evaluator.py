@@ -0,0 +1,88 @@
+import json
+import re
+from typing import Any, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from backend.pydantic_models.langgraph_models import EvaluationSchema
+
+
+# What the tools return when they worked, besides JSON objects, as ToolNode puts it in the ToolMessage
+# [ProjectResponse(project_name='a', ...), ...]
+MODEL_LIST_PATTERN = re.compile(r"^\[\w+\(\w+=")
+# project_name='a' project_description='b' ...
+MODEL_PATTERN = re.compile(r"^\w+=\S")
+# count
+NUMBER_PATTERN = re.compile(r"^-?\d+(\.\d+)?$")
+# get_current_date_time
+DATE_TIME_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$")
+
+# Sent back to the toolbox when the plan has tools left to call, only once per run
+REMAINING_STEPS_FEEDBACK = "The plan isn't finished, it still calls"
+
+
+def _payload_shape(message: ToolMessage) -> str:
+    """
+    Returns "empty" for results without data, "data" for the shapes above and "unknown" for anything else,
+    e.g. the messages the tools return instead of raising ("No project id or uuid provided").
+    """
+    content: Any = message.content
+    if isinstance(content, list):
+        return "empty" if not content else "unknown"
+    content = content.strip()
+    if content in ("", "[]", "null"):
+        return "empty"
+    # the query tools' {"rows": [...], "next_cursor": ...} and {"groups": [...], ...}
+    if content.startswith("{"):
+        try:
+            payload = json.loads(content)
+        except ValueError:
+            return "unknown"
+        lists = [value for value in payload.values() if isinstance(value, list)]
+        if not lists:
+            return "unknown"
+        return "data" if any(lists) else "empty"
+    for pattern in (MODEL_LIST_PATTERN, MODEL_PATTERN, NUMBER_PATTERN, DATE_TIME_PATTERN):
+        if pattern.match(content):
+            return "data"
+    return "unknown"
+
+
+def _plan_calls(plan: str, name: str) -> bool:
+    # plain words like "count" are only the tool when the plan says so, e.g. "the count tool" or "count(...)"
+    if "_" in name:
+        return re.search(rf"\b{re.escape(name)}\b", plan) is not None
+    return re.search(rf"`{re.escape(name)}`|\b{re.escape(name)}(\(| tool\b)", plan) is not None
+
+
+def evaluate_tool_messages(messages: List[Any], plan: str, tool_names: List[str]) -> Optional[EvaluationSchema]:
+    """
+    Evaluates the last round of tool calls without the LLM when the outcome is clear from the tools' results:
+    - all of them returned data and every tool the plan names was called -> exit, success
+    - all of them returned data but the plan names tools not called yet -> back to the toolbox
+    - all of them returned nothing -> exit, not enough data to go on
+    Returns None when it's not clear, errors and messages from the tools are left to the LLM.
+    """
+    last_round = []
+    for message in reversed(messages):
+        if isinstance(message, AIMessage) and message.tool_calls:
+            break
+        if isinstance(message, ToolMessage):
+            last_round.append(message)
+    if not last_round or any(message.status == "error" for message in last_round):
+        return None
+
+    shapes = {_payload_shape(message) for message in last_round}
+    if shapes == {"empty"}:
+        return EvaluationSchema(exit=True, success=False, response="")
+    if shapes != {"data"}:
+        return None
+
+    called = {tool_call["name"] for message in messages if isinstance(message, AIMessage) for tool_call in message.tool_calls}
+    remaining = [name for name in tool_names if name not in called and _plan_calls(plan or "", name)]
+    if not remaining:
+        return EvaluationSchema(exit=True, success=True, response="")
+    # a plan can name tools it only needs sometimes, the second time around the LLM decides
+    if any(isinstance(message, HumanMessage) and str(message.content).startswith(REMAINING_STEPS_FEEDBACK) for message in messages):
+        return None
+    return EvaluationSchema(exit=False, success=False, response=f"{REMAINING_STEPS_FEEDBACK} {', '.join(remaining)}. Continue with the next step using the results above.")
@@ -0,0 +1,82 @@
+import re
+from typing import List, Optional, Tuple
+
+from backend.pydantic_models.error_models import ErrorLogBase
+
+
+TRACEBACK_HEADER = "Traceback (most recent call last):"
+
+# File "path/to/file.py", line 12, in function_name
+# SyntaxErrors omit the ", in function_name" part
+FRAME_PATTERN = re.compile(r'^\s+File "(?P<source>[^"]+)", line (?P<line_number>\d+)(?:, in (?P<function>.+))?\s*$')
+
+# ValueError: message | package.module.CustomError: message | KeyboardInterrupt
+EXCEPTION_PATTERN = re.compile(r"^(?P<error_type>[A-Za-z_][\w.]*)(?::\s?(?P<error_message>.*))?$")
+
+# Frames in these locations belong to the interpreter or a third party library, not the programmer
+LIBRARY_PATH_PATTERN = re.compile(r"(site-packages|dist-packages|[\\/]lib[\\/]python\d+(\.\d+)?[\\/])|^<frozen ")
+
+
+def _split_frames(lines: List[str]) -> Tuple[List[Tuple[str, int]], int]:
+    """
+    Collects the frames of a single traceback block.
+    Returns the (source, line_number) frames and the index of the first line after them.
+    """
+    frames = []
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        match = FRAME_PATTERN.match(line)
+        if match:
+            frames.append((match.group("source"), int(match.group("line_number"))))
+        elif line and not line[0].isspace():
+            # the first unindented line after the frames is the exception itself
+            break
+        index += 1
+    return frames, index
+
+
+def parse_python_traceback(text: str) -> Optional[ErrorLogBase]:
+    """
+    Parses a standard CPython traceback without calling the LLM.
+    For chained exceptions, the last traceback block (the exception that was actually raised) is used.
+    The source and line number come from the deepest frame that is not inside a library.
+
+    Returns None if the text isn't a traceback this parser understands.
+    """
+    start = text.rfind(TRACEBACK_HEADER)
+    if start == -1 or "Exception Group Traceback" in text:
+        return None
+
+    block_lines = text[start:].splitlines()
+    frames, index = _split_frames(block_lines[1:])
+    if not frames:
+        return None
+
+    exception_lines = block_lines[1 + index:]
+    if not exception_lines:
+        return None
+    match = EXCEPTION_PATTERN.match(exception_lines[0].rstrip())
+    if not match:
+        return None
+
+    # multi-line exception messages continue until a blank line
+    message_lines = [match.group("error_message") or ""]
+    for line in exception_lines[1:]:
+        if not line.strip():
+            break
+        message_lines.append(line.rstrip())
+    error_message = "\n".join(message_lines).strip()
+
+    programmer_frames = [frame for frame in frames if not LIBRARY_PATH_PATTERN.search(frame[0])]
+    source, line_number = (programmer_frames or frames)[-1]
+
+    trimmed_traceback = "\n".join(block_lines[:1 + index + len(message_lines)]).rstrip()
+
+    return ErrorLogBase(
+        error_type=match.group("error_type"),
+        error_message=error_message,
+        source=source,
+        line_number=line_number,
+        traceback=trimmed_traceback,
+    )
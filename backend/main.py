@@ -1,15 +1,43 @@
 from contextlib import asynccontextmanager
+import asyncio
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from backend.database import Base, engine
-from backend.routes import error_logs, projects, chat
+from backend.database import AsyncSessionLocal, async_engine, create_tables
+from backend.routes import error_logs, projects, chat, metrics, documents
+from backend.services.error_groups import backfill_error_groups
+from backend.services.error_log_index import remove_error_logs_from_index
+from backend.services.error_log_search import create_search_index
+from backend.services.ingest_queue import start_ingest_workers, stop_ingest_workers
+from backend.services.vector_writer import flush_vector_writers
+from backend.services.document_ingest import shutdown_parse_pool
+from backend.services.registry import start_warming_services
+from backend.services.chat_checkpointer import open_chat_checkpointer, close_chat_checkpointer
+from backend.services.tool_runtime import shutdown_tool_pool
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
-    Base.metadata.create_all(bind=engine)
+    async with async_engine.begin() as connection:
+        await connection.run_sync(create_tables)
+        await connection.run_sync(create_search_index)
+    # error logs stored before error groups existed
+    async with AsyncSessionLocal() as db:
+        stale_ids = await backfill_error_groups(db)
+    remove_error_logs_from_index(stale_ids)
+    start_ingest_workers()
+    # the chat graph is compiled with it, so it is opened before the graphs are built
+    await open_chat_checkpointer()
+    # graphs and vector stores are built in the background, the app serves requests meanwhile
+    start_warming_services()
     yield
+    await stop_ingest_workers()
+    await close_chat_checkpointer()
+    # write out whatever is still buffered for the vector databases
+    await asyncio.to_thread(flush_vector_writers)
+    shutdown_parse_pool()
+    shutdown_tool_pool()
+    await async_engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -25,3 +53,5 @@ app.add_middleware(
 app.include_router(error_logs.router)
 app.include_router(projects.router)
 app.include_router(chat.router)
+app.include_router(metrics.router)
+app.include_router(documents.router)
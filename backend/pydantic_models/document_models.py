@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+
+# This is the response model for a file uploaded into a vector database
+class DocumentUploadResponse(BaseModel):
+    collection_name: str
+    filename: str
+    size: int # bytes received
+    chunks: int # chunks the file was split into
+    added: int # chunks that weren't in the collection yet
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Literal, Optional
 from datetime import datetime
 
 # This is the input model for the error log from the user
@@ -7,6 +7,10 @@ from datetime import datetime
 class ErrorLogInput(BaseModel):
     traceback: str
 
+# This is the input model for a batch of error logs flushed by a worker
+class ErrorLogBatchInput(BaseModel):
+    error_logs: List[ErrorLogInput]
+
 # This is the base model for the error log
 # This is used to validate the error log response from the LLM
 class ErrorLogBase(BaseModel):
@@ -17,24 +21,136 @@ class ErrorLogBase(BaseModel):
     traceback: str # The traceback of the error
 
 # This is the response model for the error log from the LLM after it gets added to the database
+# The parsed fields are empty while the error log is queued or if parsing failed
 class ErrorLogResponse(ErrorLogBase):
+    error_type: Optional[str] = None
+    error_message: Optional[str] = None
+    source: Optional[str] = None
+    line_number: Optional[int] = None
     id: int
     project_id: int
     log_id: str
     created_timestamp: datetime
     status: str
+    group_id: Optional[int] = None
 
     # This allows the model to be created from a database model
     model_config = ConfigDict(from_attributes=True)
 
+# This is the response model for an error log accepted for background parsing
+class ErrorLogQueuedResponse(BaseModel):
+    id: int
+    log_id: str
+    status: str
+
+    # This allows the model to be created from a database model
+    model_config = ConfigDict(from_attributes=True)
+
+# This is the response model for the state of the background parsing queue
+class IngestQueueStatsResponse(BaseModel):
+    workers: int
+    depth: int # jobs waiting or being parsed
+    in_progress: int
+    oldest_enqueued_at: Optional[datetime] = None
+    lag_seconds: float # how long the oldest job has been waiting
+    processed: int
+    failed: int
+
+# This is the result of a single error log in a batch, in the same order as the input
+class ErrorLogBatchItemResponse(BaseModel):
+    index: int
+    success: bool
+    parsed_by: Optional[str] = None
+    error_log: Optional[ErrorLogResponse] = None
+    error: Optional[str] = None
+
+class ErrorLogBatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[ErrorLogBatchItemResponse]
+
+# The statuses a user can set, "queued" and "parse_failed" are only set by the ingest queue
+ErrorStatus = Literal["pending", "resolved", "ignored"]
+
 # This is the model for updating the error log in the database
 class ErrorLogUpdate(BaseModel):
     # id: Optional[int] = None
     project_id: int # this is the project id foreign key
     # log_id: Optional[str] = None
-    status: Optional[str] = None
+    status: Optional[ErrorStatus] = None
     error_type: Optional[str] = None
     error_message: Optional[str] = None
     source: Optional[str] = None
     line_number: Optional[int] = None
     traceback: Optional[str] = None
+
+
+# These are the filters shared by the error log listing and export
+class ErrorLogFilterBase(BaseModel):
+    status: Optional[str] = None
+    error_type: Optional[str] = None
+    source: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+# These are the query parameters for listing a project's error logs, newest first
+class ErrorLogFilters(ErrorLogFilterBase):
+    cursor: Optional[str] = None # next_cursor from the previous page
+    limit: int = Field(default=50, ge=1, le=500)
+
+# This is a page of error logs, next_cursor is None on the last page
+class ErrorLogPage(BaseModel):
+    items: List[ErrorLogResponse]
+    next_cursor: Optional[str] = None
+
+# These are the query parameters for exporting a project's error logs, oldest first
+class ErrorLogExportFilters(ErrorLogFilterBase):
+    format: Literal["ndjson", "csv"] = "ndjson"
+    gzip: bool = False
+
+# These are the query parameters for searching a project's error logs, best match first
+class ErrorLogSearchFilters(BaseModel):
+    q: str = Field(min_length=1)
+    limit: int = Field(default=20, ge=1, le=100)
+    offset: int = Field(default=0, ge=0) # next_offset from the previous page
+
+# This is one search hit, the snippet has the matching words wrapped in <mark> tags
+class ErrorLogSearchResult(BaseModel):
+    error_log: ErrorLogResponse
+    snippet: str
+    score: float # higher is a better match
+
+# This is a page of search hits, next_offset is None on the last page
+class ErrorLogSearchPage(BaseModel):
+    items: List[ErrorLogSearchResult]
+    next_offset: Optional[int] = None
+
+# This is an error log similar to another one, a lower distance is more similar
+class SimilarErrorLogResponse(BaseModel):
+    error_log: ErrorLogResponse
+    distance: float
+
+# This is the response model for a group of error logs sharing the same fingerprint
+class ErrorGroupResponse(BaseModel):
+    id: int
+    project_id: int
+    fingerprint: str
+    status: str
+    error_type: Optional[str] = None
+    error_message: Optional[str] = None
+    source: Optional[str] = None
+    line_number: Optional[int] = None
+    first_seen: datetime
+    last_seen: datetime
+    occurrence_count: int
+
+    # This allows the model to be created from a database model
+    model_config = ConfigDict(from_attributes=True)
+
+# This is the response model for a group along with its most recent sample occurrences
+class ErrorGroupDetailResponse(ErrorGroupResponse):
+    samples: List[ErrorLogResponse]
+
+# This is the model for updating a group, the status is applied to all of its samples
+class ErrorGroupUpdate(BaseModel):
+    status: ErrorStatus
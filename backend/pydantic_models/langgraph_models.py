@@ -13,6 +13,8 @@ class ErrorLogEvaluationLanggraphState(TypedDict, total=False):
     feedback: str
     success: bool = Field(default=False)
     count: int = Field(default=0)
+    parsed_by: str # "local" if the traceback parser handled it, "cache" for a repeat report, "llm" otherwise
+    fingerprint: str # fingerprint of the input, used as the parse cache key
 
 
 # Define your schema
@@ -29,6 +31,7 @@ class SummaryLanggraphState(TypedDict):
     tool_response: ToolMessage = Field(default={})
     tool_evaluation: EvaluationSchema = Field(default={})
     route: str | None = Field(default=None)
+    plan: str | None = Field(default=None) # tool call plan made alongside the assistant, handed to the toolbox
 
 
 class ToolLanggraphState(TypedDict):
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 
@@ -28,3 +28,31 @@ class ProjectUpdate(BaseModel):
 class ProjectResponse(ProjectCreate):
     # This allows the model to be created from a database model
     model_config = ConfigDict(from_attributes=True)
+
+
+# These are the query parameters for a project's error log stats
+class ProjectStatsFilters(BaseModel):
+    status: Optional[str] = None
+    error_type: Optional[str] = None
+    source: Optional[str] = None
+    created_after: Optional[datetime] = None # rounded down to the hour
+    created_before: Optional[datetime] = None
+    interval: Literal["hour", "day"] = "day"
+
+# This is the number of error logs with one value of a field, value is None while unknown
+class StatsCount(BaseModel):
+    value: Optional[str] = None
+    count: int
+
+# This is the number of error logs created in one hour or day
+class StatsBucket(BaseModel):
+    bucket: datetime
+    count: int
+
+# This is the response model for a project's error log stats, read from the rollups
+class ProjectStatsResponse(BaseModel):
+    total: int
+    by_error_type: List[StatsCount]
+    by_source: List[StatsCount]
+    by_status: List[StatsCount]
+    timeline: List[StatsBucket]
@@ -1,28 +1,45 @@
-from fastapi import APIRouter, Depends
-from backend.services.langgraph import get_summary_graph
-from backend.pydantic_models.langgraph_models import SummaryLanggraphState
+from fastapi import APIRouter, BackgroundTasks, Depends, Response
+from fastapi.responses import StreamingResponse
+from backend.services.registry import aget_service
+from backend.services.chat_stream import stream_summary, summary_graph_input
+from backend.services.chat_summarizer import get_thread_lock, summarize_thread_in_background
 from backend.helpers.dependencies import get_session_id
 from backend.pydantic_models.chat_models import ChatMessage
 
 
-summary_graph = get_summary_graph()
-
-
 router = APIRouter(
     prefix="/chat",
     tags=["chat"],
 )
 
 @router.post("/summary")
-def get_summary(chat_input: ChatMessage, session_id: str = Depends(get_session_id)):
+async def get_summary(chat_input: ChatMessage, background_tasks: BackgroundTasks, session_id: str = Depends(get_session_id)):
     config = {"configurable": {"thread_id": session_id}}
-    result = summary_graph.invoke(
-        {
-            "messages": [
-                ("user", chat_input.message)
-            ],
-            "user_input": chat_input.message
-        },
-        config=config
-    )
+    summary_graph = await aget_service("summary_graph")
+    async with get_thread_lock(session_id):
+        result = await summary_graph.ainvoke(
+            summary_graph_input(chat_input.message),
+            config=config
+        )
+    # long threads are summarized after the answer is sent
+    background_tasks.add_task(summarize_thread_in_background, session_id)
     return result["messages"][-1].content
+
+# same as /summary, but the answer is sent as server-sent events while it is generated
+@router.post("/summary/stream")
+async def stream_summary_events(chat_input: ChatMessage, response: Response, background_tasks: BackgroundTasks, session_id: str = Depends(get_session_id)):
+    config = {"configurable": {"thread_id": session_id}}
+    summary_graph = await aget_service("summary_graph")
+    streaming_response = StreamingResponse(
+        stream_summary(summary_graph, chat_input.message, config),
+        media_type="text/event-stream",
+        # no caching or proxy buffering, each event goes out as soon as it is written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # runs once the stream is finished
+        background=background_tasks,
+    )
+    background_tasks.add_task(summarize_thread_in_background, session_id)
+    # FastAPI only copies the session cookie onto responses it builds itself
+    for cookie in response.headers.getlist("set-cookie"):
+        streaming_response.headers.append("set-cookie", cookie)
+    return streaming_response
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from backend.pydantic_models.document_models import DocumentUploadResponse
+from backend.services.document_ingest import add_file_path_to_vector_db
+from backend.services.vector_db import get_vector_db
+from pathlib import Path
+from typing import Optional
+import asyncio
+import os
+import tempfile
+
+DOCUMENT_MAX_UPLOAD_SIZE = int(os.getenv("DOCUMENT_MAX_UPLOAD_SIZE", str(1024 * 1024 * 1024))) # Bytes
+DOCUMENT_WRITE_SIZE = 1024 * 1024 # Bytes of the body collected before they are written to disk off the event loop
+
+router = APIRouter(
+    prefix="/documents",
+    tags=["documents"],
+)
+
+# upload a file into a vector database, the request body is the raw file
+# the body is streamed to a temporary file and parsed a part at a time, so large files never sit in memory
+@router.post("/{collection_name}", response_model=DocumentUploadResponse)
+async def upload_document(collection_name: str, request: Request, filename: str = Query(min_length=1), project_id: Optional[int] = None):
+    try:
+        get_vector_db(collection_name)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    # the parser processes need a path, so the upload goes to a named file on disk
+    with tempfile.NamedTemporaryFile(suffix=Path(filename).suffix, delete=False) as file:
+        path = file.name
+    try:
+        size = 0
+        pending = bytearray()
+        with open(path, "wb") as file:
+            async for data in request.stream():
+                size += len(data)
+                if size > DOCUMENT_MAX_UPLOAD_SIZE:
+                    raise HTTPException(status_code=413, detail="File too large")
+                pending += data
+                # disk writes block, the body arrives in small pieces, so they are written a megabyte at a time in a thread
+                if len(pending) >= DOCUMENT_WRITE_SIZE:
+                    await asyncio.to_thread(file.write, bytes(pending))
+                    pending.clear()
+            await asyncio.to_thread(file.write, bytes(pending))
+        metadata = {"project_id": project_id} if project_id is not None else {}
+        result = await add_file_path_to_vector_db(collection_name, path, filename, metadata)
+    finally:
+        os.unlink(path)
+    return DocumentUploadResponse(collection_name=collection_name, filename=filename, size=size, **result)
@@ -1,209 +1,411 @@
-from fastapi import APIRouter, Depends, HTTPException
-from backend.pydantic_models.error_models import ErrorLogInput, ErrorLogResponse, ErrorLogUpdate, ErrorLogBase
-from backend.database import get_db
-from sqlalchemy.orm import Session
-from backend.db_models.db_models import ErrorLog, Project
-from backend.services.langgraph import get_evaulation_error_log_graph
-from typing import List
-
-
-evaluation_error_log_graph = get_evaulation_error_log_graph()
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from backend.pydantic_models.error_models import ErrorLogInput, ErrorLogBatchInput, ErrorLogBatchItemResponse, ErrorLogBatchResponse, ErrorLogQueuedResponse, IngestQueueStatsResponse, ErrorLogFilters, ErrorLogExportFilters, ErrorLogPage, ErrorLogSearchFilters, ErrorLogSearchPage, ErrorLogResponse, ErrorLogUpdate, ErrorGroupResponse, ErrorGroupDetailResponse, ErrorGroupUpdate, SimilarErrorLogResponse
+from backend.database import get_async_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db_models.db_models import ErrorLog, ErrorGroup, Project
+from backend.services.error_log_parser import parse_error_log_input, parse_error_log_inputs
+from backend.services.error_groups import record_error_log, uncount_error_log, update_error_group_status, update_error_log
+from backend.services.error_log_queries import get_error_log_page
+from backend.services.error_log_export import EXPORT_MEDIA_TYPES, export_error_logs
+from backend.services.error_log_search import search_error_logs
+from backend.services.error_log_index import find_similar_error_log_ids, index_error_logs, remove_error_logs_from_index
+from backend.services.ingest_queue import enqueue_error_log, notify_workers, get_ingest_queue_stats
+from typing import Annotated, List
+import asyncio
 
 router = APIRouter(
     prefix="/error-logs",
     tags=["error-logs"],
 )
 
-# get the error logs for a project
-@router.get("/project_id/{project_id}", response_model=List[ErrorLogResponse])
-def get_error_logs_by_project_id(project_id: int, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.id == project_id).first()
+# get the error logs for a project, a page at a time
+@router.get("/project_id/{project_id}", response_model=ErrorLogPage)
+async def get_error_logs_by_project_id(project_id: int, filters: Annotated[ErrorLogFilters, Query()], db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.id == project_id))
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    try:
+        return await get_error_log_page(db, project.id, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/project_uuid/{project_uuid}", response_model=ErrorLogPage)
+async def get_error_logs_by_project_uuid(project_uuid: str, filters: Annotated[ErrorLogFilters, Query()], db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.project_uuid == project_uuid))
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    try:
+        return await get_error_log_page(db, project.id, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# full-text search over a project's error messages, types, sources and tracebacks
+async def search_project_error_logs(project: Project, filters: ErrorLogSearchFilters, db: AsyncSession) -> ErrorLogSearchPage:
+    try:
+        return await search_error_logs(db, project.id, filters)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/project_id/{project_id}/search", response_model=ErrorLogSearchPage)
+async def search_error_logs_by_project_id(project_id: int, filters: Annotated[ErrorLogSearchFilters, Query()], db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.id == project_id))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    error_logs = db.query(ErrorLog).filter(ErrorLog.project_id == project_id).all()
-    return error_logs
+    return await search_project_error_logs(project, filters, db)
 
-@router.get("/project_uuid/{project_uuid}", response_model=List[ErrorLogResponse])
-def get_error_logs_by_project_uuid(project_uuid: str, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.project_uuid == project_uuid).first()
+@router.get("/project_uuid/{project_uuid}/search", response_model=ErrorLogSearchPage)
+async def search_error_logs_by_project_uuid(project_uuid: str, filters: Annotated[ErrorLogSearchFilters, Query()], db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.project_uuid == project_uuid))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    error_logs = db.query(ErrorLog).filter(ErrorLog.project_id == project.id).all()
-    return error_logs
+    return await search_project_error_logs(project, filters, db)
+
+# stream all matching error logs of a project as NDJSON or CSV, however many there are
+def export_error_logs_response(project: Project, filters: ErrorLogExportFilters) -> StreamingResponse:
+    headers = {"Content-Disposition": f'attachment; filename="project_{project.id}_error_logs.{filters.format}"'}
+    if filters.gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(export_error_logs(project.id, filters), media_type=EXPORT_MEDIA_TYPES[filters.format], headers=headers)
+
+@router.get("/project_id/{project_id}/export")
+async def export_error_logs_by_project_id(project_id: int, filters: Annotated[ErrorLogExportFilters, Query()], db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.id == project_id))
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return export_error_logs_response(project, filters)
+
+@router.get("/project_uuid/{project_uuid}/export")
+async def export_error_logs_by_project_uuid(project_uuid: str, filters: Annotated[ErrorLogExportFilters, Query()], db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.project_uuid == project_uuid))
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return export_error_logs_response(project, filters)
+
+# get the error groups for a project, one row per distinct error no matter how often it was reported
+@router.get("/project_id/{project_id}/groups", response_model=List[ErrorGroupResponse])
+async def get_error_groups_by_project_id(project_id: int, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.id == project_id))
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    error_groups = (await db.scalars(select(ErrorGroup).filter(ErrorGroup.project_id == project_id).order_by(ErrorGroup.last_seen.desc()))).all()
+    return error_groups
+
+@router.get("/project_uuid/{project_uuid}/groups", response_model=List[ErrorGroupResponse])
+async def get_error_groups_by_project_uuid(project_uuid: str, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.project_uuid == project_uuid))
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    error_groups = (await db.scalars(select(ErrorGroup).filter(ErrorGroup.project_id == project.id).order_by(ErrorGroup.last_seen.desc()))).all()
+    return error_groups
+
+@router.get("/groups/id/{error_group_id}", response_model=ErrorGroupDetailResponse)
+async def get_error_group_by_id(error_group_id: int, db: AsyncSession = Depends(get_async_db)):
+    error_group = await db.scalar(select(ErrorGroup).filter(ErrorGroup.id == error_group_id))
+    if not error_group:
+        raise HTTPException(status_code=404, detail="Error group not found")
+    samples = (await db.scalars(select(ErrorLog).filter(ErrorLog.group_id == error_group.id).order_by(ErrorLog.id.desc()))).all()
+    return ErrorGroupDetailResponse(**ErrorGroupResponse.model_validate(error_group).model_dump(), samples=samples)
+
+# resolving or ignoring a group applies to all of its samples
+@router.patch("/groups/id/{error_group_id}", response_model=ErrorGroupResponse)
+async def patch_error_group_by_id(error_group_id: int, error_group_update: ErrorGroupUpdate, db: AsyncSession = Depends(get_async_db)):
+    error_group = await db.scalar(select(ErrorGroup).filter(ErrorGroup.id == error_group_id))
+    if not error_group:
+        raise HTTPException(status_code=404, detail="Error group not found")
+    await update_error_group_status(db, error_group, error_group_update.status)
+    await db.commit()
+    await db.refresh(error_group)
+    index_error_logs((await db.scalars(select(ErrorLog).filter(ErrorLog.group_id == error_group.id))).all())
+    return error_group
 
 # create a new error log for a project
 @router.post("/project_id/{project_id}", response_model=ErrorLogResponse)
-def create_error_log_by_project_id(project_id: int, error_log: ErrorLogInput, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.id == project_id).first()
+async def create_error_log_by_project_id(project_id: int, error_log: ErrorLogInput, response: Response, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.id == project_id))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    error_log_response = evaluation_error_log_graph.invoke({"input": error_log.traceback})
-    new_error_log = ErrorLogBase.model_validate(error_log_response.get("output"))
-    new_error_log = ErrorLog(project_id=project.id, **new_error_log.model_dump())
-    db.add(new_error_log)
-    db.commit()
-    db.refresh(new_error_log)
+    # release the connection while the traceback is parsed, it can take several LLM calls, the parse cache reads with the same session
+    await db.commit()
+    new_error_log, parsed_by, fingerprint = await parse_error_log_input(error_log.traceback, db)
+    response.headers["X-Parsed-By"] = parsed_by # "local", "cache" or "llm"
+    new_error_log, stale_ids = await record_error_log(db, project.id, fingerprint, new_error_log)
+    await db.commit()
+    await db.refresh(new_error_log)
+    index_error_logs([new_error_log])
+    remove_error_logs_from_index(stale_ids)
     return new_error_log
 
 @router.post("/project_uuid/{project_uuid}", response_model=ErrorLogResponse)
-def create_error_log_by_project_uuid(project_uuid: str, error_log: ErrorLogInput, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.project_uuid == project_uuid).first()
+async def create_error_log_by_project_uuid(project_uuid: str, error_log: ErrorLogInput, response: Response, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.project_uuid == project_uuid))
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    # release the connection while the traceback is parsed, it can take several LLM calls, the parse cache reads with the same session
+    await db.commit()
+    new_error_log, parsed_by, fingerprint = await parse_error_log_input(error_log.traceback, db)
+    response.headers["X-Parsed-By"] = parsed_by # "local", "cache" or "llm"
+    new_error_log, stale_ids = await record_error_log(db, project.id, fingerprint, new_error_log)
+    await db.commit()
+    await db.refresh(new_error_log)
+    index_error_logs([new_error_log])
+    remove_error_logs_from_index(stale_ids)
+    return new_error_log
+
+# create a batch of error logs for a project, parsed concurrently and inserted in one transaction
+async def create_error_log_batch(project: Project, error_log_batch: ErrorLogBatchInput, db: AsyncSession) -> ErrorLogBatchResponse:
+    # release the connection while the tracebacks are parsed
+    await db.commit()
+    parsed_error_logs = await parse_error_log_inputs([error_log.traceback for error_log in error_log_batch.error_logs])
+
+    results = []
+    new_error_logs = []
+    stale_ids = set()
+    for index, parsed in enumerate(parsed_error_logs):
+        if isinstance(parsed, Exception):
+            results.append(ErrorLogBatchItemResponse(index=index, success=False, error=str(parsed)))
+            continue
+        # validated right after the flush, a later sample of the same group may rotate this one out
+        new_error_log, pruned_ids = await record_error_log(db, project.id, parsed.fingerprint, parsed.error_log)
+        new_error_logs.append(new_error_log)
+        stale_ids.update(pruned_ids)
+        error_log_response = ErrorLogResponse.model_validate(new_error_log)
+        results.append(ErrorLogBatchItemResponse(index=index, success=True, parsed_by=parsed.parsed_by, error_log=error_log_response))
+    await db.commit()
+    # the ones rotated out by later samples of the batch aren't indexed at all
+    index_error_logs([new_error_log for new_error_log in new_error_logs if new_error_log.id not in stale_ids])
+    remove_error_logs_from_index(stale_ids)
+
+    succeeded = sum(result.success for result in results)
+    return ErrorLogBatchResponse(succeeded=succeeded, failed=len(results) - succeeded, results=results)
+
+@router.post("/project_id/{project_id}/batch", response_model=ErrorLogBatchResponse)
+async def create_error_log_batch_by_project_id(project_id: int, error_log_batch: ErrorLogBatchInput, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.id == project_id))
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return await create_error_log_batch(project, error_log_batch, db)
+
+@router.post("/project_uuid/{project_uuid}/batch", response_model=ErrorLogBatchResponse)
+async def create_error_log_batch_by_project_uuid(project_uuid: str, error_log_batch: ErrorLogBatchInput, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.project_uuid == project_uuid))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    error_log_response = evaluation_error_log_graph.invoke({"input": error_log.traceback})
-    new_error_log = ErrorLogBase.model_validate(error_log_response.get("output"))
-    new_error_log = ErrorLog(project_id=project.id, **new_error_log.model_dump())
-    db.add(new_error_log)
-    db.commit()
-    db.refresh(new_error_log)
+    return await create_error_log_batch(project, error_log_batch, db)
+
+# accept an error log now and parse it in the background, the log stays "queued" until a worker picks it up
+@router.post("/project_id/{project_id}/queue", response_model=ErrorLogQueuedResponse, status_code=202)
+async def queue_error_log_by_project_id(project_id: int, error_log: ErrorLogInput, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.id == project_id))
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    new_error_log = await enqueue_error_log(db, project.id, error_log.traceback)
+    await db.commit()
+    await db.refresh(new_error_log)
+    notify_workers()
     return new_error_log
 
+@router.post("/project_uuid/{project_uuid}/queue", response_model=ErrorLogQueuedResponse, status_code=202)
+async def queue_error_log_by_project_uuid(project_uuid: str, error_log: ErrorLogInput, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.project_uuid == project_uuid))
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    new_error_log = await enqueue_error_log(db, project.id, error_log.traceback)
+    await db.commit()
+    await db.refresh(new_error_log)
+    notify_workers()
+    return new_error_log
+
+@router.get("/queue/stats", response_model=IngestQueueStatsResponse)
+async def get_error_log_queue_stats():
+    return await get_ingest_queue_stats()
+
 @router.get("/id/{error_log_id}", response_model=ErrorLogResponse)
-def get_error_log_by_error_log_id(error_log_id: int, db: Session = Depends(get_db)):
-    error_log = db.query(ErrorLog).filter(ErrorLog.id == error_log_id).first()
+async def get_error_log_by_error_log_id(error_log_id: int, db: AsyncSession = Depends(get_async_db)):
+    error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.id == error_log_id))
     if not error_log:
         raise HTTPException(status_code=404, detail="Error log not found")
     return error_log
 
+# the k most similar past errors of the same project, for triage
+@router.get("/id/{error_log_id}/similar", response_model=List[SimilarErrorLogResponse])
+async def get_similar_error_logs_by_error_log_id(error_log_id: int, k: int = Query(default=5, ge=1, le=50), db: AsyncSession = Depends(get_async_db)):
+    error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.id == error_log_id))
+    if not error_log:
+        raise HTTPException(status_code=404, detail="Error log not found")
+    if not error_log.error_type:
+        raise HTTPException(status_code=409, detail="Error log has not been parsed yet")
+    similar = await asyncio.to_thread(find_similar_error_log_ids, error_log, k)
+    # deleted error logs stay in the index until the vector writer's next batch, or when removing them failed, skip those, more than k were fetched to make up for them
+    error_logs = {similar_error_log.id: similar_error_log for similar_error_log in (await db.scalars(select(ErrorLog).filter(ErrorLog.id.in_([similar_id for similar_id, _ in similar])))).all()}
+    return [SimilarErrorLogResponse(error_log=error_logs[similar_id], distance=distance) for similar_id, distance in similar if similar_id in error_logs][:k]
+
 @router.get("/log_id/{error_log_log_id}", response_model=ErrorLogResponse)
-def get_error_log_by_error_log_log_id(error_log_log_id: str, db: Session = Depends(get_db)):
-    error_log = db.query(ErrorLog).filter(ErrorLog.log_id == error_log_log_id).first()
+async def get_error_log_by_error_log_log_id(error_log_log_id: str, db: AsyncSession = Depends(get_async_db)):
+    error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.log_id == error_log_log_id))
     if not error_log:
         raise HTTPException(status_code=404, detail="Error log not found")
     return error_log
 
 @router.put("/id/{error_log_id}", response_model=ErrorLogResponse)
-def update_error_log_by_error_log_id(error_log_id: int, error_log_update: ErrorLogUpdate, db: Session = Depends(get_db)):
-    error_log = db.query(ErrorLog).filter(ErrorLog.id == error_log_id).first()
+async def update_error_log_by_error_log_id(error_log_id: int, error_log_update: ErrorLogUpdate, db: AsyncSession = Depends(get_async_db)):
+    error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.id == error_log_id))
     if not error_log:
         raise HTTPException(status_code=404, detail="Error log not found")
     
     if "project_id" in error_log_update.model_dump(exclude_unset=True):
-        project = db.query(Project).filter(Project.id == error_log_update.project_id).first()
+        project = await db.scalar(select(Project).filter(Project.id == error_log_update.project_id))
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
 
-    for key, value in error_log_update.model_dump(exclude_unset=True).items():
-        setattr(error_log, key, value)
-    db.commit()
-    db.refresh(error_log)
+    changes = error_log_update.model_dump(exclude_unset=True)
+    if error_log.group_id is not None and changes.get("project_id", error_log.project_id) != error_log.project_id:
+        raise HTTPException(status_code=409, detail="Error log is part of an error group and can't be moved to another project")
+    await update_error_log(db, error_log, changes)
+    await db.commit()
+    await db.refresh(error_log)
+    index_error_logs([error_log])
     return error_log
 
 @router.put("/log_id/{error_log_log_id}", response_model=ErrorLogResponse)
-def update_error_log_by_error_log_log_id(error_log_log_id: str, error_log_update: ErrorLogUpdate, db: Session = Depends(get_db)):
-    error_log = db.query(ErrorLog).filter(ErrorLog.log_id == error_log_log_id).first()
+async def update_error_log_by_error_log_log_id(error_log_log_id: str, error_log_update: ErrorLogUpdate, db: AsyncSession = Depends(get_async_db)):
+    error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.log_id == error_log_log_id))
     if not error_log:
         raise HTTPException(status_code=404, detail="Error log not found")
     
     if "project_id" in error_log_update.model_dump(exclude_unset=True):
-        project = db.query(Project).filter(Project.id == error_log_update.project_id).first()
+        project = await db.scalar(select(Project).filter(Project.id == error_log_update.project_id))
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
 
-    for key, value in error_log_update.model_dump(exclude_unset=True).items():
-        setattr(error_log, key, value)
-    db.commit()
-    db.refresh(error_log)
+    changes = error_log_update.model_dump(exclude_unset=True)
+    if error_log.group_id is not None and changes.get("project_id", error_log.project_id) != error_log.project_id:
+        raise HTTPException(status_code=409, detail="Error log is part of an error group and can't be moved to another project")
+    await update_error_log(db, error_log, changes)
+    await db.commit()
+    await db.refresh(error_log)
+    index_error_logs([error_log])
     return error_log
 
 @router.patch("/id/{error_log_id}", response_model=ErrorLogResponse)
-def patch_error_log_by_error_log_id(error_log_id: int, error_log_update: ErrorLogUpdate, db: Session = Depends(get_db)):
-    error_log = db.query(ErrorLog).filter(ErrorLog.id == error_log_id).first()
+async def patch_error_log_by_error_log_id(error_log_id: int, error_log_update: ErrorLogUpdate, db: AsyncSession = Depends(get_async_db)):
+    error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.id == error_log_id))
     if not error_log:
         raise HTTPException(status_code=404, detail="Error log not found")
     
     if "project_id" in error_log_update.model_dump(exclude_unset=True):
-        project = db.query(Project).filter(Project.id == error_log_update.project_id).first()
+        project = await db.scalar(select(Project).filter(Project.id == error_log_update.project_id))
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
 
-    for key, value in error_log_update.model_dump(exclude_unset=True).items():
-        setattr(error_log, key, value)
-    db.commit()
-    db.refresh(error_log)
+    changes = error_log_update.model_dump(exclude_unset=True)
+    if error_log.group_id is not None and changes.get("project_id", error_log.project_id) != error_log.project_id:
+        raise HTTPException(status_code=409, detail="Error log is part of an error group and can't be moved to another project")
+    await update_error_log(db, error_log, changes)
+    await db.commit()
+    await db.refresh(error_log)
+    index_error_logs([error_log])
     return error_log
 
 @router.patch("/log_id/{error_log_log_id}", response_model=ErrorLogResponse)
-def patch_error_log_by_error_log_log_id(error_log_log_id: str, error_log_update: ErrorLogUpdate, db: Session = Depends(get_db)):
-    error_log = db.query(ErrorLog).filter(ErrorLog.log_id == error_log_log_id).first()
+async def patch_error_log_by_error_log_log_id(error_log_log_id: str, error_log_update: ErrorLogUpdate, db: AsyncSession = Depends(get_async_db)):
+    error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.log_id == error_log_log_id))
     if not error_log:
         raise HTTPException(status_code=404, detail="Error log not found")
     
     if "project_id" in error_log_update.model_dump(exclude_unset=True):
-        project = db.query(Project).filter(Project.id == error_log_update.project_id).first()
+        project = await db.scalar(select(Project).filter(Project.id == error_log_update.project_id))
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
 
-    for key, value in error_log_update.model_dump(exclude_unset=True).items():
-        setattr(error_log, key, value)
-    db.commit()
-    db.refresh(error_log)
+    changes = error_log_update.model_dump(exclude_unset=True)
+    if error_log.group_id is not None and changes.get("project_id", error_log.project_id) != error_log.project_id:
+        raise HTTPException(status_code=409, detail="Error log is part of an error group and can't be moved to another project")
+    await update_error_log(db, error_log, changes)
+    await db.commit()
+    await db.refresh(error_log)
+    index_error_logs([error_log])
     return error_log
 
 @router.delete("/id/{error_log_id}", response_model=ErrorLogResponse)
-def delete_error_log_by_error_log_id(error_log_id: int, db: Session = Depends(get_db)):
-    error_log = db.query(ErrorLog).filter(ErrorLog.id == error_log_id).first()
+async def delete_error_log_by_error_log_id(error_log_id: int, db: AsyncSession = Depends(get_async_db)):
+    error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.id == error_log_id))
     if not error_log:
         raise HTTPException(status_code=404, detail="Error log not found")
-    db.delete(error_log)
-    db.commit()
+    await uncount_error_log(db, error_log)
+    await db.delete(error_log)
+    await db.commit()
+    remove_error_logs_from_index([error_log.id])
     return error_log
 
 @router.delete("/log_id/{error_log_log_id}", response_model=ErrorLogResponse)
-def delete_error_log_by_error_log_log_id(error_log_log_id: str, db: Session = Depends(get_db)):
-    error_log = db.query(ErrorLog).filter(ErrorLog.log_id == error_log_log_id).first()
+async def delete_error_log_by_error_log_log_id(error_log_log_id: str, db: AsyncSession = Depends(get_async_db)):
+    error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.log_id == error_log_log_id))
     if not error_log:
         raise HTTPException(status_code=404, detail="Error log not found")
-    db.delete(error_log)
-    db.commit()
+    await uncount_error_log(db, error_log)
+    await db.delete(error_log)
+    await db.commit()
+    remove_error_logs_from_index([error_log.id])
     return error_log
 
 @router.get("/project_id/{error_log_project_id}/id/{error_log_id}", response_model=ErrorLogResponse)
-def get_error_log_by_project_id_and_id(error_log_project_id: int, error_log_id: int, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.id == error_log_project_id).first()
+async def get_error_log_by_project_id_and_id(error_log_project_id: int, error_log_id: int, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.id == error_log_project_id))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    error_log = db.query(ErrorLog).filter(ErrorLog.project_id == project.id, ErrorLog.id == error_log_id).first()
+    error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.project_id == project.id, ErrorLog.id == error_log_id))
     if not error_log:
         raise HTTPException(status_code=404, detail="Error log not found")
     return error_log
 
 @router.put("/project_id/{error_log_project_id}/id/{error_log_id}", response_model=ErrorLogResponse)
-def update_error_log_by_project_id_and_id(error_log_project_id: int, error_log_id: int, error_log_update: ErrorLogUpdate, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.id == error_log_project_id).first()
+async def update_error_log_by_project_id_and_id(error_log_project_id: int, error_log_id: int, error_log_update: ErrorLogUpdate, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.id == error_log_project_id))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    error_log = db.query(ErrorLog).filter(ErrorLog.project_id == project.id, ErrorLog.id == error_log_id).first()
+    error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.project_id == project.id, ErrorLog.id == error_log_id))
     if not error_log:
         raise HTTPException(status_code=404, detail="Error log not found")
-    for key, value in error_log_update.model_dump(exclude_unset=True).items():
-        setattr(error_log, key, value)
-    db.commit()
-    db.refresh(error_log)
+    changes = error_log_update.model_dump(exclude_unset=True)
+    if error_log.group_id is not None and changes.get("project_id", error_log.project_id) != error_log.project_id:
+        raise HTTPException(status_code=409, detail="Error log is part of an error group and can't be moved to another project")
+    await update_error_log(db, error_log, changes)
+    await db.commit()
+    await db.refresh(error_log)
+    index_error_logs([error_log])
     return error_log
 
 @router.patch("/project_id/{error_log_project_id}/id/{error_log_id}", response_model=ErrorLogResponse)
-def patch_error_log_by_project_id_and_id(error_log_project_id: int, error_log_id: int, error_log_update: ErrorLogUpdate, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.id == error_log_project_id).first()
+async def patch_error_log_by_project_id_and_id(error_log_project_id: int, error_log_id: int, error_log_update: ErrorLogUpdate, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.id == error_log_project_id))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    error_log = db.query(ErrorLog).filter(ErrorLog.project_id == project.id, ErrorLog.id == error_log_id).first()
+    error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.project_id == project.id, ErrorLog.id == error_log_id))
     if not error_log:
         raise HTTPException(status_code=404, detail="Error log not found")
-    for key, value in error_log_update.model_dump(exclude_unset=True).items():
-        setattr(error_log, key, value)
-    db.commit()
-    db.refresh(error_log)
+    changes = error_log_update.model_dump(exclude_unset=True)
+    if error_log.group_id is not None and changes.get("project_id", error_log.project_id) != error_log.project_id:
+        raise HTTPException(status_code=409, detail="Error log is part of an error group and can't be moved to another project")
+    await update_error_log(db, error_log, changes)
+    await db.commit()
+    await db.refresh(error_log)
+    index_error_logs([error_log])
     return error_log
 
 @router.delete("/project_id/{error_log_project_id}/id/{error_log_id}", response_model=ErrorLogResponse)
-def delete_error_log_by_project_id_and_id(error_log_project_id: int, error_log_id: int, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.id == error_log_project_id).first()
+async def delete_error_log_by_project_id_and_id(error_log_project_id: int, error_log_id: int, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.id == error_log_project_id))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    error_log = db.query(ErrorLog).filter(ErrorLog.project_id == project.id, ErrorLog.id == error_log_id).first()
+    error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.project_id == project.id, ErrorLog.id == error_log_id))
     if not error_log:
         raise HTTPException(status_code=404, detail="Error log not found")
-    db.delete(error_log)
-    db.commit()
+    await uncount_error_log(db, error_log)
+    await db.delete(error_log)
+    await db.commit()
+    remove_error_logs_from_index([error_log.id])
     return error_log
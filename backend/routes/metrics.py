@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from backend.helpers.metrics import get_counters
+from typing import Dict
+
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
+@router.get("/", response_model=Dict[str, int])
+def get_metrics(prefix: str = ""):
+    return get_counters(prefix)
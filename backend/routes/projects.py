@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
-from backend.pydantic_models.project_models import ProjectInput, ProjectUpdate, ProjectResponse
-from backend.database import get_db
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from backend.pydantic_models.project_models import ProjectInput, ProjectUpdate, ProjectResponse, ProjectStatsFilters, ProjectStatsResponse
+from backend.database import get_async_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.db_models.db_models import Project
-from typing import List
+from backend.services.error_log_rollups import get_project_stats
+from typing import Annotated, List
 
 router = APIRouter(
     prefix="/projects",
@@ -11,90 +13,105 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[ProjectResponse])
-def get_projects(db: Session = Depends(get_db)):
-    projects = db.query(Project).all()
+async def get_projects(db: AsyncSession = Depends(get_async_db)):
+    projects = (await db.scalars(select(Project))).all()
     return projects
 
 @router.post("/", response_model=ProjectResponse)
-def create_project(project: ProjectInput, db: Session = Depends(get_db)):
+async def create_project(project: ProjectInput, db: AsyncSession = Depends(get_async_db)):
     new_project = Project(**project.model_dump())
     db.add(new_project)
-    db.commit()
-    db.refresh(new_project)
+    await db.commit()
+    await db.refresh(new_project)
     return new_project
 
 @router.get("/id/{project_id}", response_model=ProjectResponse)
-def get_project_by_id(project_id: int, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.id == project_id).first()
+async def get_project_by_id(project_id: int, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.id == project_id))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
 @router.get("/uuid/{project_uuid}", response_model=ProjectResponse)
-def get_project_by_uuid(project_uuid: str, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.project_uuid == project_uuid).first()
+async def get_project_by_uuid(project_uuid: str, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.project_uuid == project_uuid))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
+# error log counts for dashboards, served from the rollups so they cost the same however many logs there are
+@router.get("/id/{project_id}/stats", response_model=ProjectStatsResponse)
+async def get_project_stats_by_id(project_id: int, filters: Annotated[ProjectStatsFilters, Query()], db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.id == project_id))
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return await get_project_stats(db, project.id, filters)
+
+@router.get("/uuid/{project_uuid}/stats", response_model=ProjectStatsResponse)
+async def get_project_stats_by_uuid(project_uuid: str, filters: Annotated[ProjectStatsFilters, Query()], db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.project_uuid == project_uuid))
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return await get_project_stats(db, project.id, filters)
+
 @router.put("/id/{project_id}", response_model=ProjectResponse)
-def update_project_by_id(project_id: int, project: ProjectUpdate, db: Session = Depends(get_db)):
-    project_query = db.query(Project).filter(Project.id == project_id).first()
+async def update_project_by_id(project_id: int, project: ProjectUpdate, db: AsyncSession = Depends(get_async_db)):
+    project_query = await db.scalar(select(Project).filter(Project.id == project_id))
     if not project_query:
         raise HTTPException(status_code=404, detail="Project not found")
     for key, value in project.model_dump(exclude_unset=True).items():
         setattr(project_query, key, value)
-    db.commit()
-    db.refresh(project_query)
+    await db.commit()
+    await db.refresh(project_query)
     return project_query
 
 @router.put("/uuid/{project_uuid}", response_model=ProjectResponse)
-def update_project_by_uuid(project_uuid: str, project: ProjectUpdate, db: Session = Depends(get_db)):
-    project_query = db.query(Project).filter(Project.project_uuid == project_uuid).first()
+async def update_project_by_uuid(project_uuid: str, project: ProjectUpdate, db: AsyncSession = Depends(get_async_db)):
+    project_query = await db.scalar(select(Project).filter(Project.project_uuid == project_uuid))
     if not project_query:
         raise HTTPException(status_code=404, detail="Project not found")
     for key, value in project.model_dump(exclude_unset=True).items():
         setattr(project_query, key, value)
-    db.commit()
-    db.refresh(project_query)
+    await db.commit()
+    await db.refresh(project_query)
     return project_query
 
 @router.patch("/id/{project_id}", response_model=ProjectResponse)
-def patch_project_by_id(project_id: int, project: ProjectUpdate, db: Session = Depends(get_db)):
-    project_query = db.query(Project).filter(Project.id == project_id).first()
+async def patch_project_by_id(project_id: int, project: ProjectUpdate, db: AsyncSession = Depends(get_async_db)):
+    project_query = await db.scalar(select(Project).filter(Project.id == project_id))
     if not project_query:
         raise HTTPException(status_code=404, detail="Project not found")
     for key, value in project.model_dump(exclude_unset=True).items():
         setattr(project_query, key, value)
-    db.commit()
-    db.refresh(project_query)
+    await db.commit()
+    await db.refresh(project_query)
     return project_query
 
 @router.patch("/uuid/{project_uuid}", response_model=ProjectResponse)
-def patch_project_by_uuid(project_uuid: str, project: ProjectUpdate, db: Session = Depends(get_db)):
-    project_query = db.query(Project).filter(Project.project_uuid == project_uuid).first()
+async def patch_project_by_uuid(project_uuid: str, project: ProjectUpdate, db: AsyncSession = Depends(get_async_db)):
+    project_query = await db.scalar(select(Project).filter(Project.project_uuid == project_uuid))
     if not project_query:
         raise HTTPException(status_code=404, detail="Project not found")
     for key, value in project.model_dump(exclude_unset=True).items():
         setattr(project_query, key, value)
-    db.commit()
-    db.refresh(project_query)
+    await db.commit()
+    await db.refresh(project_query)
     return project_query
 
 @router.delete("/id/{project_id}", response_model=ProjectResponse)
-def delete_project_by_id(project_id: int, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.id == project_id).first()
+async def delete_project_by_id(project_id: int, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.id == project_id))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    db.delete(project)
-    db.commit()
+    await db.delete(project)
+    await db.commit()
     return project
 
 @router.delete("/uuid/{project_uuid}", response_model=ProjectResponse)
-def delete_project_by_uuid(project_uuid: str, db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.project_uuid == project_uuid).first()
+async def delete_project_by_uuid(project_uuid: str, db: AsyncSession = Depends(get_async_db)):
+    project = await db.scalar(select(Project).filter(Project.project_uuid == project_uuid))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    db.delete(project)
-    db.commit()
+    await db.delete(project)
+    await db.commit()
     return project
@@ -0,0 +1,42 @@
+"""
+Indexes the parsed error logs already in the database into the project_errors collection, e.g.:
+
+    python -m backend.scripts.index_error_logs
+    python -m backend.scripts.index_error_logs --project-id 1
+"""
+from argparse import ArgumentParser
+import asyncio
+
+from sqlalchemy import select
+
+from backend.database import AsyncSessionLocal, async_engine
+from backend.db_models.db_models import ErrorLog
+from backend.services.error_log_index import index_error_logs
+from backend.services.vector_writer import flush_vector_writers
+
+
+INDEX_BATCH_SIZE = 1000
+
+
+async def run_index(project_id: int | None) -> None:
+    query = select(ErrorLog).filter(ErrorLog.error_type.is_not(None)).order_by(ErrorLog.id)
+    if project_id is not None:
+        query = query.filter(ErrorLog.project_id == project_id)
+
+    indexed = 0
+    async with AsyncSessionLocal() as db:
+        result = await db.stream_scalars(query.execution_options(yield_per=INDEX_BATCH_SIZE))
+        async for error_logs in result.partitions():
+            index_error_logs(error_logs)
+            indexed += len(error_logs)
+    await async_engine.dispose()
+    # embedded chunks are cached, so running this again costs no provider calls
+    await asyncio.to_thread(flush_vector_writers)
+    print(f"Indexed {indexed} error logs.")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Index existing error logs for similarity search")
+    parser.add_argument("--project-id", type=int, default=None, help="only this project, all projects by default")
+    args = parser.parse_args()
+    asyncio.run(run_index(args.project_id))
@@ -0,0 +1,70 @@
+"""
+Small load generator for a running backend, e.g.:
+
+    python -m backend.scripts.load_test --url http://localhost:9002 --scenario ingest --requests 2000 --concurrency 200
+"""
+from argparse import ArgumentParser
+from time import perf_counter
+import asyncio
+import statistics
+
+import httpx
+
+
+TRACEBACK = (
+    "Traceback (most recent call last):\n"
+    '  File "/app/worker.py", line {line}, in run\n'
+    "    handle(job)\n"
+    "ValueError: job {line} failed\n"
+)
+CHAT_SESSIONS = 500 # Conversations the chat scenario spreads its requests over
+
+
+async def run_load_test(url: str, scenario: str, requests: int, concurrency: int) -> None:
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        project = (await client.post("/projects/", json={"project_name": "load test", "project_description": "load test"})).json()
+
+        def send(i: int):
+            if scenario == "list":
+                return client.get("/projects/")
+            if scenario == "chat":
+                # many long conversations, the checkpoints should stay bounded and memory flat
+                session = f"load-test-{i % CHAT_SESSIONS}"
+                return client.post("/chat/summary", json={"message": f"How many projects are there? ({i})"}, headers={"Cookie": f"chat_session_id={session}"})
+            if scenario == "llm":
+                # not a standard traceback and a different fingerprint each time, so it goes to the LLM
+                job = "".join(chr(ord("a") + int(digit)) for digit in str(i))
+                return client.post(f"/error-logs/project_id/{project['id']}", json={"traceback": f"worker crashed running job {job}"})
+            return client.post(f"/error-logs/project_id/{project['id']}", json={"traceback": TRACEBACK.format(line=i)})
+
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        failures = 0
+
+        async def worker(i: int):
+            nonlocal failures
+            async with semaphore:
+                start = perf_counter()
+                response = await send(i)
+                latencies.append(perf_counter() - start)
+                if response.status_code >= 400:
+                    failures += 1
+
+        start = perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(requests)))
+        elapsed = perf_counter() - start
+
+    latencies.sort()
+    print(f"scenario={scenario} requests={requests} concurrency={concurrency} failures={failures}")
+    print(f"throughput={requests / elapsed:.1f} req/s")
+    print(f"p50={statistics.median(latencies) * 1000:.1f}ms p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Load test the error manager backend")
+    parser.add_argument("--url", default="http://localhost:9002")
+    parser.add_argument("--scenario", choices=["ingest", "llm", "list", "chat"], default="ingest")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run_load_test(args.url, args.scenario, args.requests, args.concurrency))
@@ -0,0 +1,35 @@
+"""
+Recomputes the error log rollups from the error groups' hourly report counts, and from error_logs for the logs
+that aren't in a group (queued or failed to parse), and reports any drift, e.g.:
+
+    python -m backend.scripts.rebuild_rollups --check
+    python -m backend.scripts.rebuild_rollups --project-id 1
+"""
+from argparse import ArgumentParser
+import asyncio
+import sys
+
+from backend.database import AsyncSessionLocal, async_engine, create_tables
+from backend.services.error_log_rollups import rebuild_rollups
+
+
+async def run_rebuild(project_id: int | None, check_only: bool) -> int:
+    async with async_engine.begin() as connection:
+        await connection.run_sync(create_tables)
+    async with AsyncSessionLocal() as db:
+        drift = await rebuild_rollups(db, project_id, check_only)
+        await db.commit()
+    await async_engine.dispose()
+
+    for (key_project_id, bucket, error_type, source, status), actual, expected in drift:
+        print(f"project={key_project_id} bucket={bucket.isoformat()} error_type={error_type!r} source={source!r} status={status!r} rollups={actual} recomputed={expected}")
+    print(f"{len(drift)} drifted rollup rows" + ("" if check_only else ", rebuilt"))
+    return 1 if drift and check_only else 0
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Rebuild the error log rollups")
+    parser.add_argument("--project-id", type=int, default=None, help="only this project, all projects by default")
+    parser.add_argument("--check", action="store_true", help="only report drift, exit with 1 if there is any")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run_rebuild(args.project_id, args.check)))
@@ -0,0 +1,25 @@
+"""
+Renders the LangGraph graphs to PNGs in backend/images. Rendering goes through mermaid.ink, so it needs network access:
+
+    python -m backend.scripts.render_graphs
+    python -m backend.scripts.render_graphs --graph summary_graph
+"""
+from argparse import ArgumentParser
+
+from backend.helpers.helpers import save_langgraph_graph
+from backend.services.registry import get_service
+
+
+GRAPH_IMAGES = {
+    "error_log_graph": "backend/images/error_log_evaluation_graph.png",
+    "toolbox_graph": "backend/images/tool_box_graph.png",
+    "summary_graph": "backend/images/summary_graph.png",
+}
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Render the LangGraph graphs to PNGs")
+    parser.add_argument("--graph", choices=list(GRAPH_IMAGES), action="append", help="only this graph, can be repeated, all graphs by default")
+    args = parser.parse_args()
+    for name in args.graph or GRAPH_IMAGES:
+        save_langgraph_graph(GRAPH_IMAGES[name], get_service(name))
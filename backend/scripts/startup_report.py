@@ -0,0 +1,59 @@
+"""
+Reports where the app's cold start goes: the import of backend.main, broken down by package from `python -X importtime`,
+then the time each lazily built service takes on first use, e.g.:
+
+    python -m backend.scripts.startup_report
+    python -m backend.scripts.startup_report --top 30 --no-services
+"""
+from argparse import ArgumentParser
+from collections import defaultdict
+import subprocess
+import sys
+import time
+
+
+def import_times(module: str) -> tuple[float, dict[str, int]]:
+    """
+    Imports the module in a fresh interpreter. Returns the wall time and the self time of each top-level package in microseconds.
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    packages: dict[str, int] = defaultdict(int)
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        packages[name.strip().split(".")[0]] += int(self_us)
+    return seconds, packages
+
+
+def service_build_times() -> dict[str, float]:
+    from backend.services.registry import SERVICE_FACTORIES, get_service, get_service_build_times
+
+    for name in SERVICE_FACTORIES:
+        get_service(name)
+    return get_service_build_times()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Report the app's startup time")
+    parser.add_argument("--module", default="backend.main", help="module to import, backend.main by default")
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    parser.add_argument("--no-services", action="store_true", help="skip building the lazy services")
+    args = parser.parse_args()
+
+    seconds, packages = import_times(args.module)
+    print(f"import {args.module}: {seconds:.2f}s wall, including interpreter startup")
+    for name, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1e6:8.3f}s  {name}")
+    print(f"  {sum(packages.values()) / 1e6:8.3f}s  total import time")
+
+    if not args.no_services:
+        print("first use of the lazy services:")
+        for name, build_seconds in service_build_times().items():
+            print(f"  {build_seconds:8.3f}s  {name}")
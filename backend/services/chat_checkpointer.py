@@ -0,0 +1,179 @@
+"""
+Keeps the chat graph's conversations in SQLite instead of process memory, so they survive restarts
+and every uvicorn worker sees the same threads. Threads are capped in size, evicted once idle,
+and the file is compacted in the background.
+"""
+from typing import List, Optional
+import asyncio
+import os
+import time
+
+import aiosqlite
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+
+CHAT_CHECKPOINT_DB = os.getenv("CHAT_CHECKPOINT_DB", "chat_checkpoints.db")
+CHAT_THREAD_MAX_CHECKPOINTS = int(os.getenv("CHAT_THREAD_MAX_CHECKPOINTS", "8")) # Checkpoints kept per thread, the latest holds the whole conversation
+CHAT_THREAD_MAX_BYTES = int(os.getenv("CHAT_THREAD_MAX_BYTES", str(1024 * 1024))) # Checkpoint bytes kept per thread, the latest is kept regardless
+CHAT_THREAD_TTL = int(os.getenv("CHAT_THREAD_TTL_SECONDS", str(7 * 24 * 3600))) # Threads idle for longer are deleted
+CHAT_COMPACT_INTERVAL = int(os.getenv("CHAT_COMPACT_INTERVAL_SECONDS", "600")) # Seconds between compactions, across all workers
+CHAT_CHECKPOINT_TIMEOUT = 30 # Seconds a worker waits for another one's write lock
+
+THREAD_STATEMENTS = [
+    # last activity of each thread, for the idle eviction
+    "CREATE TABLE IF NOT EXISTS chat_threads (thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_chat_threads_updated_at ON chat_threads (updated_at)",
+    # one row per background job, claimed by the worker that runs it
+    "CREATE TABLE IF NOT EXISTS chat_checkpoint_jobs (name TEXT PRIMARY KEY, last_run REAL NOT NULL)",
+    "INSERT OR IGNORE INTO chat_checkpoint_jobs (name, last_run) VALUES ('compact', 0)",
+]
+
+_checkpointer: Optional["BoundedAsyncSqliteSaver"] = None
+_compactor: Optional[asyncio.Task] = None
+
+
+class BoundedAsyncSqliteSaver(AsyncSqliteSaver):
+    """
+    AsyncSqliteSaver that trims each thread to its newest checkpoints as they are written and records when the thread was last used.
+    """
+
+    async def setup(self) -> None:
+        if self.is_setup:
+            return
+        await super().setup()
+        async with self.lock:
+            for statement in THREAD_STATEMENTS:
+                await self.conn.execute(statement)
+            await self.conn.commit()
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        next_config = await super().aput(config, checkpoint, metadata, new_versions)
+        thread_id = str(config["configurable"]["thread_id"])
+        async with self.lock:
+            await self.conn.execute(
+                "INSERT INTO chat_threads (thread_id, updated_at) VALUES (?, ?) ON CONFLICT (thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (thread_id, time.time()),
+            )
+            await self._trim_thread(thread_id)
+            await self.conn.commit()
+        return next_config
+
+    async def _trim_thread(self, thread_id: str) -> int:
+        # checkpoint ids sort by time, across the graph's and the subgraphs' namespaces
+        async with self.conn.execute(
+            "SELECT checkpoint_ns, checkpoint_id, length(checkpoint) + length(metadata) FROM checkpoints WHERE thread_id = ? ORDER BY checkpoint_id DESC",
+            (thread_id,),
+        ) as cursor:
+            rows = await cursor.fetchall()
+        kept = size = 0
+        latest_kept = False
+        stale = []
+        for checkpoint_ns, checkpoint_id, checkpoint_size in rows:
+            size += checkpoint_size or 0
+            # the newest checkpoint of the graph itself is where the conversation resumes from
+            if checkpoint_ns == "" and not latest_kept:
+                latest_kept = True
+            elif kept >= CHAT_THREAD_MAX_CHECKPOINTS or size > CHAT_THREAD_MAX_BYTES:
+                stale.append((thread_id, checkpoint_ns, checkpoint_id))
+                continue
+            kept += 1
+        if stale:
+            await self.conn.executemany("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale)
+            await self.conn.executemany("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale)
+        return len(stale)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await super().adelete_thread(thread_id)
+        async with self.lock:
+            await self.conn.execute("DELETE FROM chat_threads WHERE thread_id = ?", (str(thread_id),))
+            await self.conn.commit()
+
+    async def compact(self, ttl: int = CHAT_THREAD_TTL) -> dict:
+        """
+        Deletes idle threads, trims every thread to the caps (they may have been lowered) and returns the freed pages to the file system.
+        Returns what was removed.
+        """
+        await self.setup()
+        async with self.lock:
+            async with self.conn.execute("SELECT thread_id FROM chat_threads WHERE updated_at < ?", (time.time() - ttl,)) as cursor:
+                idle = [thread_id for thread_id, in await cursor.fetchall()]
+            for statement in [
+                "DELETE FROM checkpoints WHERE thread_id = ?",
+                "DELETE FROM writes WHERE thread_id = ?",
+                "DELETE FROM chat_threads WHERE thread_id = ?",
+            ]:
+                await self.conn.executemany(statement, [(thread_id,) for thread_id in idle])
+
+            async with self.conn.execute(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING count(*) > ? OR sum(length(checkpoint) + length(metadata)) > ?",
+                (CHAT_THREAD_MAX_CHECKPOINTS, CHAT_THREAD_MAX_BYTES),
+            ) as cursor:
+                threads: List[str] = [thread_id for thread_id, in await cursor.fetchall()]
+            trimmed = 0
+            for thread_id in threads:
+                trimmed += await self._trim_thread(thread_id)
+            # writes whose checkpoint is gone, e.g. from a run that failed before its checkpoint was saved
+            orphaned = await self.conn.execute(
+                "DELETE FROM writes WHERE NOT EXISTS (SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id AND c.checkpoint_ns = writes.checkpoint_ns AND c.checkpoint_id = writes.checkpoint_id)"
+            )
+            await self.conn.commit()
+
+            # both pragmas do their work as their rows are stepped through
+            for pragma in ["PRAGMA incremental_vacuum", "PRAGMA wal_checkpoint(TRUNCATE)"]:
+                async with self.conn.execute(pragma) as cursor:
+                    await cursor.fetchall()
+        return {"idle_threads": len(idle), "trimmed_checkpoints": trimmed, "orphaned_writes": orphaned.rowcount}
+
+
+async def claim_compaction(checkpointer: BoundedAsyncSqliteSaver, interval: int) -> bool:
+    # the conditional update lets one worker process run each compaction
+    await checkpointer.setup()
+    async with checkpointer.lock:
+        now = time.time()
+        claimed = await checkpointer.conn.execute(
+            "UPDATE chat_checkpoint_jobs SET last_run = ? WHERE name = 'compact' AND last_run <= ?", (now, now - interval)
+        )
+        await checkpointer.conn.commit()
+    return claimed.rowcount == 1
+
+
+async def compaction_worker(checkpointer: BoundedAsyncSqliteSaver, interval: int = CHAT_COMPACT_INTERVAL) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await claim_compaction(checkpointer, interval):
+                removed = await checkpointer.compact()
+                print(f"Compacted chat checkpoints: {removed}.")
+        except Exception as e:
+            print(f"Failed to compact chat checkpoints: {e}")
+
+
+async def open_chat_checkpointer(path: str = CHAT_CHECKPOINT_DB) -> BoundedAsyncSqliteSaver:
+    """
+    Opens the checkpointer for this process and starts its compaction job. Called from the app's lifespan, before the chat graph is built.
+    """
+    global _checkpointer, _compactor
+    conn = await aiosqlite.connect(path, timeout=CHAT_CHECKPOINT_TIMEOUT)
+    # only takes effect on a new file, lets the compaction shrink it without a full VACUUM
+    await conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    await conn.execute("PRAGMA synchronous = NORMAL")
+    _checkpointer = BoundedAsyncSqliteSaver(conn)
+    await _checkpointer.setup()
+    _compactor = asyncio.create_task(compaction_worker(_checkpointer))
+    return _checkpointer
+
+
+async def close_chat_checkpointer() -> None:
+    global _checkpointer, _compactor
+    if _compactor is not None:
+        _compactor.cancel()
+        await asyncio.gather(_compactor, return_exceptions=True)
+        _compactor = None
+    if _checkpointer is not None:
+        await _checkpointer.conn.close()
+        _checkpointer = None
+
+
+def get_chat_checkpointer() -> Optional[BoundedAsyncSqliteSaver]:
+    # None outside the app, e.g. in the scripts, the graph then keeps no history
+    return _checkpointer
@@ -0,0 +1,78 @@
+from typing import Any, AsyncIterator, Dict
+import json
+
+from backend.helpers.metrics import increment
+from backend.services.chat_summarizer import get_thread_lock
+
+
+TOOLBOX_ROUTE = "TOOLBOX" # What the assistant answers when the request goes to the toolbox, never shown to the user
+
+# Toolbox steps reported to the client while the user waits
+PROGRESS_NODES = {"toolbox", "plan_tool_calls", "tool_box", "tools", "evaluate_tool_response"}
+
+
+def format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def summary_graph_input(message: str) -> Dict[str, Any]:
+    return {
+        "messages": [
+            ("user", message)
+        ],
+        "user_input": message
+    }
+
+
+async def stream_summary(summary_graph, message: str, config: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Runs the summary graph and yields server-sent events as it goes:
+    "token" for each piece of the assistant's answer, "progress" for each toolbox step,
+    "done" with the whole answer once the assistant is finished, and "error" if the graph fails.
+    """
+    # the assistant's tokens are held back while they could still spell out the toolbox route
+    held: Dict[str, str] = {}
+    released = set()
+    answered = False
+    async with get_thread_lock(config["configurable"]["thread_id"]):
+        try:
+            async for namespace, mode, chunk in summary_graph.astream(
+                summary_graph_input(message),
+                config=config,
+                stream_mode=["messages", "updates"],
+                subgraphs=True,
+            ):
+                if mode == "messages":
+                    message_chunk, metadata = chunk
+                    # only the assistant's answer, not the toolbox's models
+                    if namespace or metadata.get("langgraph_node") != "assistant" or not message_chunk.content:
+                        continue
+                    if message_chunk.id in released:
+                        yield format_sse("token", {"content": message_chunk.content})
+                        continue
+                    text = held.get(message_chunk.id, "") + message_chunk.content
+                    if TOOLBOX_ROUTE.startswith(text.strip()):
+                        held[message_chunk.id] = text
+                        continue
+                    held.pop(message_chunk.id, None)
+                    released.add(message_chunk.id)
+                    yield format_sse("token", {"content": text})
+                    continue
+
+                for node, update in chunk.items():
+                    if node in PROGRESS_NODES:
+                        yield format_sse("progress", {"node": node, "depth": len(namespace)})
+                    elif node == "assistant" and not namespace and (update or {}).get("messages"):
+                        answer = update["messages"][-1]
+                        # a short answer that looked like the start of the route is sent whole
+                        if answer.id not in released and answer.content:
+                            yield format_sse("token", {"content": answer.content})
+                        # the answer is complete, the thread is summarized after the stream ends
+                        answered = True
+                        yield format_sse("done", {"message": answer.content})
+        except Exception as e:
+            increment("chat_stream.error")
+            print(f"Failed to stream the chat summary: {e}")
+            yield format_sse("error", {"detail": str(e)})
+            return
+    increment("chat_stream.answered" if answered else "chat_stream.unanswered")
@@ -0,0 +1,88 @@
+"""
+Summarizes long chat threads after the answer has been sent, instead of as the last step of the turn.
+"""
+from typing import Any, Dict, List
+from weakref import WeakValueDictionary
+import asyncio
+import os
+
+from langchain_core.messages import BaseMessage, RemoveMessage
+
+from backend.helpers.metrics import increment
+from backend.services.registry import aget_service
+
+
+CHAT_SUMMARY_KEEP_MESSAGES = int(os.getenv("CHAT_SUMMARY_KEEP_MESSAGES", "10")) # Newest messages of a thread left out of the summary
+
+# One lock per thread in use, turns and summaries of the same thread take it so they don't overwrite each other's checkpoints
+_thread_locks: "WeakValueDictionary[str, asyncio.Lock]" = WeakValueDictionary()
+# Threads being summarized, a turn that ends meanwhile leaves its messages to the next summary
+_in_flight = set()
+
+
+def get_thread_lock(thread_id: str) -> asyncio.Lock:
+    lock = _thread_locks.get(thread_id)
+    if lock is None:
+        lock = _thread_locks[thread_id] = asyncio.Lock()
+    return lock
+
+
+def get_summary_prompt(to_summarize: List[BaseMessage], summary: str) -> str:
+    return (
+        "You are a helpful assistant that can help summarize content."
+        "Here is the content to be summarized:\n"
+        f"{to_summarize}\n"
+        "Here is the summary from your previous attempt at summarizing the content, which may simply be another summary or nothing at all:\n"
+        f"{summary}\n"
+        "Summarize the content, including the old summary, in a concise and informative manner, focusing on the main points and key insights. DO NOT REPEAT THE OLD SUMMARY.\n"
+    )
+
+
+async def summarize_thread(thread_id: str) -> bool:
+    """
+    Folds all but the newest CHAT_SUMMARY_KEEP_MESSAGES messages of a thread into its summary and writes it back to the checkpoint.
+    The LLM call runs without the thread lock. The write is skipped if the thread changed underneath it,
+    e.g. another worker summarized it first, so running it twice for the same turn is harmless.
+    Returns whether the summary was written.
+    """
+    if thread_id in _in_flight:
+        return False
+    _in_flight.add(thread_id)
+    try:
+        summary_graph = await aget_service("summary_graph")
+        config: Dict[str, Any] = {"configurable": {"thread_id": thread_id}}
+        state = await summary_graph.aget_state(config)
+        messages = state.values.get("messages", [])
+        if len(messages) <= CHAT_SUMMARY_KEEP_MESSAGES:
+            return False
+        to_summarize = messages[:-CHAT_SUMMARY_KEEP_MESSAGES]
+        summary = state.values.get("summary", "")
+
+        llm = await aget_service("llm")
+        response = await llm.ainvoke(get_summary_prompt(to_summarize, summary))
+
+        async with get_thread_lock(thread_id):
+            state = await summary_graph.aget_state(config)
+            current_ids = {message.id for message in state.values.get("messages", [])}
+            if state.values.get("summary", "") != summary or any(message.id not in current_ids for message in to_summarize):
+                increment("chat_summarizer.stale")
+                return False
+            # written as if by the assistant, its edge ends the run, so nothing else is scheduled
+            await summary_graph.aupdate_state(
+                config,
+                {"summary": response.content, "messages": [RemoveMessage(id=message.id) for message in to_summarize]},
+                as_node="assistant",
+            )
+        increment("chat_summarizer.written")
+        return True
+    finally:
+        _in_flight.discard(thread_id)
+
+
+async def summarize_thread_in_background(thread_id: str) -> None:
+    # run as a background task, after the response has been sent
+    try:
+        await summarize_thread(thread_id)
+    except Exception as e:
+        increment("chat_summarizer.failed")
+        print(f"Failed to summarize chat thread {thread_id}: {e}")
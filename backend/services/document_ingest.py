@@ -0,0 +1,66 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+import asyncio
+import multiprocessing
+import os
+
+from langchain_core.documents import Document
+
+from backend.helpers.document_parser import count_file_parts, parse_file_part
+from backend.helpers.metrics import increment
+from backend.services.vector_db import get_vector_db
+from backend.services.vector_writer import write_documents
+
+
+DOCUMENT_PARSE_WORKERS = int(os.getenv("DOCUMENT_PARSE_WORKERS", str(min(4, os.cpu_count() or 1)))) # Processes parsing uploaded files
+DOCUMENT_PARTS_IN_FLIGHT = int(os.getenv("DOCUMENT_PARTS_IN_FLIGHT", "2")) # Parts of one file parsed ahead of the one being embedded
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    if _parse_pool is None:
+        # spawn, forking a process that runs threads and an event loop isn't safe
+        _parse_pool = ProcessPoolExecutor(max_workers=DOCUMENT_PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _parse_pool
+
+
+def shutdown_parse_pool() -> None:
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(cancel_futures=True)
+        _parse_pool = None
+
+
+async def add_file_path_to_vector_db(collection_name: str, path: str, filename: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """
+    Parses, splits and stores a file from disk a part at a time, so memory follows the part size and not the file size.
+    Parts are parsed in the process pool while the previous part is being embedded,
+    and several files can be ingested at once without blocking the event loop.
+    Returns the number of chunks parsed and added.
+    """
+    collection = get_vector_db(collection_name)
+    metadata = {**(metadata or {}), "created_timestamp": int(datetime.now().timestamp())} # Unix timestamp
+    loop = asyncio.get_running_loop()
+    pool = get_parse_pool()
+
+    parts = await loop.run_in_executor(pool, count_file_parts, path, filename)
+    pending = []
+    next_part = 0
+    chunks = added = 0
+    while next_part < parts or pending:
+        # keep a few parts parsing ahead of the writes
+        while next_part < parts and len(pending) < DOCUMENT_PARTS_IN_FLIGHT:
+            pending.append(loop.run_in_executor(pool, parse_file_part, path, filename, next_part))
+            next_part += 1
+        part_chunks = await pending.pop(0)
+        docs = [Document(page_content=text, metadata={**metadata, **location}) for text, location in part_chunks]
+        # already split, write_documents batches them at the embedding model's max batch size
+        added += await asyncio.to_thread(write_documents, collection, docs, None)
+        chunks += len(docs)
+
+    increment("document_ingest.file")
+    increment("document_ingest.chunk", chunks)
+    return {"chunks": chunks, "added": added}
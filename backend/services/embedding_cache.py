@@ -0,0 +1,99 @@
+from array import array
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, List
+import hashlib
+import os
+
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from backend.database import SessionLocal
+from backend.db_models.db_models import EmbeddingCache
+from backend.helpers.metrics import increment
+
+
+EMBEDDING_CACHE_LOOKUP_SIZE = 500 # Hashes looked up per query
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "512")) # Query embeddings kept in memory
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def get_cached_embeddings(model: str, text_hashes: Iterable[str]) -> Dict[str, List[float]]:
+    text_hashes = list(text_hashes)
+    embeddings = {}
+    with SessionLocal() as db:
+        for start in range(0, len(text_hashes), EMBEDDING_CACHE_LOOKUP_SIZE):
+            rows = db.execute(
+                select(EmbeddingCache.text_hash, EmbeddingCache.embedding)
+                .filter(EmbeddingCache.model == model, EmbeddingCache.text_hash.in_(text_hashes[start:start + EMBEDDING_CACHE_LOOKUP_SIZE]))
+            ).all()
+            for row in rows:
+                embeddings[row.text_hash] = array("f", row.embedding).tolist()
+    return embeddings
+
+
+def cache_embeddings(model: str, embeddings: Dict[str, List[float]]) -> None:
+    with SessionLocal() as db:
+        for hash_, embedding in embeddings.items():
+            try:
+                with db.begin_nested():
+                    db.add(EmbeddingCache(model=model, text_hash=hash_, embedding=array("f", embedding).tobytes()))
+            except IntegrityError:
+                # another process embedded the same text first
+                pass
+        db.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model with a persistent cache keyed by (model, sha256 of the text).
+    Only texts that were never embedded with this model reach the provider.
+    Query embeddings are only kept in an in-memory LRU, queries are too varied to be worth storing.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str):
+        self.embeddings = embeddings
+        self.model = model
+        self._queries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._queries_lock = Lock()
+
+    @property
+    def batch_size(self) -> int:
+        # the most texts the provider takes in one request, OpenAIEmbeddings calls it chunk_size
+        return getattr(self.embeddings, "chunk_size", 1000)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(text) for text in texts]
+        embeddings = get_cached_embeddings(self.model, set(hashes))
+
+        # each distinct text is embedded once, even if it repeats in the batch
+        missing = {hash_: text for hash_, text in zip(hashes, texts) if hash_ not in embeddings}
+        if missing:
+            new_embeddings = dict(zip(missing, self.embeddings.embed_documents(list(missing.values()))))
+            cache_embeddings(self.model, new_embeddings)
+            embeddings.update(new_embeddings)
+
+        increment("embedding_cache.hit", len(texts) - len(missing))
+        increment("embedding_cache.miss", len(missing))
+        return [embeddings[hash_] for hash_ in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._queries_lock:
+            embedding = self._queries.get(text)
+            if embedding is not None:
+                self._queries.move_to_end(text)
+        if embedding is not None:
+            increment("query_embedding_cache.hit")
+            return embedding
+
+        increment("query_embedding_cache.miss")
+        embedding = self.embeddings.embed_query(text)
+        with self._queries_lock:
+            self._queries[text] = embedding
+            while len(self._queries) > QUERY_EMBEDDING_CACHE_SIZE:
+                self._queries.popitem(last=False)
+        return embedding
@@ -0,0 +1,182 @@
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import os
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db_models.db_models import ErrorGroup, ErrorGroupBucket, ErrorLog
+from backend.helpers.fingerprint import fingerprint_traceback
+from backend.pydantic_models.error_models import ErrorLogBase
+from backend.services.error_log_rollups import (
+    BUCKET_KEY_COLUMNS, REBUILD_BATCH_SIZE, add_to_rollups, apply_count_deltas, count_group_report, hour_bucket, move_group_status, rebuild_rollups, remove_from_rollups,
+)
+
+
+ERROR_GROUP_MAX_SAMPLES = int(os.getenv("ERROR_GROUP_MAX_SAMPLES", "10")) # Reports kept per group
+
+
+async def get_or_create_error_group(db: AsyncSession, project_id: int, fingerprint: str, error_log: ErrorLogBase) -> ErrorGroup:
+    group = await db.scalar(select(ErrorGroup).filter(ErrorGroup.project_id == project_id, ErrorGroup.fingerprint == fingerprint))
+    if group:
+        return group
+
+    now = datetime.now()
+    group = ErrorGroup(
+        project_id=project_id,
+        fingerprint=fingerprint,
+        error_type=error_log.error_type,
+        error_message=error_log.error_message,
+        source=error_log.source,
+        line_number=error_log.line_number,
+        first_seen=now,
+        last_seen=now,
+        occurrence_count=0,
+    )
+    try:
+        async with db.begin_nested():
+            db.add(group)
+    except IntegrityError:
+        # another request created the group first
+        group = (await db.scalars(select(ErrorGroup).filter(ErrorGroup.project_id == project_id, ErrorGroup.fingerprint == fingerprint))).one()
+    return group
+
+
+async def record_error_log(db: AsyncSession, project_id: int, fingerprint: str, error_log: ErrorLogBase, new_error_log: Optional[ErrorLog] = None) -> tuple[ErrorLog, List[int]]:
+    """
+    Upserts the group for the fingerprint, counts the report and stores it as one of the group's samples.
+    Pass new_error_log to fill in an existing row (e.g. a queued one) instead of adding a new one.
+    Only the most recent ERROR_GROUP_MAX_SAMPLES reports of a group are kept, the pruned ones stay counted.
+    Returns the error log and the ids of the samples pruned, remove those from the index after the caller commits.
+    """
+    group = await get_or_create_error_group(db, project_id, fingerprint, error_log)
+
+    # a resolved issue that happens again is a regression, ignored issues stay ignored
+    if group.status == "resolved":
+        await update_error_group_status(db, group, "pending")
+    group.occurrence_count = ErrorGroup.occurrence_count + 1
+    group.last_seen = datetime.now()
+
+    if new_error_log is None:
+        new_error_log = ErrorLog(project_id=project_id)
+        db.add(new_error_log)
+    else:
+        # the queued log was counted on its own until now
+        await remove_from_rollups(db, [new_error_log])
+    for key, value in error_log.model_dump().items():
+        setattr(new_error_log, key, value)
+    new_error_log.group_id = group.id
+    new_error_log.status = group.status
+    await db.flush()
+    # the counter was updated with a SQL expression, load its new value
+    await db.refresh(group, ["occurrence_count"])
+    await count_group_report(db, group, new_error_log.created_timestamp)
+
+    return new_error_log, await prune_samples(db, group)
+
+
+async def prune_samples(db: AsyncSession, group: ErrorGroup) -> List[int]:
+    # deletes all but the group's newest ERROR_GROUP_MAX_SAMPLES reports, they stay counted, returns the ids deleted
+    stale_ids = (await db.scalars(
+        select(ErrorLog.id)
+        .filter(ErrorLog.group_id == group.id)
+        .order_by(ErrorLog.id.desc())
+        .offset(ERROR_GROUP_MAX_SAMPLES)
+    )).all()
+    if stale_ids:
+        await db.execute(delete(ErrorLog).filter(ErrorLog.id.in_(stale_ids)).execution_options(synchronize_session=False))
+    return list(stale_ids)
+
+
+async def update_error_group_status(db: AsyncSession, group: ErrorGroup, status: str) -> ErrorGroup:
+    # every report of the group moves to the new status in the rollups, not only the samples still kept
+    old_status = group.status
+    group.status = status
+    await db.execute(update(ErrorLog).filter(ErrorLog.group_id == group.id).values(status=status).execution_options(synchronize_session=False))
+    await move_group_status(db, group, old_status)
+    return group
+
+
+async def update_error_log(db: AsyncSession, error_log: ErrorLog, changes: Dict[str, Any]) -> None:
+    """
+    Applies the changes of an error log update and keeps the counts in step. The caller commits.
+    A grouped error log shares its group's status, so a new status is the group's, with all of its reports.
+    Check that a grouped error log isn't moved to another project first, its reports are counted under the group's.
+    """
+    if error_log.group_id is None:
+        await remove_from_rollups(db, [error_log])
+        for key, value in changes.items():
+            setattr(error_log, key, value)
+        await add_to_rollups(db, [error_log])
+        return
+    status = changes.pop("status", None)
+    for key, value in changes.items():
+        setattr(error_log, key, value)
+    if status and status != error_log.status:
+        await update_error_group_status(db, await db.get(ErrorGroup, error_log.group_id), status)
+
+
+async def uncount_error_log(db: AsyncSession, error_log: ErrorLog) -> None:
+    """
+    Takes an error log that is about to be deleted out of the counts, its group's too if it has one. The caller deletes it and commits.
+    """
+    if error_log.group_id is None:
+        await remove_from_rollups(db, [error_log])
+        return
+    group = await db.get(ErrorGroup, error_log.group_id)
+    group.occurrence_count = ErrorGroup.occurrence_count - 1
+    await count_group_report(db, group, error_log.created_timestamp, -1)
+
+
+async def backfill_error_groups(db: AsyncSession) -> List[int]:
+    """
+    Groups the parsed error logs stored before error groups existed, by the fingerprint of their traceback.
+    A group takes the status of its newest log and so do its other logs, only its newest ERROR_GROUP_MAX_SAMPLES are kept
+    and the rollups are rebuilt after. Run it at startup, before the ingest workers. Commits and returns the ids of the
+    pruned logs, the caller removes them from the index.
+    """
+    groups: Dict[tuple, ErrorGroup] = {}
+    buckets = Counter()
+    statuses: Dict[int, str] = {}
+    last_id = 0
+    while True:
+        error_logs = (await db.scalars(
+            select(ErrorLog)
+            .filter(ErrorLog.group_id.is_(None), ErrorLog.status.not_in(["queued", "parse_failed"]), ErrorLog.id > last_id)
+            .order_by(ErrorLog.id)
+            .limit(REBUILD_BATCH_SIZE)
+        )).all()
+        if not error_logs:
+            break
+        for error_log in error_logs:
+            # the raw report isn't stored, its stored traceback fingerprints the same (see fingerprint_traceback)
+            fingerprint = fingerprint_traceback(error_log.traceback or f"{error_log.error_type}: {error_log.error_message}")
+            group = groups.get((error_log.project_id, fingerprint))
+            if group is None:
+                group = await get_or_create_error_group(db, error_log.project_id, fingerprint, error_log)
+                if not group.occurrence_count:
+                    group.first_seen = group.last_seen = error_log.created_timestamp
+                groups[(error_log.project_id, fingerprint)] = group
+            group.occurrence_count = (group.occurrence_count or 0) + 1
+            group.first_seen = min(group.first_seen, error_log.created_timestamp)
+            group.last_seen = max(group.last_seen, error_log.created_timestamp)
+            statuses[group.id] = error_log.status
+            buckets[(group.id, hour_bucket(error_log.created_timestamp))] += 1
+            error_log.group_id = group.id
+        last_id = error_logs[-1].id
+        await db.flush()
+    if not buckets:
+        return []
+
+    stale_ids = []
+    for group in groups.values():
+        group.status = statuses[group.id]
+        await db.execute(update(ErrorLog).filter(ErrorLog.group_id == group.id).values(status=group.status).execution_options(synchronize_session=False))
+        stale_ids += await prune_samples(db, group)
+    await apply_count_deltas(db, ErrorGroupBucket, BUCKET_KEY_COLUMNS, buckets)
+    # the logs were counted on their own until now
+    await rebuild_rollups(db)
+    await db.commit()
+    return stale_ids
@@ -0,0 +1,73 @@
+from typing import AsyncIterator, Iterator, List
+import csv
+import io
+import zlib
+
+from sqlalchemy import select
+
+from backend.database import AsyncSessionLocal
+from backend.db_models.db_models import ErrorLog
+from backend.pydantic_models.error_models import ErrorLogExportFilters, ErrorLogResponse
+from backend.services.error_log_queries import filter_error_logs
+
+
+EXPORT_BATCH_SIZE = 1000 # Rows fetched from the cursor and written per chunk
+EXPORT_COLUMNS = list(ErrorLogResponse.model_fields)
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def format_ndjson(error_logs: List[ErrorLogResponse], header: bool) -> str:
+    return "".join(error_log.model_dump_json() + "\n" for error_log in error_logs)
+
+
+def format_csv(error_logs: List[ErrorLogResponse], header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for error_log in error_logs:
+        row = error_log.model_dump(mode="json")
+        writer.writerow([row[column] for column in EXPORT_COLUMNS])
+    return buffer.getvalue()
+
+
+async def export_error_logs(project_id: int, filters: ErrorLogExportFilters) -> AsyncIterator[bytes]:
+    """
+    Streams the matching error logs of a project as NDJSON or CSV, oldest first, gzipped if asked for.
+    Rows come from a server-side cursor in batches of EXPORT_BATCH_SIZE, so memory stays constant regardless of project size.
+    The session is opened here rather than taken from the route, it has to live as long as the response.
+    """
+    formatter = format_csv if filters.format == "csv" else format_ndjson
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if filters.gzip else None # gzip container
+
+    def encode(text: str) -> Iterator[bytes]:
+        data = text.encode("utf-8")
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            yield data
+
+    header = True
+    async with AsyncSessionLocal() as db:
+        # plain rows instead of ORM objects, nothing is kept in the identity map
+        query = (
+            filter_error_logs(select(*ErrorLog.__table__.columns).filter(ErrorLog.project_id == project_id), filters)
+            .order_by(ErrorLog.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        result = await db.stream(query)
+        async for rows in result.mappings().partitions():
+            error_logs = [ErrorLogResponse.model_validate(row) for row in rows]
+            for data in encode(formatter(error_logs, header)):
+                yield data
+            header = False
+
+    if header:
+        # an empty project still gets a CSV header
+        for data in encode(formatter([], header)):
+            yield data
+    if compressor:
+        yield compressor.flush()
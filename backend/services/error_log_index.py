@@ -0,0 +1,88 @@
+from typing import Iterable, List
+import os
+
+from langchain_core.documents import Document
+
+from backend.db_models.db_models import ErrorLog
+from backend.services.registry import get_service
+from backend.services.vector_db import COLLECTION_NAME, get_vector_db, get_vector_writer
+
+
+ERROR_LOG_INDEX_TRACEBACK_CHARS = int(os.getenv("ERROR_LOG_INDEX_TRACEBACK_CHARS", "2000")) # Tail of the traceback that is embedded
+SIMILAR_ERROR_LOG_OVERFETCH = 2 # Times k results fetched for similar error logs, deleted ones that are still indexed are skipped
+
+
+def error_log_document_id(error_log_id: int) -> str:
+    return f"error_log-{error_log_id}"
+
+
+def error_log_text(error_log: ErrorLog) -> str:
+    # the innermost frames are at the end, that's the part worth embedding
+    traceback = (error_log.traceback or "")[-ERROR_LOG_INDEX_TRACEBACK_CHARS:]
+    return f"{error_log.error_type}: {error_log.error_message}\n{error_log.source}:{error_log.line_number}\n{traceback}"
+
+
+def error_log_document(error_log: ErrorLog) -> Document:
+    return Document(
+        id=error_log_document_id(error_log.id),
+        page_content=error_log_text(error_log),
+        # Chroma doesn't take None in metadata
+        metadata={
+            "error_log_id": error_log.id,
+            "project_id": error_log.project_id,
+            "status": error_log.status or "",
+            "error_type": error_log.error_type or "",
+        },
+    )
+
+
+def index_error_logs(error_logs: Iterable[ErrorLog]) -> None:
+    """
+    Queues parsed error logs for the project_errors collection, call it after the commit.
+    Indexing an error log again updates its metadata. The embedding is cached, so that doesn't cost a provider call.
+    """
+    docs = [error_log_document(error_log) for error_log in error_logs if error_log.error_type]
+    if not docs:
+        return
+    try:
+        get_vector_writer(COLLECTION_NAME).add(docs)
+    except Exception as e:
+        # the error log is stored either way, it can be indexed again later
+        print(f"Failed to index error logs: {e}")
+
+
+def remove_error_logs_from_index(error_log_ids: Iterable[int]) -> None:
+    """
+    Queues deleted error logs for removal from the project_errors collection, call it after the commit.
+    They are deleted with the writer's next batch, the similar errors endpoint skips them until then.
+    """
+    ids = [error_log_document_id(error_log_id) for error_log_id in error_log_ids]
+    if not ids:
+        return
+    try:
+        get_vector_writer(COLLECTION_NAME).delete(ids)
+    except Exception as e:
+        print(f"Failed to remove error logs from the index: {e}")
+
+
+def get_error_log_embedding(error_log: ErrorLog) -> List[float]:
+    stored = get_vector_db(COLLECTION_NAME).get(ids=[error_log_document_id(error_log.id)], include=["embeddings"])
+    if len(stored["ids"]):
+        return list(stored["embeddings"][0])
+    # not indexed yet, the cache usually has it anyway
+    return get_service("embedding").embed_documents([error_log_text(error_log)])[0]
+
+
+def find_similar_error_log_ids(error_log: ErrorLog, k: int) -> List[tuple[int, float]]:
+    """
+    Returns the ids of the error logs of the same project closest to this one, with their distance (lower is closer),
+    SIMILAR_ERROR_LOG_OVERFETCH times k of them, the caller skips the ones that no longer exist and keeps k.
+    The project filter is part of the vector query, so k results come back even when other projects are closer.
+    """
+    results = get_vector_db(COLLECTION_NAME).similarity_search_by_vector_with_relevance_scores(
+        get_error_log_embedding(error_log),
+        k=k * SIMILAR_ERROR_LOG_OVERFETCH,
+        # $ne also matches documents without an error_log_id, $gt keeps out the ones that aren't error logs
+        filter={"$and": [{"project_id": error_log.project_id}, {"error_log_id": {"$ne": error_log.id}}, {"error_log_id": {"$gt": 0}}]},
+    )
+    return [(doc.metadata["error_log_id"], distance) for doc, distance in results]
@@ -0,0 +1,53 @@
+from backend.pydantic_models.error_models import ErrorLogBase
+from backend.services.parse_cache import cache_error_log
+from backend.services.registry import aget_service
+from backend.helpers.fingerprint import fingerprint_traceback
+from backend.helpers.metrics import increment
+from typing import List, NamedTuple, Optional
+import asyncio
+import os
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+ERROR_LOG_BATCH_CONCURRENCY = int(os.getenv("ERROR_LOG_BATCH_CONCURRENCY", "32")) # Max graphs running at once per batch
+
+
+class ParsedErrorLog(NamedTuple):
+    error_log: ErrorLogBase
+    parsed_by: str # "local", "cache" or "llm"
+    fingerprint: str
+
+
+async def parse_error_log_input(traceback: str, db: Optional[AsyncSession] = None) -> ParsedErrorLog:
+    """
+    Parses a raw traceback into an ErrorLogBase.
+    Returns the parsed error log, the path that handled it and the traceback's fingerprint.
+    Pass the request's session for the parse cache to use it instead of another connection, it is committed, so nothing may be pending in it.
+    Concurrent parses can't share a session.
+    """
+    graph = await aget_service("error_log_graph")
+    error_log_response = await graph.ainvoke({"input": traceback}, config={"configurable": {"db": db}})
+    parsed_by = error_log_response.get("parsed_by", "llm")
+    increment(f"error_log_parser.{parsed_by}")
+    print(f"Error log parsed by '{parsed_by}'.")
+    new_error_log = ErrorLogBase.model_validate(error_log_response.get("output"))
+    fingerprint = error_log_response.get("fingerprint") or fingerprint_traceback(traceback)
+    if parsed_by == "llm" and error_log_response.get("success"):
+        await cache_error_log(fingerprint, new_error_log, db)
+    return ParsedErrorLog(new_error_log, parsed_by, fingerprint)
+
+
+async def parse_error_log_inputs(tracebacks: List[str], concurrency: int = ERROR_LOG_BATCH_CONCURRENCY) -> List[ParsedErrorLog | Exception]:
+    """
+    Parses tracebacks concurrently, with at most `concurrency` graphs running at once.
+    Failed parses are returned as the exception in place of the result.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def parse(traceback: str) -> ParsedErrorLog:
+        async with semaphore:
+            return await parse_error_log_input(traceback)
+
+    return await asyncio.gather(*(parse(traceback) for traceback in tracebacks), return_exceptions=True)
+
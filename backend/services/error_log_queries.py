@@ -0,0 +1,40 @@
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db_models.db_models import ErrorLog
+from backend.helpers.pagination import decode_cursor, encode_cursor
+from backend.pydantic_models.error_models import ErrorLogFilterBase, ErrorLogFilters, ErrorLogPage
+
+
+def filter_error_logs(query: Select, filters: ErrorLogFilterBase) -> Select:
+    if filters.status:
+        query = query.filter(ErrorLog.status == filters.status)
+    if filters.error_type:
+        query = query.filter(ErrorLog.error_type == filters.error_type)
+    if filters.source:
+        query = query.filter(ErrorLog.source == filters.source)
+    if filters.created_after:
+        query = query.filter(ErrorLog.created_timestamp >= filters.created_after)
+    if filters.created_before:
+        query = query.filter(ErrorLog.created_timestamp < filters.created_before)
+    return query
+
+
+async def get_error_log_page(db: AsyncSession, project_id: int, filters: ErrorLogFilters) -> ErrorLogPage:
+    """
+    Returns one page of a project's error logs, newest first.
+    Pages continue from the cursor with a (created_timestamp, id) seek instead of an offset,
+    so every page is an index range scan no matter how deep into the table it is.
+    Raises ValueError for an invalid cursor.
+    """
+    query = filter_error_logs(select(ErrorLog).filter(ErrorLog.project_id == project_id), filters)
+    if filters.cursor:
+        query = query.filter(tuple_(ErrorLog.created_timestamp, ErrorLog.id) < tuple_(*decode_cursor(filters.cursor)))
+    query = query.order_by(ErrorLog.created_timestamp.desc(), ErrorLog.id.desc()).limit(filters.limit + 1)
+
+    error_logs = (await db.scalars(query)).all()
+    next_cursor = None
+    if len(error_logs) > filters.limit:
+        error_logs = error_logs[:filters.limit]
+        next_cursor = encode_cursor(error_logs[-1].created_timestamp, error_logs[-1].id)
+    return ErrorLogPage(items=error_logs, next_cursor=next_cursor)
@@ -0,0 +1,194 @@
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db_models.db_models import ErrorGroup, ErrorGroupBucket, ErrorLog, ErrorLogRollup
+from backend.pydantic_models.project_models import ProjectStatsFilters, ProjectStatsResponse, StatsBucket, StatsCount
+
+
+REBUILD_BATCH_SIZE = 1000 # Error logs read per batch while rebuilding
+
+# The error log columns a rollup row is keyed on, for error logs that aren't in a group (queued or failed to parse)
+ROLLUP_COLUMNS = (ErrorLog.project_id, ErrorLog.created_timestamp, ErrorLog.error_type, ErrorLog.source, ErrorLog.status)
+ROLLUP_KEY_COLUMNS = (ErrorLogRollup.project_id, ErrorLogRollup.bucket, ErrorLogRollup.error_type, ErrorLogRollup.source, ErrorLogRollup.status)
+BUCKET_KEY_COLUMNS = (ErrorGroupBucket.group_id, ErrorGroupBucket.bucket)
+
+RollupKey = tuple[int, datetime, str, str, str]
+
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_key(error_log) -> RollupKey:
+    # works for ErrorLog objects and for rows of ROLLUP_COLUMNS
+    return (
+        error_log.project_id,
+        hour_bucket(error_log.created_timestamp),
+        error_log.error_type or "",
+        error_log.source or "",
+        error_log.status or "",
+    )
+
+
+def group_rollup_key(group: ErrorGroup, bucket: datetime, status: Optional[str] = None) -> RollupKey:
+    # grouped reports are counted under the group's columns, so a status change moves all of them
+    return (group.project_id, bucket, group.error_type or "", group.source or "", (status or group.status) or "")
+
+
+async def apply_count_deltas(db: AsyncSession, model, key_columns: tuple, deltas: Counter) -> None:
+    """
+    Adds the deltas to the count column of the rows of model keyed on key_columns, creating the missing rows.
+    """
+    # sorted so concurrent transactions lock the rows in the same order
+    for key, delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        increment = (
+            update(model)
+            .filter(*(column == value for column, value in zip(key_columns, key)))
+            .values(count=model.count + delta)
+            .execution_options(synchronize_session=False)
+        )
+        if (await db.execute(increment)).rowcount:
+            continue
+        try:
+            async with db.begin_nested():
+                db.add(model(count=delta, **{column.key: value for column, value in zip(key_columns, key)}))
+        except IntegrityError:
+            # another transaction created the row first
+            await db.execute(increment)
+
+
+async def apply_rollup_deltas(db: AsyncSession, deltas: Counter) -> None:
+    await apply_count_deltas(db, ErrorLogRollup, ROLLUP_KEY_COLUMNS, deltas)
+
+
+async def add_to_rollups(db: AsyncSession, error_logs: Iterable) -> None:
+    """
+    Counts error logs that aren't in a group in the rollups, call it once they are flushed or after they changed. The caller commits.
+    Grouped error logs are skipped, their reports are counted with count_group_report.
+    """
+    await apply_rollup_deltas(db, Counter(rollup_key(error_log) for error_log in error_logs if getattr(error_log, "group_id", None) is None))
+
+
+async def remove_from_rollups(db: AsyncSession, error_logs: Iterable) -> None:
+    """
+    Uncounts error logs that aren't in a group from the rollups, call it before they are deleted or changed. The caller commits.
+    """
+    deltas = Counter()
+    deltas.subtract(rollup_key(error_log) for error_log in error_logs if getattr(error_log, "group_id", None) is None)
+    await apply_rollup_deltas(db, deltas)
+
+
+async def count_group_report(db: AsyncSession, group: ErrorGroup, timestamp: datetime, delta: int = 1) -> None:
+    """
+    Counts a report of the group in its hourly bucket and in the rollups, or uncounts it with delta=-1 when it is deleted.
+    Pruning samples doesn't uncount them. The caller commits.
+    """
+    bucket = hour_bucket(timestamp)
+    await apply_count_deltas(db, ErrorGroupBucket, BUCKET_KEY_COLUMNS, Counter({(group.id, bucket): delta}))
+    await apply_rollup_deltas(db, Counter({group_rollup_key(group, bucket): delta}))
+
+
+async def move_group_status(db: AsyncSession, group: ErrorGroup, old_status: str) -> None:
+    """
+    Moves all of the group's reports from old_status to its current status in the rollups. The caller commits.
+    """
+    if (old_status or "") == (group.status or ""):
+        return
+    deltas = Counter()
+    buckets = await db.execute(select(ErrorGroupBucket.bucket, ErrorGroupBucket.count).filter(ErrorGroupBucket.group_id == group.id))
+    for bucket, count in buckets.all():
+        deltas[group_rollup_key(group, bucket, old_status)] -= count
+        deltas[group_rollup_key(group, bucket)] += count
+    await apply_rollup_deltas(db, deltas)
+
+
+async def get_project_stats(db: AsyncSession, project_id: int, filters: ProjectStatsFilters) -> ProjectStatsResponse:
+    """
+    Counts a project's error logs by error_type, source, status and hour or day, reading only the rollups.
+    """
+    conditions = [ErrorLogRollup.project_id == project_id]
+    if filters.status:
+        conditions.append(ErrorLogRollup.status == filters.status)
+    if filters.error_type:
+        conditions.append(ErrorLogRollup.error_type == filters.error_type)
+    if filters.source:
+        conditions.append(ErrorLogRollup.source == filters.source)
+    if filters.created_after:
+        conditions.append(ErrorLogRollup.bucket >= hour_bucket(filters.created_after))
+    if filters.created_before:
+        conditions.append(ErrorLogRollup.bucket < filters.created_before)
+
+    total = func.sum(ErrorLogRollup.count)
+
+    async def count_by(column) -> List[tuple]:
+        query = select(column, total).filter(*conditions).group_by(column).having(total > 0)
+        return (await db.execute(query)).all()
+
+    def counts(rows: List[tuple]) -> List[StatsCount]:
+        return [StatsCount(value=value or None, count=count) for value, count in sorted(rows, key=lambda row: -row[1])]
+
+    by_status = await count_by(ErrorLogRollup.status)
+    timeline = Counter()
+    for bucket, count in await count_by(ErrorLogRollup.bucket):
+        if filters.interval == "day":
+            bucket = bucket.replace(hour=0)
+        timeline[bucket] += count
+
+    return ProjectStatsResponse(
+        total=sum(count for _, count in by_status),
+        by_error_type=counts(await count_by(ErrorLogRollup.error_type)),
+        by_source=counts(await count_by(ErrorLogRollup.source)),
+        by_status=counts(by_status),
+        timeline=[StatsBucket(bucket=bucket, count=count) for bucket, count in sorted(timeline.items())],
+    )
+
+
+async def rebuild_rollups(db: AsyncSession, project_id: Optional[int] = None, check_only: bool = False) -> List[tuple]:
+    """
+    Recomputes the rollups, for one project or all of them: grouped reports from the groups' hourly buckets,
+    which still count the samples pruned since, and the error logs that aren't in a group from error_logs.
+    Returns the drifted keys as (key, count in the rollups, recomputed count).
+    Unless check_only is set, the rollups are replaced with the recomputed counts. The caller commits.
+    Writes that land while the counts are being read can show up as drift, run it while ingest is quiet.
+    """
+    log_query = select(*ROLLUP_COLUMNS).filter(ErrorLog.group_id.is_(None))
+    bucket_query = select(ErrorGroup, ErrorGroupBucket.bucket, ErrorGroupBucket.count).join(ErrorGroupBucket, ErrorGroupBucket.group_id == ErrorGroup.id)
+    rollup_query = select(ErrorLogRollup)
+    if project_id is not None:
+        log_query = log_query.filter(ErrorLog.project_id == project_id)
+        bucket_query = bucket_query.filter(ErrorGroup.project_id == project_id)
+        rollup_query = rollup_query.filter(ErrorLogRollup.project_id == project_id)
+
+    expected = Counter()
+    result = await db.stream(log_query.execution_options(yield_per=REBUILD_BATCH_SIZE))
+    async for error_log in result:
+        expected[rollup_key(error_log)] += 1
+    for group, bucket, count in (await db.execute(bucket_query)).all():
+        expected[group_rollup_key(group, bucket)] += count
+    expected = Counter({key: count for key, count in expected.items() if count})
+
+    actual = Counter()
+    for rollup in (await db.scalars(rollup_query)).all():
+        actual[(rollup.project_id, rollup.bucket, rollup.error_type, rollup.source, rollup.status)] += rollup.count
+
+    drift = [(key, actual[key], expected[key]) for key in sorted(actual.keys() | expected.keys()) if actual[key] != expected[key]]
+    if check_only:
+        return drift
+
+    delete_query = delete(ErrorLogRollup)
+    if project_id is not None:
+        delete_query = delete_query.filter(ErrorLogRollup.project_id == project_id)
+    await db.execute(delete_query)
+    if expected:
+        await db.execute(insert(ErrorLogRollup), [
+            {"project_id": key[0], "bucket": key[1], "error_type": key[2], "source": key[3], "status": key[4], "count": count}
+            for key, count in expected.items()
+        ])
+    return drift
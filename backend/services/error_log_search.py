@@ -0,0 +1,110 @@
+from typing import List
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db_models.db_models import ErrorLog
+from backend.pydantic_models.error_models import ErrorLogSearchFilters, ErrorLogSearchPage, ErrorLogSearchResult
+
+
+SEARCH_SNIPPET_TOKENS = 16 # Tokens of context around the match in a snippet
+SEARCH_HIGHLIGHT = ("<mark>", "</mark>")
+
+# External content table, the text stays in error_logs and only the index is stored here.
+# project_id is indexed as a token so the MATCH itself is scoped to the project, instead of ranking every project's hits
+SEARCH_INDEX_STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE error_logs_fts USING fts5(
+        error_message, error_type, source, traceback, project_id,
+        content='error_logs', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS error_logs_fts_insert AFTER INSERT ON error_logs BEGIN
+        INSERT INTO error_logs_fts(rowid, error_message, error_type, source, traceback, project_id)
+        VALUES (new.id, new.error_message, new.error_type, new.source, new.traceback, new.project_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS error_logs_fts_delete AFTER DELETE ON error_logs BEGIN
+        INSERT INTO error_logs_fts(error_logs_fts, rowid, error_message, error_type, source, traceback, project_id)
+        VALUES ('delete', old.id, old.error_message, old.error_type, old.source, old.traceback, old.project_id);
+    END
+    """,
+    # status changes don't touch the indexed columns, so they don't touch the index either
+    """
+    CREATE TRIGGER IF NOT EXISTS error_logs_fts_update AFTER UPDATE OF error_message, error_type, source, traceback, project_id ON error_logs BEGIN
+        INSERT INTO error_logs_fts(error_logs_fts, rowid, error_message, error_type, source, traceback, project_id)
+        VALUES ('delete', old.id, old.error_message, old.error_type, old.source, old.traceback, old.project_id);
+        INSERT INTO error_logs_fts(rowid, error_message, error_type, source, traceback, project_id)
+        VALUES (new.id, new.error_message, new.error_type, new.source, new.traceback, new.project_id);
+    END
+    """,
+]
+
+# bm25 weights follow the column order: error_message, error_type, source, traceback, project_id
+SEARCH_QUERY = text(f"""
+    SELECT rowid AS id,
+           snippet(error_logs_fts, -1, :highlight_start, :highlight_end, '…', {SEARCH_SNIPPET_TOKENS}) AS snippet,
+           bm25(error_logs_fts, 10.0, 5.0, 2.0, 1.0, 0.0) AS score
+    FROM error_logs_fts
+    WHERE error_logs_fts MATCH :query
+    ORDER BY score
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def create_search_index(connection) -> None:
+    """
+    Creates the FTS5 index over error_logs and the triggers keeping it in sync, SQLite only.
+    Existing error logs are indexed the first time.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'error_logs_fts'")).first()
+    # a new index has to be filled from the rows already in error_logs
+    for statement in SEARCH_INDEX_STATEMENTS[1:] if exists else SEARCH_INDEX_STATEMENTS:
+        connection.execute(text(statement))
+    if not exists:
+        connection.execute(text("INSERT INTO error_logs_fts(error_logs_fts) VALUES ('rebuild')"))
+
+
+def to_match_query(project_id: int, query: str) -> str:
+    # every word becomes a quoted phrase, so input like KeyError: 'user_id' is searched as text instead of FTS5 syntax
+    phrases = " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+    return f'project_id : "{project_id}" AND ({phrases})'
+
+
+async def search_error_logs(db: AsyncSession, project_id: int, filters: ErrorLogSearchFilters) -> ErrorLogSearchPage:
+    """
+    Full-text search over a project's error logs, best match first, with the matching text highlighted.
+    Raises NotImplementedError on databases other than SQLite.
+    """
+    if db.bind.dialect.name != "sqlite":
+        raise NotImplementedError("Full-text search needs SQLite FTS5")
+
+    try:
+        rows = (await db.execute(SEARCH_QUERY, {
+            "query": to_match_query(project_id, filters.q),
+            "highlight_start": SEARCH_HIGHLIGHT[0],
+            "highlight_end": SEARCH_HIGHLIGHT[1],
+            "limit": filters.limit + 1,
+            "offset": filters.offset,
+        })).all()
+    except OperationalError as e:
+        raise ValueError(f"Invalid search query: {e.orig}")
+
+    next_offset = None
+    if len(rows) > filters.limit:
+        rows = rows[:filters.limit]
+        next_offset = filters.offset + filters.limit
+
+    error_logs = {error_log.id: error_log for error_log in (await db.scalars(select(ErrorLog).filter(ErrorLog.id.in_([row.id for row in rows])))).all()}
+    items: List[ErrorLogSearchResult] = [
+        # bm25 is lower for better matches, flip it so a higher score is better
+        ErrorLogSearchResult(error_log=error_logs[row.id], snippet=row.snippet, score=-row.score)
+        for row in rows
+        if row.id in error_logs
+    ]
+    return ErrorLogSearchPage(items=items, next_offset=next_offset)
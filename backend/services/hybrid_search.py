@@ -0,0 +1,256 @@
+from collections import Counter, defaultdict
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+from weakref import WeakKeyDictionary
+import math
+import os
+import re
+import time
+
+from langchain_core.documents import Document
+
+from backend.helpers.metrics import increment
+
+if TYPE_CHECKING:
+    # langchain_core.vectorstores pulls in the retrievers and langsmith, only needed for the hints
+    from langchain_core.vectorstores import VectorStore
+
+
+HYBRID_SEARCH_CANDIDATES = int(os.getenv("HYBRID_SEARCH_CANDIDATES", "20")) # Results taken from each retriever before fusion
+LEXICAL_INDEX_MAX_AGE = float(os.getenv("LEXICAL_INDEX_MAX_AGE", "300")) # Seconds before a lexical index is reloaded with the other workers' writes
+RRF_K = 60 # Reciprocal-rank fusion constant, dampens the weight of the top ranks
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Words, dotted names and paths stay whole, e.g. "users.py", "user_id", "requests.exceptions.HTTPError"
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+(?:\.[a-z0-9_]+)*")
+TOKEN_PART_PATTERN = re.compile(r"[a-z0-9]+")
+# Exception class names, paths, dotted or snake_case names and error codes
+IDENTIFIER_PATTERN = re.compile(
+    r"[A-Za-z]*(?:Error|Exception|Warning|Exit|Interrupt)"
+    r"|\S*[/\\]\S*"
+    r"|\w+(?:[._:]+\w+)+"
+    r"|[A-Z]+-?\d+"
+    r"|\d{3,}"
+)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = TOKEN_PART_PATTERN.findall(token)
+        # compound names also match on their parts, the whole name is rarer and scores higher
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def is_identifier_query(query: str) -> bool:
+    words = [word.strip("'\"`,;()[]{}") for word in query.split()]
+    words = [word for word in words if word]
+    identifiers = sum(1 for word in words if IDENTIFIER_PATTERN.fullmatch(word))
+    return bool(words) and identifiers * 2 >= len(words)
+
+
+# Chroma's where operators on metadata values
+COMPARISON_OPERATORS = {
+    "$gt": lambda value, operand: value > operand,
+    "$gte": lambda value, operand: value >= operand,
+    "$lt": lambda value, operand: value < operand,
+    "$lte": lambda value, operand: value <= operand,
+}
+
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def equals(value: Any, operand: Any) -> bool:
+    # like Chroma, 1 and 1.0 are equal but True and 1 or "1" and 1 aren't
+    if isinstance(value, bool) or isinstance(operand, bool):
+        return type(value) is type(operand) and value == operand
+    if is_number(value) and is_number(operand):
+        return value == operand
+    return type(value) is type(operand) and value == operand
+
+
+def matches_condition(metadata: Dict[str, Any], key: str, operator: str, operand: Any) -> bool:
+    # a missing key only matches the negative operators, $ne, $nin and $not_contains
+    present = key in metadata
+    value = metadata.get(key)
+    if operator == "$eq":
+        return present and equals(value, operand)
+    if operator == "$ne":
+        return not (present and equals(value, operand))
+    if operator in ("$in", "$nin"):
+        if not isinstance(operand, list) or not operand:
+            raise ValueError(f"Expected a non-empty list for {operator}, got {operand!r}")
+        found = present and any(equals(value, item) for item in operand)
+        return found if operator == "$in" else not found
+    if operator in COMPARISON_OPERATORS:
+        if not is_number(operand):
+            raise ValueError(f"Expected an int or a float for {operator}, got {operand!r}")
+        return present and is_number(value) and COMPARISON_OPERATORS[operator](value, operand)
+    if operator in ("$contains", "$not_contains"):
+        # on metadata, only list values contain anything
+        found = present and isinstance(value, list) and any(equals(item, operand) for item in value)
+        return found if operator == "$contains" else not found
+    raise ValueError(f"Unsupported where operator {operator}")
+
+
+def matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluates Chroma's where syntax on metadata: equality, $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin, $contains, $not_contains, $and and $or.
+    Raises ValueError for other operators.
+    """
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub_filter) for sub_filter in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub_filter) for sub_filter in condition):
+                return False
+        elif key.startswith("$"):
+            raise ValueError(f"Unsupported where operator {key}")
+        elif isinstance(condition, dict):
+            if not all(matches_condition(metadata, key, operator, operand) for operator, operand in condition.items()):
+                return False
+        elif not matches_condition(metadata, key, "$eq", condition):
+            return False
+    return True
+
+
+class BM25Index:
+    """
+    In-memory BM25 index over the documents of one collection, kept up to date by the writers.
+    """
+
+    def __init__(self):
+        self.documents: Dict[str, Document] = {}
+        self.lengths: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict) # token -> {document id: term frequency}
+        self.total_length = 0
+        self.lock = Lock()
+
+    def add(self, ids: Iterable[str], docs: Iterable[Document]) -> None:
+        with self.lock:
+            for doc_id, doc in zip(ids, docs):
+                self._remove(doc_id)
+                frequencies = Counter(tokenize(doc.page_content))
+                for token, frequency in frequencies.items():
+                    self.postings[token][doc_id] = frequency
+                self.documents[doc_id] = Document(id=doc_id, page_content=doc.page_content, metadata=doc.metadata)
+                self.lengths[doc_id] = sum(frequencies.values())
+                self.total_length += self.lengths[doc_id]
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self.lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> None:
+        doc = self.documents.pop(doc_id, None)
+        if doc is None:
+            return
+        for token in set(tokenize(doc.page_content)):
+            postings = self.postings.get(token)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[token]
+        self.total_length -= self.lengths.pop(doc_id)
+
+    def search(self, query: str, k: int, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        with self.lock:
+            if not self.documents:
+                return []
+            average_length = self.total_length / len(self.documents)
+            scores: Dict[str, float] = defaultdict(float)
+            allowed: Dict[str, bool] = {}
+            for token in set(tokenize(query)):
+                postings = self.postings.get(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + (len(self.documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    # the metadata filter is applied before scoring, not to the top k afterwards
+                    if doc_id not in allowed:
+                        allowed[doc_id] = matches_filter(self.documents[doc_id].metadata, filter)
+                    if not allowed[doc_id]:
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / average_length)
+                    scores[doc_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+            ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+            return [self.documents[doc_id] for doc_id in ranked]
+
+
+# One index per collection object, built from the collection the first time it is searched, with the time it was built
+_indexes: "WeakKeyDictionary[VectorStore, tuple[BM25Index, float]]" = WeakKeyDictionary()
+_indexes_lock = Lock()
+
+
+def load_lexical_index(collection: "VectorStore") -> BM25Index:
+    index = BM25Index()
+    stored = collection.get(include=["documents", "metadatas"])
+    index.add(stored["ids"], [
+        Document(page_content=text or "", metadata=metadata or {})
+        for text, metadata in zip(stored["documents"], stored["metadatas"])
+    ])
+    return index
+
+
+def get_lexical_index(collection: "VectorStore") -> BM25Index:
+    """
+    Returns the process's BM25 index of the collection. It holds every document of the collection in memory,
+    and sees this process's writes right away but other workers' only once it is reloaded, every LEXICAL_INDEX_MAX_AGE seconds.
+    """
+    with _indexes_lock:
+        entry = _indexes.get(collection)
+        if entry is None or time.monotonic() - entry[1] > LEXICAL_INDEX_MAX_AGE:
+            if entry is not None:
+                increment("hybrid_search.lexical_reload")
+            entry = _indexes[collection] = (load_lexical_index(collection), time.monotonic())
+        return entry[0]
+
+
+def add_to_lexical_index(collection: "VectorStore", ids: List[str], docs: List[Document]) -> None:
+    # an index that wasn't built yet will load these from the collection anyway
+    entry = _indexes.get(collection)
+    if entry is not None:
+        entry[0].add(ids, docs)
+
+
+def remove_from_lexical_index(collection: "VectorStore", ids: List[str]) -> None:
+    entry = _indexes.get(collection)
+    if entry is not None:
+        entry[0].remove(ids)
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int) -> List[Document]:
+    scores: Dict[str, float] = defaultdict(float)
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            scores[doc.id] += 1 / (RRF_K + rank + 1)
+            documents.setdefault(doc.id, doc)
+    return [documents[doc_id] for doc_id in sorted(scores, key=scores.get, reverse=True)[:k]]
+
+
+def hybrid_search(collection: "VectorStore", query: str, k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+    """
+    Merges BM25 and vector results with reciprocal-rank fusion, both pre-filtered on the metadata.
+    Queries that are mostly identifiers (exception names, paths, error codes) are answered by BM25 alone,
+    without embedding the query, as long as it finds anything.
+    """
+    candidates = max(k, HYBRID_SEARCH_CANDIDATES)
+    lexical = get_lexical_index(collection).search(query, candidates, filter)
+    if lexical and is_identifier_query(query):
+        increment("hybrid_search.lexical_only")
+        return lexical[:k]
+
+    vector = collection.similarity_search(query, k=candidates, filter=filter)
+    increment("hybrid_search.fused")
+    return reciprocal_rank_fusion([lexical, vector], k)
@@ -0,0 +1,174 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+import asyncio
+import os
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database import AsyncSessionLocal
+from backend.db_models.db_models import ErrorLog, ErrorLogIngestJob
+from backend.services.error_groups import record_error_log
+from backend.services.error_log_rollups import add_to_rollups, remove_from_rollups
+from backend.services.error_log_index import index_error_logs, remove_error_logs_from_index
+from backend.services.error_log_parser import parse_error_log_input, ParsedErrorLog
+from backend.helpers.metrics import get_counters, increment
+
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4")) # Background workers parsing queued error logs
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3")) # Parses tried before a log is marked parse_failed
+INGEST_POLL_INTERVAL = float(os.getenv("INGEST_POLL_INTERVAL", "1.0")) # Seconds an idle worker waits before checking again
+INGEST_LEASE = timedelta(seconds=int(os.getenv("INGEST_LEASE_SECONDS", "300"))) # Claimed jobs older than this are retried
+INGEST_MAX_BACKOFF = 30.0 # Seconds at most a worker waits after errors in a row
+
+_workers: List[asyncio.Task] = []
+_job_available = asyncio.Event()
+
+
+async def enqueue_error_log(db: AsyncSession, project_id: int, traceback: str) -> ErrorLog:
+    """
+    Stores the raw traceback as a queued error log along with its job. The caller commits.
+    """
+    new_error_log = ErrorLog(project_id=project_id, traceback=traceback, status="queued")
+    db.add(new_error_log)
+    await db.flush()
+    db.add(ErrorLogIngestJob(error_log_id=new_error_log.id))
+    await add_to_rollups(db, [new_error_log])
+    return new_error_log
+
+
+def notify_workers() -> None:
+    _job_available.set()
+
+
+async def claim_job() -> Optional[tuple[int, str]]:
+    """
+    Claims the oldest available job. The conditional update makes the claim safe across workers and processes.
+    Returns the job id and the raw traceback, or None if the queue is empty.
+    """
+    async with AsyncSessionLocal() as db:
+        while True:
+            now = datetime.now()
+            available = or_(ErrorLogIngestJob.locked_at.is_(None), ErrorLogIngestJob.locked_at < now - INGEST_LEASE)
+            job = await db.scalar(select(ErrorLogIngestJob).filter(available).order_by(ErrorLogIngestJob.id).limit(1))
+            if not job:
+                return None
+            claimed = await db.execute(
+                update(ErrorLogIngestJob)
+                .filter(ErrorLogIngestJob.id == job.id, available)
+                .values(locked_at=now, attempts=ErrorLogIngestJob.attempts + 1)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            if claimed.rowcount:
+                traceback = await db.scalar(select(ErrorLog.traceback).filter(ErrorLog.id == job.error_log_id))
+                if traceback is not None:
+                    return job.id, traceback
+                # the error log was deleted while it was queued
+                await db.execute(delete(ErrorLogIngestJob).filter(ErrorLogIngestJob.id == job.id))
+                await db.commit()
+
+
+async def complete_job(job_id: int, parsed: ParsedErrorLog) -> None:
+    async with AsyncSessionLocal() as db:
+        job = await db.scalar(select(ErrorLogIngestJob).filter(ErrorLogIngestJob.id == job_id))
+        if not job:
+            return
+        error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.id == job.error_log_id))
+        await db.delete(job)
+        stale_ids = []
+        if error_log:
+            error_log, stale_ids = await record_error_log(db, error_log.project_id, parsed.fingerprint, parsed.error_log, error_log)
+        await db.commit()
+    if error_log:
+        index_error_logs([error_log])
+    remove_error_logs_from_index(stale_ids)
+
+
+async def fail_job(job_id: int, error: Exception) -> None:
+    async with AsyncSessionLocal() as db:
+        job = await db.scalar(select(ErrorLogIngestJob).filter(ErrorLogIngestJob.id == job_id))
+        if not job:
+            return
+        if job.attempts < INGEST_MAX_ATTEMPTS:
+            # release it for another try
+            job.locked_at = None
+            job.last_error = str(error)
+        else:
+            error_log = await db.scalar(select(ErrorLog).filter(ErrorLog.id == job.error_log_id))
+            if error_log:
+                await remove_from_rollups(db, [error_log])
+                error_log.status = "parse_failed"
+                await add_to_rollups(db, [error_log])
+            await db.delete(job)
+            increment("ingest_queue.failed")
+        await db.commit()
+
+
+async def ingest_worker(worker_id: int) -> None:
+    print(f"Ingest worker {worker_id} started.")
+    errors = 0 # errors in a row, the worker backs off while the database is failing
+    while True:
+        job_id = None
+        try:
+            job = await claim_job()
+            if not job:
+                errors = 0
+                _job_available.clear()
+                try:
+                    await asyncio.wait_for(_job_available.wait(), timeout=INGEST_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, traceback = job
+            try:
+                parsed = await parse_error_log_input(traceback)
+            except Exception as e:
+                print(f"Ingest worker {worker_id} failed to parse job {job_id}: {e}")
+                await fail_job(job_id, e)
+                continue
+            await complete_job(job_id, parsed)
+            increment("ingest_queue.processed")
+            errors = 0
+        except Exception as e:
+            # e.g. "database is locked" or a dropped connection, the worker keeps going
+            errors += 1
+            increment("ingest_queue.worker_error")
+            print(f"Ingest worker {worker_id} failed on job {job_id}: {e}")
+            if job_id is not None:
+                try:
+                    await fail_job(job_id, e)
+                except Exception as release_error:
+                    # the claim runs out with its lease and the job is retried then
+                    print(f"Ingest worker {worker_id} failed to release job {job_id}: {release_error}")
+            await asyncio.sleep(min(INGEST_POLL_INTERVAL * 2 ** errors, INGEST_MAX_BACKOFF))
+
+
+def start_ingest_workers(workers: int = INGEST_WORKERS) -> None:
+    for worker_id in range(workers):
+        _workers.append(asyncio.create_task(ingest_worker(worker_id)))
+
+
+async def stop_ingest_workers() -> None:
+    # jobs that were being parsed stay in the table and are retried once their lease expires
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+async def get_ingest_queue_stats() -> dict:
+    async with AsyncSessionLocal() as db:
+        depth, oldest_enqueued_at = (await db.execute(select(func.count(ErrorLogIngestJob.id), func.min(ErrorLogIngestJob.enqueued_at)))).one()
+        in_progress = await db.scalar(select(func.count(ErrorLogIngestJob.id)).filter(ErrorLogIngestJob.locked_at.is_not(None)))
+    counters = get_counters("ingest_queue.")
+    return {
+        "workers": sum(not worker.done() for worker in _workers),
+        "depth": depth,
+        "in_progress": in_progress,
+        "oldest_enqueued_at": oldest_enqueued_at,
+        "lag_seconds": (datetime.now() - oldest_enqueued_at).total_seconds() if oldest_enqueued_at else 0.0,
+        "processed": counters.get("ingest_queue.processed", 0),
+        "failed": counters.get("ingest_queue.failed", 0),
+    }
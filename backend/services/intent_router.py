@@ -0,0 +1,250 @@
+"""
+Routes chat requests the toolbox has handled before straight to their tool calls, without the planner and evaluator.
+What is learned is a pattern of the normalized request, with the values it passed to the tools as slots,
+and the tool calls with those slots. E.g. "delete project 5" is learned as "delete project {0}" -> delete_projects(project_ids=[{0}])
+and then answers "Delete project 12." directly.
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, List, Optional
+import os
+import re
+import uuid
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from backend.helpers.metrics import increment
+
+
+INTENT_ROUTER_CACHE_SIZE = int(os.getenv("INTENT_ROUTER_CACHE_SIZE", "512")) # Learned intents kept, least recently used are evicted
+INTENT_ROUTER_MIN_AGREEMENTS = int(os.getenv("INTENT_ROUTER_MIN_AGREEMENTS", "2")) # Times the planner must have made the same tool calls for a pattern
+INTENT_ROUTER_MIN_CONFIDENCE = float(os.getenv("INTENT_ROUTER_MIN_CONFIDENCE", "0.75")) # Share of the pattern's outcomes that agreed with its tool calls
+INTENT_ROUTER_MAX_TOKENS = 24 # Longer requests are too specific to come back
+
+TOKEN_PATTERN = re.compile(r"[\w.@/:-]*\w")
+# Politeness doesn't change the intent
+FILLER_TOKENS = {"please", "pls", "can", "could", "would", "you", "kindly", "hey", "hi"}
+
+
+class Slot:
+    def __init__(self, index: int, kind: type):
+        self.index = index
+        self.kind = kind
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Slot) and (self.index, self.kind) == (other.index, other.kind)
+
+
+class Intent:
+    def __init__(self, pattern: List[Any], tool_calls: List[Dict[str, Any]]):
+        self.pattern = pattern # tokens and Slots
+        self.tool_calls = tool_calls # {"name", "args"} with Slots in place of the request's values
+        self.agreements = 1
+        self.outcomes = 1
+
+    @property
+    def confidence(self) -> float:
+        return self.agreements / self.outcomes
+
+    def is_confident(self) -> bool:
+        return self.agreements >= INTENT_ROUTER_MIN_AGREEMENTS and self.confidence >= INTENT_ROUTER_MIN_CONFIDENCE
+
+
+_intents: "OrderedDict[str, Intent]" = OrderedDict()
+_lock = Lock()
+
+
+def tokenize(user_input: str) -> List[re.Match]:
+    # the matches keep their span in the request, slot values are taken from the request as written
+    return list(TOKEN_PATTERN.finditer(user_input))
+
+
+def is_filler(token: re.Match) -> bool:
+    return token.group().lower() in FILLER_TOKENS
+
+
+def span_text(tokens: List[re.Match], start: int, end: int) -> str:
+    # the request from the first token to the last one, with the punctuation and filler words between them
+    return tokens[start].string[tokens[start].start():tokens[end - 1].end()]
+
+
+def pattern_key(pattern: List[Any]) -> str:
+    return " ".join(f"{{{item.index}}}" if isinstance(item, Slot) else item for item in pattern)
+
+
+def find_tokens(tokens: List[re.Match], value: str, taken: set) -> Optional[tuple]:
+    # first run of tokens that isn't already a slot and reads exactly like the value, returns its start and size
+    for start in range(len(tokens)):
+        for end in range(start + 1, len(tokens) + 1):
+            if not taken.isdisjoint(range(start, end)):
+                break
+            if span_text(tokens, start, end).lower() == value:
+                return start, end - start
+    return None
+
+
+def templatize(value: Any, tokens: List[re.Match], slots: Dict[int, tuple], taken: set) -> Any:
+    """
+    Replaces the values of the tool call arguments that were taken from the request with Slots.
+    """
+    if isinstance(value, dict):
+        return {key: templatize(item, tokens, slots, taken) for key, item in value.items()}
+    if isinstance(value, list):
+        return [templatize(item, tokens, slots, taken) for item in value]
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        return value
+    # only values that are exactly some words of the request, not ones the model wrote itself
+    found = find_tokens(tokens, str(value).lower().strip(), taken)
+    if found is None:
+        return value
+    start, size = found
+    slot = Slot(len(slots), type(value))
+    slots[start] = (slot, size)
+    taken.update(range(start, start + size))
+    return slot
+
+
+def fill(value: Any, values: List[Any]) -> Any:
+    if isinstance(value, Slot):
+        return values[value.index]
+    if isinstance(value, dict):
+        return {key: fill(item, values) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, values) for item in value]
+    return value
+
+
+def match_from(pattern: List[Any], tokens: List[re.Match], item: int, position: int, values: List[Any]) -> bool:
+    if item == len(pattern):
+        return all(is_filler(token) for token in tokens[position:])
+    if isinstance(pattern[item], Slot):
+        slot = pattern[item]
+        # the shortest run of tokens that leaves a match for the rest of the pattern
+        for end in range(position + 1, len(tokens) + 1):
+            try:
+                values[slot.index] = slot.kind(span_text(tokens, position, end))
+            except ValueError:
+                continue
+            if match_from(pattern, tokens, item + 1, end, values):
+                return True
+        return False
+    # filler words are skipped outside of slots
+    while position < len(tokens) and tokens[position].group().lower() != pattern[item]:
+        if not is_filler(tokens[position]):
+            return False
+        position += 1
+    return position < len(tokens) and match_from(pattern, tokens, item + 1, position + 1, values)
+
+
+def match_pattern(pattern: List[Any], tokens: List[re.Match]) -> Optional[List[Any]]:
+    """
+    Matches the request's tokens against a pattern, a slot takes one or more tokens.
+    Returns the slot values, the slot's part of the request as written converted to the type it had when learned, or None.
+    """
+    values: List[Any] = [None] * sum(1 for item in pattern if isinstance(item, Slot))
+    if not match_from(pattern, tokens, 0, 0, values):
+        return None
+    return values
+
+
+def find_intent(tokens: List[re.Match]) -> Optional[tuple]:
+    # the most specific pattern wins, the one with the most literal words, call with the lock held
+    if not tokens or len(tokens) > INTENT_ROUTER_MAX_TOKENS:
+        return None
+    best = None
+    for key, intent in _intents.items():
+        if not intent.is_confident():
+            continue
+        values = match_pattern(intent.pattern, tokens)
+        if values is None:
+            continue
+        specificity = sum(1 for item in intent.pattern if not isinstance(item, Slot))
+        if best is None or specificity > best[0]:
+            best = (specificity, key, intent, values)
+    return best
+
+
+def has_intent(user_input: str) -> bool:
+    with _lock:
+        return find_intent(tokenize(user_input)) is not None
+
+
+def match_intent(user_input: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Returns the tool calls for the request if it matches a confidently learned intent, or None.
+    """
+    with _lock:
+        best = find_intent(tokenize(user_input))
+        if best is None:
+            increment("intent_router.miss")
+            return None
+        _, key, intent, values = best
+        _intents.move_to_end(key)
+    increment("intent_router.hit")
+    return [
+        {"name": tool_call["name"], "args": fill(tool_call["args"], values), "id": f"call_{uuid.uuid4().hex}", "type": "tool_call"}
+        for tool_call in intent.tool_calls
+    ]
+
+
+def learn_intent(user_input: str, messages: List[Any], success: bool) -> None:
+    """
+    Learns from a run of the toolbox graph. Only runs with a single round of tool calls are learned,
+    later rounds can depend on what earlier calls returned, which can't be replayed.
+    A failed run, or one that made different calls, lowers the confidence in the request's pattern.
+    """
+    tokens = tokenize(user_input)
+    if not tokens or len(tokens) > INTENT_ROUTER_MAX_TOKENS:
+        return
+    rounds = [message for message in messages if isinstance(message, AIMessage) and message.tool_calls]
+    errors = [message for message in messages if isinstance(message, ToolMessage) and message.status == "error"]
+    if not success or len(rounds) != 1 or errors:
+        # the patterns the request falls under didn't hold up this time
+        with _lock:
+            lower_confidence(tokens)
+        return
+
+    slots: Dict[int, tuple] = {}
+    taken: set = set()
+    tool_calls = [
+        {"name": tool_call["name"], "args": templatize(tool_call["args"], tokens, slots, taken)} for tool_call in rounds[0].tool_calls
+    ]
+    pattern: List[Any] = []
+    position = 0
+    while position < len(tokens):
+        if position in slots:
+            slot, size = slots[position]
+            pattern.append(slot)
+            position += size
+        else:
+            if not is_filler(tokens[position]):
+                pattern.append(tokens[position].group().lower())
+            position += 1
+    # a pattern of only slots would match any request
+    if all(isinstance(item, Slot) for item in pattern):
+        return
+    key = pattern_key(pattern)
+
+    with _lock:
+        intent = _intents.get(key)
+        if intent is None:
+            _intents[key] = Intent(pattern, tool_calls)
+            increment("intent_router.learned")
+        elif tool_calls == intent.tool_calls:
+            intent.agreements += 1
+            intent.outcomes += 1
+        else:
+            # the planner changed its mind, start over with its latest calls
+            intent.tool_calls, intent.agreements, intent.outcomes = tool_calls, 1, 1
+        _intents.move_to_end(key)
+        while len(_intents) > INTENT_ROUTER_CACHE_SIZE:
+            _intents.popitem(last=False)
+
+
+def lower_confidence(tokens: List[re.Match]) -> None:
+    # call with the lock held
+    # a replayed intent that failed counts once, from the toolbox's run that follows it
+    for intent in _intents.values():
+        if match_pattern(intent.pattern, tokens) is not None:
+            intent.outcomes += 1
+
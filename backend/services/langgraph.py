@@ -1,27 +1,34 @@
 from langgraph.graph import StateGraph, START, END
+from langgraph.constants import TAG_NOSTREAM
 from langchain_core.messages import AIMessage, SystemMessage, RemoveMessage, HumanMessage, ToolMessage
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.prebuilt import tools_condition, ToolNode
+from langchain_core.runnables import RunnableConfig
+from langgraph.prebuilt import tools_condition
 from langchain_openai import ChatOpenAI
 
 from backend.pydantic_models.langgraph_models import *
 from backend.pydantic_models.error_models import ErrorLogBase
 from backend.pydantic_models.project_models import ProjectResponse
-from backend.helpers.helpers import save_langgraph_graph
+from backend.helpers.traceback_parser import parse_python_traceback
+from backend.helpers.fingerprint import fingerprint_traceback, rebase_cached_error_log
+from backend.helpers.tool_evaluator import evaluate_tool_messages
+from backend.services.parse_cache import get_cached_error_log
+from backend.services.registry import get_service
+from backend.services.chat_checkpointer import get_chat_checkpointer
+from backend.services.intent_router import has_intent, match_intent, learn_intent
+from backend.services.tool_runtime import run_tool_calls
 from backend.helpers.lang_tools import *
+from backend.helpers.metrics import increment
 
 from pydantic import ValidationError
+import asyncio
 import json
+import os
 
 from dotenv import load_dotenv
 
 load_dotenv(dotenv_path="backend/.env")
 
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0.2, # higher temp = more creativity
-)
-
+CHAT_SPECULATIVE_PLANNING = os.getenv("CHAT_SPECULATIVE_PLANNING", "false").lower() == "true" # Plan tool calls while the assistant decides if they're needed
 
 available_models = [
     ProjectResponse,
@@ -33,12 +40,83 @@ tools = [
     get_project,
     create_project,
     update_project,
-    delete_projects
+    delete_projects,
+    query_projects,
+    count_projects,
+    query_error_logs,
+    count_error_logs,
+    group_error_logs
 ]
-llm_with_tools = llm.bind_tools(tools)
+
+
+def get_plan_tool_calls_messages(user_input: str) -> list:
+    prompt = f"""
+    You are a helpful assistant that can help the user with their request.
+    You have a subordinate model that can access the tools you see listed:
+    {
+        [
+            {
+                "name": tool.name,
+                "description": tool.description,
+                "arguments": tool.args
+            }
+            for tool in tools
+        ]
+    }
+    Your job is to think step by step through the user's input to create a plan for another LLM to achieve the user's input or provide the information they need using tool calls and stored messages.
+    Create and return ONLY THE PLAN as a string that would use the tools and stored messages to achieve the user's input or provide the information they need.
+    An example user input might be: "Can you delete all of the projects?"
+    A plan to achieve the example user input would be:
+    1. Get all of the projects using the get_projects tool
+    2. Extract the project IDs from the projects you just pulled
+    3. Delete the projects using the delete_projects tool and the project IDs
+    To count, filter, group or rank projects and error logs, plan on the query tools (query_projects, count_projects, query_error_logs, count_error_logs, group_error_logs),
+    they do it in the database, rather than getting all of the projects and working on the list.
+    You only respond with the plan, you do not perform any tool calls, or output anything else.
+    If it is impossible to create a plan with the given tools to achieve the user's input, return the string "__end__" as your response.
+    """
+    return [
+        SystemMessage(content=prompt),
+        HumanMessage(content=f"{user_input}")
+    ]
+
+
+def build_llm() -> ChatOpenAI:
+    return ChatOpenAI(
+        model="gpt-4o-mini",
+        temperature=0.2, # higher temp = more creativity
+    )
+
+
+def build_llm_with_tools():
+    return get_service("llm").bind_tools(tools)
 
 
 def get_evaulation_error_log_graph():
+    llm = get_service("llm")
+
+    def local_parse_error_log(state: ErrorLogEvaluationLanggraphState) -> ErrorLogEvaluationLanggraphState:
+        _input = state.get("input")
+
+        # standard tracebacks don't need the LLM, only the ones we can't parse go to parse_error_log
+        parsed = parse_python_traceback(_input or "")
+        if parsed:
+            return {"output": parsed, "state": "END", "success": True, "parsed_by": "local"}
+        return {"parsed_by": "llm"}
+
+    async def cached_parse_error_log(state: ErrorLogEvaluationLanggraphState, config: RunnableConfig) -> ErrorLogEvaluationLanggraphState:
+        _input = state.get("input")
+
+        # repeat reports of the same error reuse the previous LLM parse, with the message and line of this report
+        fingerprint = fingerprint_traceback(_input or "")
+        cached = await get_cached_error_log(fingerprint, config.get("configurable", {}).get("db"))
+        if cached:
+            output = rebase_cached_error_log(cached, _input or "")
+            if output:
+                return {"output": output, "state": "END", "success": True, "parsed_by": "cache", "fingerprint": fingerprint}
+            increment("parse_cache.stale")
+        return {"fingerprint": fingerprint}
+
     def control_node(state: ErrorLogEvaluationLanggraphState) -> ErrorLogEvaluationLanggraphState:
         _input = state.get("input")
         output = state.get("output")
@@ -78,15 +156,8 @@ def get_evaulation_error_log_graph():
         except ValidationError as e:
             return {"output": output, "state": "evaluate_error_log", "feedback": e.errors(), "success": False}
 
-    def parse_error_log(state: ErrorLogEvaluationLanggraphState) -> ErrorLogEvaluationLanggraphState:
-        _input = state.get("input")
-        output = state.get("output")
-        _state = state.get("state")
-        feedback = state.get("feedback")
-        success = state.get("success")
-        count = state.get("count", 0)
-
-        prompt = (
+    def get_parse_error_log_prompt(_input: str, feedback: str) -> str:
+        return (
             "You are a helpful assistant that can help record error logs in a structured format.\n"
             "Here is the error log schema:\n"
             f"{ErrorLogBase.model_fields}\n"
@@ -100,19 +171,44 @@ def get_evaulation_error_log_graph():
             f"{feedback}\n"
         )
 
+    async def parse_error_log(state: ErrorLogEvaluationLanggraphState) -> ErrorLogEvaluationLanggraphState:
+        _input = state.get("input")
+        feedback = state.get("feedback")
+        count = state.get("count", 0)
+
+        prompt = get_parse_error_log_prompt(_input, feedback)
+
         print(f"{feedback = }")
         print(f"{prompt = }")
-        response = llm.invoke(prompt)
+        response = await llm.ainvoke(prompt)
         print(f"{response.content = }")
         return {"output": response.content, "state": "parse_error_log", "count": count + 1}
-    
+
     builder = StateGraph(ErrorLogEvaluationLanggraphState)
 
+    builder.add_node("local_parse_error_log", local_parse_error_log)
+    builder.add_node("cached_parse_error_log", cached_parse_error_log)
     builder.add_node("control_node", control_node)
     builder.add_node("parse_error_log", parse_error_log)
     builder.add_node("evaluate_error_log", evaluate_error_log)
 
-    builder.add_edge(START, "control_node")
+    builder.add_edge(START, "local_parse_error_log")
+    builder.add_conditional_edges(
+        "local_parse_error_log",
+        lambda state: "END" if state.get("parsed_by") == "local" else "cached_parse_error_log",
+        {
+            "cached_parse_error_log": "cached_parse_error_log",
+            "END": END
+        }
+    )
+    builder.add_conditional_edges(
+        "cached_parse_error_log",
+        lambda state: "END" if state.get("parsed_by") == "cache" else "control_node",
+        {
+            "control_node": "control_node",
+            "END": END
+        }
+    )
     builder.add_conditional_edges(
         "control_node",
         lambda state: state.get("state"),
@@ -126,40 +222,169 @@ def get_evaulation_error_log_graph():
     builder.add_edge("evaluate_error_log", "control_node")
 
     graph = builder.compile()
-
-    save_langgraph_graph("backend/images/error_log_evaluation_graph.png", graph)
     return graph
 
 
-def get_summary_graph():
-    def summarize_content(state: SummaryLanggraphState) -> SummaryLanggraphState:
+def get_toolbox_graph():
+    llm = get_service("llm")
+    llm_with_tools = get_service("llm_with_tools")
+
+    def plan_tool_calls(state: ToolLanggraphState) -> ToolLanggraphState:
         messages = state.get("messages", [])
-        summary = state.get("summary", "")
-        route = state.get("route")
         user_input = state.get("user_input", "")
-        tool_response = state.get("tool_response", {})
-        tool_evaluation = state.get("tool_evaluation", {})
+        route = state.get("route", None)
+        retry_counter = state.get("retry_counter", 0)
+        plan = state.get("plan", "")
+        tool_calls = state.get("tool_calls", [])
 
-        if len(messages) > 10:
-            to_summarize = messages[:-10]
+        print("START PLAN")
 
-            prompt = (
-                "You are a helpful assistant that can help summarize content."
-                "Here is the content to be summarized:\n"
-                f"{to_summarize}\n"
-                "Here is the summary from your previous attempt at summarizing the content, which may simply be another summary or nothing at all:\n"
-                f"{summary}\n"
-                "Summarize the content, including the old summary, in a concise and informative manner, focusing on the main points and key insights. DO NOT REPEAT THE OLD SUMMARY.\n"
-            )
-            response = llm.invoke(prompt)
+        # the plan may have been made while the assistant was deciding on the route, see call_model
+        if not plan:
+            response = llm.invoke(get_plan_tool_calls_messages(user_input))
+            plan = response.content
 
-            delete_messages = [RemoveMessage(id=m.id) for m in to_summarize if getattr(m, "id", None)]
+        print("END PLAN")
 
-            return {"summary": response.content, "messages": delete_messages}
-        
-        return {}
+        if plan == "__end__":
+            return {
+                "tool_evaluation": None,
+                "tool_response": None,
+                "route": END
+            }
+
+        return {"plan": plan, "route": "tool_box"}
+
+
+    def tool_box(state: ToolLanggraphState) -> ToolLanggraphState:
+        messages = state.get("messages", [])
+        retry_counter = state.get("retry_counter", 0)
+        user_input = state.get("user_input", "")
+        route = state.get("route", None)
+        plan = state.get("plan", "")
+        tool_calls = state.get("tool_calls", [])
+
+        print("START TOOL BOX")
+
+        tool_response = llm_with_tools.invoke(
+            [
+                SystemMessage(content=f"""
+                YOUR ONE AND ONLY JOB IS TO PERFORM THE PROPER TOOL CALLS BASED ON THE PLAN PROVIDED TO YOU AND ANY DATA GIVEN TO YOU.
+                YOU DO NOT SPEAK OR GIVE FEEDBACK. YOU ONLY MAKE TOOL CALLS.
+                IMPORTANT: YOU DO NOT MAKE A PLAN, YOU EXECUTE THE PLAN PROVIDED TO YOU.
+                YOU EXECUTE TOOL CALLS EVEN IF THEY WOULD RESULT IN AN ERROR.
+                You have these tools available to you:
+                {tools}
+                Here are the available models you can use to parse or filter data:
+                {[model.model_fields for model in available_models]}
+                Here is the plan to be executed:
+                {plan}
+                You might see additional feedback below this message that might help you follow the plan.
+                Here are the tool calls you have made so far:
+                {tool_calls}
+                """)
+            ] + messages
+        )
+
+        print("END TOOL BOX")
+
+        if len(tool_response.tool_calls) > 0:
+            print("TOOL BOX - TOOL CALL")
+            return {"messages": [tool_response], "route": "evaluate_tool_response"}
+        else:
+            if tool_response.content == "":
+                print("TOOL BOX - \"\"")
+                return {"messages": [HumanMessage(content="Please phrase your request more clearly.")]}
+            else:
+                print("TOOL BOX - NOT \"\"")
+                return {"messages": [HumanMessage(content=tool_response.content)], "route": "tool_box"}
     
-    def call_model(state: SummaryLanggraphState) -> SummaryLanggraphState:
+    def evaluate_tool_response(state: ToolLanggraphState) -> ToolLanggraphState:
+        messages = state.get("messages", [])
+        retry_counter = state.get("retry_counter", 0)
+        user_input = state.get("user_input", "")
+        route = state.get("route", None)
+        plan = state.get("plan", "")
+        tool_calls = state.get("tool_calls", [])
+
+        tool_calls = [message for message in messages if isinstance(message, ToolMessage)]
+
+        print("START EVALUATE TOOL")
+        tool_message = messages[-1]
+
+        # clear results are evaluated locally, only errors and unexpected results go to the LLM
+        evaluation = evaluate_tool_messages(messages, plan, [tool.name for tool in tools])
+        if evaluation:
+            increment("tool_evaluator.local")
+        else:
+            increment("tool_evaluator.llm")
+            evaluation = llm.with_structured_output(EvaluationSchema).invoke([
+                SystemMessage(content=f"""
+                    Your one and only job is to evaluate the tool response and return the results based on the User's input.
+                    The main goal is to determine if the tool response answers the User's input or performs the task they asked for.
+                    Here are the tools available to your subordinate model:
+                    {tools}
+                    Here is the User's input: {user_input}.
+                    Here is the tool response to be evaluated: {tool_message}.
+                    Here are the tool calls made so far: {tool_calls}
+                    You do not make up any information, you only answer based on the tool response, tool calls, and the User's input.
+                    You can not make tool calls, you only answer based on the tool response, tool calls, and the User's input.
+                    If the tool response and tool calls answers the User's input or performs the task they asked for, the success should be True, exit should be True, and the response should be "". This is largely determined by if there was an error in the tool call.
+                    If the tool response and tool calls do not answer the User's input or perform the task they asked for, the success should be False, exit should be False, and the response should be the tool response.
+                    If the tool is successful, return "" as the your response, exit should be True, and success should be True.
+                    Here is the plan to be executed: {plan}
+                    If the tool call errors, you need to determine if the error is from a bad tool call, or if the error is from a lack of data (e.g. no projects found).
+                    If the error is from a bad tool call, then success should be False, exit should be False, and the response should be the tool response.
+                    If the error is from a lack of data (e.g. no projects found), then success should be False, exit should be True, and the response should reflect that there isn't enough data to complete the user's request.
+                    When exit is True, you never return a response like the error message. Using the previous tool calls, you should be able to determine what went wrong and respond accordingly.
+                    Attached is a list of all of the messages in the conversation, use these to answer if the exit state should be True or False:
+                    """
+                )
+            ] + messages)
+
+        if evaluation.exit:
+            print("END EVALUATION: SUCCESS")
+            evaluation.response = "\n".join([str(tool_call) for tool_call in tool_calls])
+            return {"route": END, "tool_evaluation": evaluation, "tool_response": tool_message, "tool_calls": [tool_message]}
+        else:
+            print("END EVALUATION: FAILURE")
+            return {"messages": [HumanMessage(content=evaluation.response)], "route": "tool_box", "tool_calls": [tool_message]}
+
+    def call_tools(state: ToolLanggraphState) -> ToolLanggraphState:
+        messages = state.get("messages", [])
+
+        # independent calls run at the same time, each with its own session and timeout, see tool_runtime
+        return {"messages": run_tool_calls(tools, messages[-1].tool_calls)}
+
+    child_builder = StateGraph(ToolLanggraphState)
+    child_builder.add_node("tool_box", tool_box)
+    child_builder.add_node("plan_tool_calls", plan_tool_calls)
+    child_builder.add_node("tools", call_tools)
+    child_builder.add_node("evaluate_tool_response", evaluate_tool_response)
+
+    child_builder.add_edge(START, "plan_tool_calls")
+    child_builder.add_conditional_edges("plan_tool_calls", lambda state: state.get("route"), {
+        "tool_box": "tool_box",
+        "__end__": END
+    })
+    child_builder.add_conditional_edges("tool_box", tools_condition, {
+        "tools": "tools",
+        "__end__": "tool_box"
+    })
+    child_builder.add_conditional_edges("evaluate_tool_response", lambda state: state.get("route"), {
+        "tool_box": "tool_box",
+        END: END
+    })
+    child_builder.add_edge("tools", "evaluate_tool_response")
+
+    child_graph = child_builder.compile()
+    return child_graph
+
+
+def get_summary_graph():
+    llm = get_service("llm")
+
+    async def call_model(state: SummaryLanggraphState) -> SummaryLanggraphState:
         messages = state.get("messages", [])
         summary = state.get("summary", "")
         route = state.get("route")
@@ -222,188 +447,45 @@ def get_summary_graph():
         """
 
         prompt = [SystemMessage(content=prompt)] + messages
-        response = llm.invoke(prompt)
+
+        speculative_plan = None
+        # a request the intent router knows doesn't need a plan
+        if CHAT_SPECULATIVE_PLANNING and not tool_evaluation and not has_intent(user_input):
+            # the plan only needs the user's input, so it is made while the assistant decides whether it is needed
+            # nostream keeps its tokens out of the streamed answer
+            speculative_plan = asyncio.create_task(llm.ainvoke(get_plan_tool_calls_messages(user_input), config={"tags": [TAG_NOSTREAM]}))
+        try:
+            response = await llm.ainvoke(prompt)
+        except BaseException:
+            if speculative_plan:
+                speculative_plan.cancel()
+            raise
 
         # print(f"{prompt = }")
         print(f"CALLED MODEL: {response}")
 
         if response.content == "TOOLBOX":
+            if speculative_plan:
+                try:
+                    plan = await speculative_plan
+                    increment("speculative_plan.hit")
+                    return {"route": "toolbox", "plan": plan.content}
+                except Exception as e:
+                    # plan_tool_calls makes it again
+                    increment("speculative_plan.failed")
+                    print(f"Speculative plan failed: {e}")
             return {"route": "toolbox"}
+        if speculative_plan:
+            speculative_plan.cancel()
+            increment("speculative_plan.waste")
         return {"messages": [response], "route": "__end__"}
 
-    def get_toolbox_graph():
-
-        def plan_tool_calls(state: ToolLanggraphState) -> ToolLanggraphState:
-            messages = state.get("messages", [])
-            user_input = state.get("user_input", "")
-            route = state.get("route", None)
-            retry_counter = state.get("retry_counter", 0)
-            plan = state.get("plan", "")
-            tool_calls = state.get("tool_calls", [])
-
-            print("START PLAN")
-
-            prompt = f"""
-            You are a helpful assistant that can help the user with their request.
-            You have a subordinate model that can access the tools you see listed:
-            {
-                [
-                    {
-                        "name": tool.name,
-                        "description": tool.description,
-                        "arguments": tool.args
-                    }
-                    for tool in tools
-                ]
-            }
-            Your job is to think step by step through the user's input to create a plan for another LLM to achieve the user's input or provide the information they need using tool calls and stored messages.
-            Create and return ONLY THE PLAN as a string that would use the tools and stored messages to achieve the user's input or provide the information they need.
-            An example user input might be: "Can you delete all of the projects?"
-            A plan to achieve the example user input would be:
-            1. Get all of the projects using the get_projects tool
-            2. Extract the project IDs from the projects you just pulled
-            3. Delete the projects using the delete_projects tool and the project IDs
-            You only respond with the plan, you do not perform any tool calls, or output anything else.
-            If it is impossible to create a plan with the given tools to achieve the user's input, return the string "__end__" as your response.
-            """
-            response = llm.invoke([
-                SystemMessage(content=prompt),
-                HumanMessage(content=f"{user_input}")
-            ])
-
-            print("END PLAN")
-
-            if response.content == "__end__":
-                return {
-                    "tool_evaluation": None,
-                    "tool_response": None,
-                    "route": END
-                }
-
-            return {"plan": response.content, "route": "tool_box"}
-
-
-        def tool_box(state: ToolLanggraphState) -> ToolLanggraphState:
-            messages = state.get("messages", [])
-            retry_counter = state.get("retry_counter", 0)
-            user_input = state.get("user_input", "")
-            route = state.get("route", None)
-            plan = state.get("plan", "")
-            tool_calls = state.get("tool_calls", [])
-
-            print("START TOOL BOX")
-
-            tool_response = llm_with_tools.invoke(
-                [
-                    SystemMessage(content=f"""
-                    YOUR ONE AND ONLY JOB IS TO PERFORM THE PROPER TOOL CALLS BASED ON THE PLAN PROVIDED TO YOU AND ANY DATA GIVEN TO YOU.
-                    YOU DO NOT SPEAK OR GIVE FEEDBACK. YOU ONLY MAKE TOOL CALLS.
-                    IMPORTANT: YOU DO NOT MAKE A PLAN, YOU EXECUTE THE PLAN PROVIDED TO YOU.
-                    YOU EXECUTE TOOL CALLS EVEN IF THEY WOULD RESULT IN AN ERROR.
-                    You have these tools available to you:
-                    {tools}
-                    Here are the available models you can use to parse or filter data:
-                    {[model.model_fields for model in available_models]}
-                    Here is the plan to be executed:
-                    {plan}
-                    You might see additional feedback below this message that might help you follow the plan.
-                    Here are the tool calls you have made so far:
-                    {tool_calls}
-                    """)
-                ] + messages
-            )
-
-            print("END TOOL BOX")
-
-            if len(tool_response.tool_calls) > 0:
-                print("TOOL BOX - TOOL CALL")
-                return {"messages": [tool_response], "route": "evaluate_tool_response"}
-            else:
-                if tool_response.content == "":
-                    print("TOOL BOX - \"\"")
-                    return {"messages": [HumanMessage(content="Please phrase your request more clearly.")]}
-                else:
-                    print("TOOL BOX - NOT \"\"")
-                    return {"messages": [HumanMessage(content=tool_response.content)], "route": "tool_box"}
-        
-        def evaluate_tool_response(state: ToolLanggraphState) -> ToolLanggraphState:
-            messages = state.get("messages", [])
-            retry_counter = state.get("retry_counter", 0)
-            user_input = state.get("user_input", "")
-            route = state.get("route", None)
-            plan = state.get("plan", "")
-            tool_calls = state.get("tool_calls", [])
-
-            tool_calls = [message for message in messages if isinstance(message, ToolMessage)]
-
-            llm_with_schema = llm.with_structured_output(EvaluationSchema)
-
-            print("START EVALUATE TOOL")
-            tool_message = messages[-1]
-
-            evaluation = llm_with_schema.invoke([
-                SystemMessage(content=f"""
-                    Your one and only job is to evaluate the tool response and return the results based on the User's input.
-                    The main goal is to determine if the tool response answers the User's input or performs the task they asked for.
-                    Here are the tools available to your subordinate model:
-                    {tools}
-                    Here is the User's input: {user_input}.
-                    Here is the tool response to be evaluated: {tool_message}.
-                    Here are the tool calls made so far: {tool_calls}
-                    You do not make up any information, you only answer based on the tool response, tool calls, and the User's input.
-                    You can not make tool calls, you only answer based on the tool response, tool calls, and the User's input.
-                    If the tool response and tool calls answers the User's input or performs the task they asked for, the success should be True, exit should be True, and the response should be "". This is largely determined by if there was an error in the tool call.
-                    If the tool response and tool calls do not answer the User's input or perform the task they asked for, the success should be False, exit should be False, and the response should be the tool response.
-                    If the tool is successful, return "" as the your response, exit should be True, and success should be True.
-                    Here is the plan to be executed: {plan}
-                    If the tool call errors, you need to determine if the error is from a bad tool call, or if the error is from a lack of data (e.g. no projects found).
-                    If the error is from a bad tool call, then success should be False, exit should be False, and the response should be the tool response.
-                    If the error is from a lack of data (e.g. no projects found), then success should be False, exit should be True, and the response should reflect that there isn't enough data to complete the user's request.
-                    When exit is True, you never return a response like the error message. Using the previous tool calls, you should be able to determine what went wrong and respond accordingly.
-                    Attached is a list of all of the messages in the conversation, use these to answer if the exit state should be True or False:
-                    """
-                )
-            ] + messages)
-
-            if evaluation.exit:
-                print("END EVALUATION: SUCCESS")
-                evaluation.response = "\n".join([str(tool_call) for tool_call in tool_calls])
-                return {"route": END, "tool_evaluation": evaluation, "tool_response": tool_message, "tool_calls": [tool_message]}
-            else:
-                print("END EVALUATION: FAILURE")
-                return {"messages": [HumanMessage(content=evaluation.response)], "route": "tool_box", "tool_calls": [tool_message]}
-
-        child_builder = StateGraph(ToolLanggraphState)
-        child_builder.add_node("tool_box", tool_box)
-        child_builder.add_node("plan_tool_calls", plan_tool_calls)
-        child_builder.add_node("tools", ToolNode(tools))
-        child_builder.add_node("evaluate_tool_response", evaluate_tool_response)
-
-        child_builder.add_edge(START, "plan_tool_calls")
-        child_builder.add_conditional_edges("plan_tool_calls", lambda state: state.get("route"), {
-            "tool_box": "tool_box",
-            "__end__": END
-        })
-        child_builder.add_conditional_edges("tool_box", tools_condition, {
-            "tools": "tools",
-            "__end__": "tool_box"
-        })
-        child_builder.add_conditional_edges("evaluate_tool_response", lambda state: state.get("route"), {
-            "tool_box": "tool_box",
-            END: END
-        })
-        child_builder.add_edge("tools", "evaluate_tool_response")
-
-        child_graph = child_builder.compile()
-        save_langgraph_graph("backend/images/tool_box_graph.png", child_graph)
-        return child_graph
-
-    toolbox_graph = get_toolbox_graph()
+    toolbox_graph = get_service("toolbox_graph")
 
     def initialize(state: SummaryLanggraphState) -> SummaryLanggraphState:
         # because of the checkpointer, it holds onto the state of the previous run, so we need to initialize the state of
         # the tool_response and tool_evaluation to None to avoid the previous run's state from being used
-        return {"tool_response": None, "tool_evaluation": None}
+        return {"tool_response": None, "tool_evaluation": None, "plan": None}
 
     def call_toolbox(state: SummaryLanggraphState) -> SummaryLanggraphState:
         messages = state.get("messages", [])
@@ -413,8 +495,17 @@ def get_summary_graph():
         user_input = state.get("user_input", "")
         summary = state.get("summary", "")
 
+        # requests the toolbox has handled the same way before run their tool calls directly, see intent_router
+        cached_tool_calls = match_intent(user_input)
+        if cached_tool_calls:
+            tool_messages = run_tool_calls(tools, cached_tool_calls)
+            if not any(message.status == "error" for message in tool_messages):
+                tool_evaluation = EvaluationSchema(exit=True, success=True, response="\n".join([str(message) for message in tool_messages]))
+                return {"route": None, "tool_response": tool_messages[-1], "tool_evaluation": tool_evaluation, "plan": None}
+            increment("intent_router.replay_failed")
+
         # 1. Pass ONLY what the child needs (e.g., the last few messages)
-        child_input = {"user_input": user_input}
+        child_input = {"user_input": user_input, "plan": state.get("plan") or ""}
         
         # 2. Invoke the child graph
         result = toolbox_graph.invoke(child_input)
@@ -424,13 +515,14 @@ def get_summary_graph():
         # messy intermediate ToolMessages from the child.
         tool_response = result["tool_response"]
         tool_evaluation = result["tool_evaluation"]
-        return {"route": None, "tool_response": tool_response, "tool_evaluation": tool_evaluation}
+        learn_intent(user_input, result.get("messages", []), bool(tool_evaluation and tool_evaluation.success))
+        # a speculative plan is only good for the first pass through the toolbox
+        return {"route": None, "tool_response": tool_response, "tool_evaluation": tool_evaluation, "plan": None}
 
     # Build the Graph
     builder = StateGraph(SummaryLanggraphState)
     builder.add_node("initialize", initialize)
     builder.add_node("assistant", call_model)
-    builder.add_node("summarize", summarize_content)
     builder.add_node("toolbox", call_toolbox)
 
     builder.set_entry_point("initialize")
@@ -441,17 +533,12 @@ def get_summary_graph():
         lambda state: state.get("route", "__end__"),
         {
             "toolbox": "toolbox",
-            "__end__": "summarize" # This will route to summarize if no tools are called
+            "__end__": END # the summary is written in the background once the answer is sent, see chat_summarizer
         }
     )
 
     # After tools run, they must always go back to the assistant to interpret results
     builder.add_edge("toolbox", "assistant")
-    
-    # Finally, link summarize to the end
-    builder.add_edge("summarize", END)
 
-    graph = builder.compile(checkpointer=MemorySaver())
-
-    save_langgraph_graph("backend/images/summary_graph.png", graph)
-    return graph
\ No newline at end of file
+    graph = builder.compile(checkpointer=get_chat_checkpointer())
+    return graph
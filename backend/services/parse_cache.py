@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+import os
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database import AsyncSessionLocal
+from backend.db_models.db_models import ErrorLogParseCache
+from backend.pydantic_models.error_models import ErrorLogBase
+from backend.helpers.metrics import increment
+
+
+PARSE_CACHE_SIZE = int(os.getenv("PARSE_CACHE_SIZE", "1024")) # Max entries kept in memory
+
+# Level 1: in-process LRU, level 2: the error_log_parse_cache table
+_memory_cache: "OrderedDict[str, ErrorLogBase]" = OrderedDict()
+_lock = Lock()
+
+
+def _remember(fingerprint: str, error_log: ErrorLogBase) -> None:
+    with _lock:
+        _memory_cache[fingerprint] = error_log
+        _memory_cache.move_to_end(fingerprint)
+        while len(_memory_cache) > PARSE_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+            increment("parse_cache.eviction")
+
+
+async def _load(db: AsyncSession, fingerprint: str) -> Optional[ErrorLogBase]:
+    cached = await db.scalar(select(ErrorLogParseCache).filter(ErrorLogParseCache.fingerprint == fingerprint))
+    # ends the read, the caller may be about to wait on the LLM
+    await db.commit()
+    return ErrorLogBase.model_validate(cached, from_attributes=True) if cached else None
+
+
+async def _store(db: AsyncSession, fingerprint: str, error_log: ErrorLogBase) -> None:
+    try:
+        async with db.begin_nested():
+            db.add(ErrorLogParseCache(fingerprint=fingerprint, **error_log.model_dump()))
+    except IntegrityError:
+        # another request cached the same fingerprint first
+        pass
+    await db.commit()
+
+
+async def get_cached_error_log(fingerprint: str, db: Optional[AsyncSession] = None) -> Optional[ErrorLogBase]:
+    """
+    Looks up a previously parsed error log by its fingerprint, first in memory, then in the database.
+    Pass the request's session to read with it instead of taking another connection, it is committed, so nothing may be pending in it.
+    """
+    with _lock:
+        error_log = _memory_cache.get(fingerprint)
+        if error_log:
+            _memory_cache.move_to_end(fingerprint)
+    if error_log:
+        increment("parse_cache.memory_hit")
+        return error_log
+
+    if db is None:
+        async with AsyncSessionLocal() as db:
+            error_log = await _load(db, fingerprint)
+    else:
+        error_log = await _load(db, fingerprint)
+    if not error_log:
+        increment("parse_cache.miss")
+        return None
+
+    increment("parse_cache.db_hit")
+    _remember(fingerprint, error_log)
+    return error_log
+
+
+async def cache_error_log(fingerprint: str, error_log: ErrorLogBase, db: Optional[AsyncSession] = None) -> None:
+    # like get_cached_error_log, the request's session is committed
+    _remember(fingerprint, error_log)
+    if db is None:
+        async with AsyncSessionLocal() as db:
+            await _store(db, fingerprint, error_log)
+    else:
+        await _store(db, fingerprint, error_log)
@@ -0,0 +1,77 @@
+"""
+Graphs, LLM clients and vector stores, built the first time they are used instead of at import.
+Factories are given as "module:function" and only imported when the service is built,
+so importing the app doesn't pull in LangGraph, OpenAI or Chroma, and doesn't touch the network.
+"""
+from threading import Lock, Thread
+from typing import Any, Dict, Iterable, Optional
+import asyncio
+import importlib
+import os
+import time
+
+
+# Services built on a background thread once the app has started, so the first requests don't pay for them
+WARM_SERVICES = [name.strip() for name in os.getenv("WARM_SERVICES", "error_log_graph,summary_graph,vector_dbs").split(",") if name.strip()]
+
+SERVICE_FACTORIES = {
+    "llm": "backend.services.langgraph:build_llm",
+    "llm_with_tools": "backend.services.langgraph:build_llm_with_tools",
+    "error_log_graph": "backend.services.langgraph:get_evaulation_error_log_graph",
+    "toolbox_graph": "backend.services.langgraph:get_toolbox_graph",
+    "summary_graph": "backend.services.langgraph:get_summary_graph",
+    "embedding": "backend.services.vector_db:build_embedding",
+    "vector_dbs": "backend.services.vector_db:build_vector_dbs",
+}
+
+_services: Dict[str, Any] = {}
+_build_seconds: Dict[str, float] = {}
+_locks: Dict[str, Lock] = {name: Lock() for name in SERVICE_FACTORIES}
+
+
+def get_service(name: str) -> Any:
+    """
+    Get a service, building it on first use. Callers asking while it is being built wait for that build.
+    """
+    service = _services.get(name)
+    if service is not None:
+        return service
+    if name not in SERVICE_FACTORIES:
+        raise ValueError(f"Service {name} not found")
+    with _locks[name]:
+        if name not in _services:
+            module_name, factory_name = SERVICE_FACTORIES[name].split(":")
+            start = time.perf_counter()
+            factory = getattr(importlib.import_module(module_name), factory_name)
+            _services[name] = factory()
+            _build_seconds[name] = time.perf_counter() - start
+            print(f"Built service '{name}' in {_build_seconds[name]:.2f}s.")
+        return _services[name]
+
+
+async def aget_service(name: str) -> Any:
+    """
+    get_service for coroutines, a service that isn't built yet is built off the event loop.
+    """
+    service = _services.get(name)
+    if service is not None:
+        return service
+    return await asyncio.to_thread(get_service, name)
+
+
+def get_service_build_times() -> Dict[str, float]:
+    # the imports a service needed are counted against the first one that needed them
+    return dict(_build_seconds)
+
+
+def warm_services(names: Optional[Iterable[str]] = None) -> None:
+    for name in WARM_SERVICES if names is None else names:
+        try:
+            get_service(name)
+        except Exception as e:
+            # it is built again on first use
+            print(f"Failed to build service '{name}': {e}")
+
+
+def start_warming_services(names: Optional[Iterable[str]] = None) -> None:
+    Thread(target=warm_services, args=(names,), daemon=True).start()
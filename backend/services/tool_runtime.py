@@ -0,0 +1,144 @@
+"""
+Runs the toolbox's tool calls in a thread pool, with a timeout for each call.
+The calls of one AIMessage that only read run at the same time, the ones that write run on their own, in the order they were made.
+Every tool opens and closes its own session, so the pool's threads hold at most TOOL_WORKERS of the engine's connections however long the chat goes on.
+The sessions stop their statements at the call's deadline, so a timed out call gives its thread and connection back instead of running on.
+"""
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Any, Dict, Iterator, List, Optional
+import os
+import time
+
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal, engine
+from backend.helpers.metrics import increment
+
+
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "8")) # Tool calls running at once, across all chats of the process
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT_SECONDS", "30")) # Seconds a tool call gets before the toolbox moves on without it
+# Timeouts of single tools, e.g. TOOL_TIMEOUTS=group_error_logs=60,get_current_date_time=2
+TOOL_TIMEOUTS = {
+    name.strip(): float(seconds)
+    for name, seconds in (item.split("=", 1) for item in os.getenv("TOOL_TIMEOUTS", "").split(",") if "=" in item)
+}
+
+# Tools that change the database, they don't run alongside other calls
+WRITE_TOOLS = {"create_project", "update_project", "delete_projects"}
+TOOL_PROGRESS_STEPS = 1000 # SQLite instructions between checks of the deadline
+
+# time.monotonic() by which the running tool call has to be done, None outside of run_tool_calls
+tool_deadline: ContextVar[Optional[float]] = ContextVar("tool_deadline", default=None)
+
+_tool_pool: Optional[ThreadPoolExecutor] = None
+
+
+def clear_progress_handler(dbapi_connection, _) -> None:
+    # a connection goes back to the pool without the deadline of the call that used it
+    dbapi_connection.set_progress_handler(None, 0)
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "checkin", clear_progress_handler)
+
+
+def limit_transaction(deadline: float, connection) -> None:
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("The tool call ran out of time")
+    if connection.dialect.name == "sqlite":
+        # SQLite aborts the running statement with "interrupted" once the handler returns True
+        connection.connection.driver_connection.set_progress_handler(lambda: time.monotonic() > deadline, TOOL_PROGRESS_STEPS)
+    elif connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(remaining * 1000))}")
+
+
+@contextmanager
+def tool_session() -> Iterator[Session]:
+    """
+    A session for the tools, every transaction it begins during a tool call is cut off at the call's deadline.
+    """
+    deadline = tool_deadline.get()
+    with SessionLocal() as db:
+        if deadline is not None:
+            event.listen(db, "after_begin", lambda _session, _transaction, connection: limit_transaction(deadline, connection))
+        yield db
+
+
+def get_tool_pool() -> ThreadPoolExecutor:
+    global _tool_pool
+    if _tool_pool is None:
+        _tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+    return _tool_pool
+
+
+def shutdown_tool_pool() -> None:
+    global _tool_pool
+    if _tool_pool is not None:
+        _tool_pool.shutdown(cancel_futures=True)
+        _tool_pool = None
+
+
+def error_message(tool_call: Dict[str, Any], content: str) -> ToolMessage:
+    # what ToolNode returns for a failed call, the evaluator sends it back to the toolbox to fix
+    return ToolMessage(content=f"{content}\n Please fix your mistakes.", name=tool_call["name"], tool_call_id=tool_call["id"], status="error")
+
+
+def run_tool_call(tool: BaseTool, tool_call: Dict[str, Any], deadline: Optional[float] = None) -> ToolMessage:
+    tool_deadline.set(deadline)
+    try:
+        # invoked with the call itself, not its args, the tool returns a ToolMessage
+        return tool.invoke({**tool_call, "type": "tool_call"})
+    except Exception as e:
+        return error_message(tool_call, f"Error: {e!r}")
+
+
+def batch_tool_calls(tool_calls: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    # consecutive reads share a batch, every write is a batch of its own
+    batches: List[List[Dict[str, Any]]] = []
+    for tool_call in tool_calls:
+        writes = tool_call["name"] in WRITE_TOOLS
+        if writes or not batches or batches[-1][0]["name"] in WRITE_TOOLS:
+            batches.append([tool_call])
+        else:
+            batches[-1].append(tool_call)
+    return batches
+
+
+def run_tool_calls(tools: List[BaseTool], tool_calls: List[Dict[str, Any]]) -> List[ToolMessage]:
+    """
+    Runs the tool calls of an AIMessage and returns their ToolMessages, in the order of the calls.
+    A call that fails or runs out of time gets an error ToolMessage instead of failing the rest.
+    The statement a timed out call is running is stopped by its tool_session, the call's result is dropped.
+    """
+    tools_by_name = {tool.name: tool for tool in tools}
+    pool = get_tool_pool()
+    results: Dict[str, ToolMessage] = {}
+    for batch in batch_tool_calls(tool_calls):
+        started = time.monotonic()
+        futures = []
+        for tool_call in batch:
+            tool = tools_by_name.get(tool_call["name"])
+            if tool is None:
+                results[tool_call["id"]] = error_message(tool_call, f"Error: {tool_call['name']} is not a valid tool, try one of [{', '.join(tools_by_name)}].")
+                continue
+            deadline = started + TOOL_TIMEOUTS.get(tool_call["name"], TOOL_TIMEOUT)
+            # the context carries the graph's callbacks into the thread
+            futures.append((tool_call, pool.submit(copy_context().run, run_tool_call, tool, tool_call, deadline)))
+        for tool_call, future in futures:
+            timeout = TOOL_TIMEOUTS.get(tool_call["name"], TOOL_TIMEOUT)
+            try:
+                results[tool_call["id"]] = future.result(timeout=max(0, started + timeout - time.monotonic()))
+            except TimeoutError:
+                future.cancel()
+                increment("tool_runtime.timeout")
+                print(f"Tool call {tool_call['name']} timed out after {timeout}s")
+                results[tool_call["id"]] = error_message(tool_call, f"Error: {tool_call['name']} timed out after {timeout} seconds.")
+        increment("tool_runtime.calls", len(batch))
+        if len(batch) > 1:
+            increment("tool_runtime.parallel_calls", len(batch))
+    return [results[tool_call["id"]] for tool_call in tool_calls]
@@ -1,56 +1,82 @@
 from dotenv import load_dotenv
 
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
-from langchain_community.document_loaders import UnstructuredFileLoader
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from typing import Any, List, Optional, Dict
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional, Dict
 from pathlib import Path
 from datetime import datetime
 from io import BytesIO
-import hashlib
-import spacy
+from threading import Lock
+import os
+
+from backend.helpers.document_parser import TEXT_SPLITTER
+from backend.services.embedding_cache import CachedEmbeddings
+from backend.services.hybrid_search import hybrid_search
+from backend.services.registry import get_service
+from backend.services.vector_writer import BufferedVectorWriter, get_buffered_writer, remove_buffered_writer, write_documents
+
+if TYPE_CHECKING:
+    import spacy
 
 
 load_dotenv(dotenv_path="backend/.env")
 
 PERSISTENT_DIRECTORY = "backend/chroma_store"
 COLLECTION_NAME = "project_errors" # What tkind of data we're storing
-EMBEDDING = OpenAIEmbeddings(model="text-embedding-3-small")
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+SPACY_MODEL = "en_core_web_sm"
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "256")) # Texts per nlp.pipe batch
+# Only the entity recognizer is used, en_core_web_sm's ner doesn't depend on the shared tok2vec
+SPACY_EXCLUDED_COMPONENTS = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
+
+_nlp: Optional["spacy.Language"] = None
+_nlp_lock = Lock()
 
-vector_dbs = {
-    COLLECTION_NAME: Chroma(persist_directory=PERSISTENT_DIRECTORY, embedding_function=EMBEDDING, collection_name=COLLECTION_NAME)
-}
+def build_embedding() -> CachedEmbeddings:
+    from langchain_openai import OpenAIEmbeddings
+    return CachedEmbeddings(OpenAIEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL) # Chunks seen before are not embedded again
+
+def build_vector_dbs() -> Dict[str, Any]:
+    from langchain_chroma import Chroma
+    return {
+        COLLECTION_NAME: Chroma(persist_directory=PERSISTENT_DIRECTORY, embedding_function=get_service("embedding"), collection_name=COLLECTION_NAME)
+    }
 
 def get_vector_db(collection_name: str):
     """
-    Get a vector database.
+    Get a vector database, the stores are opened on first use.
     """
-    collection = vector_dbs.get(collection_name)
+    collection = get_service("vector_dbs").get(collection_name)
     if not collection:
         raise ValueError(f"Vector database {collection_name} not found")
     return collection
 
+def get_vector_writer(collection_name: str) -> BufferedVectorWriter:
+    """
+    Get the buffered writer of a vector database, documents added to it are written in batches.
+    """
+    return get_buffered_writer(collection_name, lambda: BufferedVectorWriter(get_vector_db(collection_name), TEXT_SPLITTER))
+
 def delete_vector_db(collection_name: str) -> None:
     collection = get_vector_db(collection_name)
     collection.delete_collection()
-    if collection_name in vector_dbs:
-        del vector_dbs[collection_name]
+    remove_buffered_writer(collection_name)
+    get_service("vector_dbs").pop(collection_name, None)
 
 def add_documents_to_db(collection_name: str, docs: List[Document]) -> int:
+    """
+    Chunks the documents and stores the chunks that aren't in the collection yet, right away.
+    Returns the number of chunks added.
+    """
     collection = get_vector_db(collection_name)
-    
-    # Chunk the documents properly
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    split_docs = text_splitter.split_documents(docs)
-    
-    collection.add_documents(split_docs)
-    collection.persist()
-    return len(split_docs)
+    return write_documents(collection, docs, TEXT_SPLITTER)
 
 def add_text_to_vector_db(collection_name: str, text: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Queues the text on the collection's buffered writer, it is written with the next batch.
+    Returns the number of documents queued.
+    """
     # Wrap raw text into a Document object
     if metadata is None:
         metadata = {}
@@ -58,28 +84,54 @@ def add_text_to_vector_db(collection_name: str, text: str, metadata: Optional[Di
     metadata["created_timestamp"] = int(datetime.now().timestamp()) # Unix timestamp
 
     doc = Document(page_content=text, metadata=metadata)
-    return add_documents_to_db(collection_name, [doc])
+    get_vector_writer(collection_name).add([doc])
+    return 1
 
 def add_file_to_vector_db(collection_name: str, file_as_bytes: bytes, metadata: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Loads a whole file from memory, fine for small files. Large ones should go through
+    document_ingest.add_file_path_to_vector_db, which parses them a part at a time.
+    """
+    from langchain_community.document_loaders import UnstructuredFileLoader
+
     # Note: Since Unstructured is giving you trouble, make sure 
     # you've switched to a working loader like PyPDF or similar if needed.
     loader = UnstructuredFileLoader(BytesIO(file_as_bytes))
     docs = loader.load()
-    
-    # Merge custom metadata into the loaded docs if provided
-    if metadata:
-        for doc in docs:
-            doc.metadata.update(metadata)
-    
-    metadata["created_timestamp"] = int(datetime.now().timestamp()) # Unix timestamp
+
+    metadata = {**(metadata or {}), "created_timestamp": int(datetime.now().timestamp())} # Unix timestamp
+
+    # Merge custom metadata into the loaded docs
+    for doc in docs:
+        doc.metadata.update(metadata)
             
     return add_documents_to_db(collection_name, docs)
 
-def search_vector_db(collection_name: str, query: str, k: int = 5) -> List[Document]:
+def search_vector_db(collection_name: str, query: str, k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+    """
+    Hybrid keyword and vector search, filter takes Chroma's where syntax, e.g. {"project_id": 1}.
+    """
     collection = get_vector_db(collection_name)
-    return collection.similarity_search(query, k=k)
+    return hybrid_search(collection, query, k=k, filter=filter)
+
+def get_nlp() -> "spacy.Language":
+    """
+    Get the spaCy pipeline, loaded once per process on first use with only the entity recognizer.
+    """
+    global _nlp
+    with _nlp_lock:
+        if _nlp is None:
+            import spacy
+            _nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDED_COMPONENTS)
+        return _nlp
 
 def extract_entities(text: str) -> List[str]:
-    nlp = spacy.load("en_core_web_sm")
-    doc = nlp(text)
+    doc = get_nlp()(text)
     return [ent.text for ent in doc.ents]
+
+def extract_entities_batch(texts: Iterable[str], batch_size: int = SPACY_BATCH_SIZE, n_process: int = 1) -> List[List[str]]:
+    """
+    Extracts the entities of many texts at once through nlp.pipe, in the order of the texts.
+    n_process > 1 tags in worker processes, each loads its own copy of the model so it only pays off for large backlogs.
+    """
+    return [[ent.text for ent in doc.ents] for doc in get_nlp().pipe(texts, batch_size=batch_size, n_process=n_process)]
@@ -0,0 +1,225 @@
+from threading import Event, Lock, Thread
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set
+import os
+import time
+
+from langchain_core.documents import Document
+from langchain_text_splitters import TextSplitter
+
+from backend.services.embedding_cache import text_hash
+from backend.services.hybrid_search import add_to_lexical_index, remove_from_lexical_index
+from backend.helpers.metrics import increment
+
+if TYPE_CHECKING:
+    from langchain_core.vectorstores import VectorStore
+
+
+VECTOR_WRITE_BUFFER_SIZE = int(os.getenv("VECTOR_WRITE_BUFFER_SIZE", "256")) # Documents buffered before a flush
+VECTOR_WRITE_INTERVAL = float(os.getenv("VECTOR_WRITE_INTERVAL", "5.0")) # Seconds a partial buffer waits before it is flushed
+VECTOR_WRITE_MAX_BUFFER = int(os.getenv("VECTOR_WRITE_MAX_BUFFER", "4096")) # Documents buffered at most, the oldest are dropped past it
+VECTOR_WRITE_MAX_FAILURES = int(os.getenv("VECTOR_WRITE_MAX_FAILURES", "5")) # Failed writes in a row before a batch is dropped
+VECTOR_WRITE_MAX_BACKOFF = 60.0 # Seconds at most between retries of a failing write
+EMBEDDING_BATCH_SIZE = 1000 # Texts per embedding request when the model doesn't say
+# Metadata a chunk is stored once per, the same text under another project or file is another chunk
+CHUNK_SCOPE_KEYS = ("project_id", "source")
+
+
+def chunk_id(doc: Document) -> str:
+    scope = [f"{key}={doc.metadata[key]}" for key in CHUNK_SCOPE_KEYS if doc.metadata.get(key) is not None]
+    # chunks without any of them keep the id of their text alone
+    return text_hash("\n".join(scope + [doc.page_content]))
+
+
+def write_documents(collection: "VectorStore", docs: List[Document], text_splitter: Optional[TextSplitter]) -> int:
+    """
+    Splits the documents and stores the chunks that aren't in the collection yet, in batches of the embedding model's max batch size.
+    Chunk IDs are the sha256 of their text and its CHUNK_SCOPE_KEYS metadata, so writing the same content to the same project and file again is a no-op.
+    Documents that already have an id are stored whole under it instead, replacing the previous version.
+    Pass no text_splitter for documents that are already chunks.
+    Returns the number of chunks added.
+    """
+    split_docs = [doc for doc in docs if not doc.id]
+    if text_splitter is not None:
+        split_docs = text_splitter.split_documents(split_docs)
+    chunks = {chunk_id(doc): doc for doc in split_docs}
+    existing_ids = set(collection.get(ids=list(chunks), include=[])["ids"]) if chunks else set()
+    new_chunks = [(chunk_id, doc) for chunk_id, doc in chunks.items() if chunk_id not in existing_ids]
+    increment("vector_db.duplicate_chunk", len(split_docs) - len(new_chunks))
+    # the latest version of a document wins if it was buffered more than once
+    new_chunks.extend({doc.id: doc for doc in docs if doc.id}.items())
+
+    batch_size = getattr(collection.embeddings, "batch_size", EMBEDDING_BATCH_SIZE)
+    for start in range(0, len(new_chunks), batch_size):
+        batch = new_chunks[start:start + batch_size]
+        ids = [chunk_id for chunk_id, _ in batch]
+        collection.add_documents([doc for _, doc in batch], ids=ids)
+        add_to_lexical_index(collection, ids, [doc for _, doc in batch])
+    return len(new_chunks)
+
+
+class BufferedVectorWriter:
+    """
+    Collects documents for a collection and writes them in large batches on a single background thread,
+    once VECTOR_WRITE_BUFFER_SIZE documents are waiting or VECTOR_WRITE_INTERVAL seconds after the first one arrived.
+    Deletes are collected the same way and run at the start of the next write.
+    A failing write is retried with a growing delay, and its documents are dropped after VECTOR_WRITE_MAX_FAILURES failures in a row.
+    At most VECTOR_WRITE_MAX_BUFFER documents wait, the oldest are dropped past it.
+    """
+
+    def __init__(self, collection: "VectorStore", text_splitter: TextSplitter, buffer_size: int = VECTOR_WRITE_BUFFER_SIZE, interval: float = VECTOR_WRITE_INTERVAL, max_buffer: int = VECTOR_WRITE_MAX_BUFFER):
+        self.collection = collection
+        self.text_splitter = text_splitter
+        self.buffer_size = buffer_size
+        self.interval = interval
+        self.max_buffer = max(max_buffer, buffer_size)
+        self._buffer: List[Document] = []
+        self._deleted: Set[str] = set() # ids to delete with the next write
+        self._first_added: Optional[float] = None # when the oldest buffered document or delete arrived
+        self._failures = 0 # failed writes in a row
+        self._retry_at = 0.0 # no write before this while failing
+        self._dropping = False # the buffer overflowed since the last write
+        self._lock = Lock()
+        self._flush_lock = Lock() # one flush at a time, so batches are written in order
+        self._wake = Event()
+        self._closed = False
+        self._flusher: Optional[Thread] = None
+
+    def add(self, docs: List[Document]) -> None:
+        """
+        Buffers the documents. Never waits for a write, the flusher thread writes them.
+        """
+        with self._lock:
+            self._buffer.extend(docs)
+            self._trim()
+            self._pending()
+
+    def delete(self, ids: List[str]) -> None:
+        """
+        Deletes the documents from the collection and its BM25 index with the next write. Never waits for it either.
+        Buffered documents with these ids are dropped, a document added again afterwards is written after the delete.
+        """
+        ids = set(ids)
+        with self._lock:
+            self._buffer = [doc for doc in self._buffer if doc.id not in ids]
+            self._deleted |= ids
+            self._pending()
+
+    def _pending(self) -> None:
+        # call with the lock held, after something was buffered
+        if self._first_added is None:
+            self._first_added = time.monotonic()
+        if self._flusher is None:
+            self._flusher = Thread(target=self._run, daemon=True, name="vector-writer")
+            self._flusher.start()
+        if len(self._buffer) + len(self._deleted) >= self.buffer_size:
+            self._wake.set()
+
+    def close(self) -> None:
+        # stops the flusher thread, whatever is still buffered is dropped unless flushed first
+        self._closed = True
+        self._wake.set()
+
+    def _trim(self) -> None:
+        # call with the lock held
+        dropped = len(self._buffer) - self.max_buffer
+        if dropped > 0:
+            del self._buffer[:dropped]
+            increment("vector_writer.dropped", dropped)
+            # once per write that falls behind, not once per document
+            if not self._dropping:
+                print(f"Vector write buffer full ({self.max_buffer} documents), dropping the oldest.")
+            self._dropping = True
+
+    def _next_flush_in(self) -> Optional[float]:
+        # seconds until the next flush is due, None while there is nothing to write
+        with self._lock:
+            if not self._buffer and not self._deleted:
+                return None
+            due = self._first_added + self.interval
+            if len(self._buffer) + len(self._deleted) >= self.buffer_size:
+                due = time.monotonic()
+            return max(0.0, max(due, self._retry_at) - time.monotonic())
+
+    def _run(self) -> None:
+        while not self._closed:
+            timeout = self._next_flush_in()
+            if timeout is None or timeout > 0:
+                self._wake.wait(timeout)
+                self._wake.clear()
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Failed to flush buffered documents: {e}")
+
+    def flush(self) -> int:
+        """
+        Runs the buffered deletes and writes everything buffered so far. Returns the number of chunks added.
+        Documents and deletes are put back in the buffer if the write fails, unless it failed VECTOR_WRITE_MAX_FAILURES times in a row.
+        """
+        with self._flush_lock:
+            with self._lock:
+                docs, self._buffer = self._buffer, []
+                deleted, self._deleted = self._deleted, set()
+                self._first_added = None
+                self._dropping = False
+            if not docs and not deleted:
+                return 0
+            try:
+                if deleted:
+                    self.collection.delete(ids=list(deleted))
+                    remove_from_lexical_index(self.collection, list(deleted))
+                    increment("vector_writer.deleted", len(deleted))
+                    deleted = set() # done, only the documents are retried if their write fails
+                added = write_documents(self.collection, docs, self.text_splitter) if docs else 0
+            except Exception:
+                with self._lock:
+                    self._failures += 1
+                    if self._failures >= VECTOR_WRITE_MAX_FAILURES:
+                        increment("vector_writer.dropped", len(docs) + len(deleted))
+                        print(f"Dropped {len(docs)} documents and {len(deleted)} deletes after {self._failures} failed writes.")
+                        self._failures = 0
+                    else:
+                        self._buffer[:0] = docs
+                        self._deleted |= deleted
+                        self._trim()
+                    self._retry_at = time.monotonic() + min(self.interval * 2 ** self._failures, VECTOR_WRITE_MAX_BACKOFF)
+                    if (self._buffer or self._deleted) and self._first_added is None:
+                        self._first_added = time.monotonic()
+                increment("vector_writer.failed")
+                raise
+            with self._lock:
+                self._failures = 0
+                self._retry_at = 0.0
+        increment("vector_writer.flush")
+        increment("vector_writer.document", len(docs))
+        return added
+
+
+_writers: Dict[str, BufferedVectorWriter] = {}
+_writers_lock = Lock()
+
+
+def get_buffered_writer(collection_name: str, create_writer: Callable[[], BufferedVectorWriter]) -> BufferedVectorWriter:
+    with _writers_lock:
+        writer = _writers.get(collection_name)
+        if writer is None:
+            writer = _writers[collection_name] = create_writer()
+        return writer
+
+
+def remove_buffered_writer(collection_name: str) -> None:
+    with _writers_lock:
+        writer = _writers.pop(collection_name, None)
+    if writer is not None:
+        writer.close()
+
+
+def flush_vector_writers() -> None:
+    # called on shutdown, nothing buffered may be lost
+    for collection_name, writer in list(_writers.items()):
+        try:
+            added = writer.flush()
+            print(f"Flushed {added} chunks to {collection_name}.")
+        except Exception as e:
+            print(f"Failed to flush buffered documents for {collection_name}: {e}")
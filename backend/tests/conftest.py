@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+import pytest
+
+
+# The app reads these on import, the tests get a database and vector store of their own
+TEST_DIR = tempfile.mkdtemp(prefix="error_manager_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DIR}/error_manager.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["CHAT_CHECKPOINT_DB"] = f"{TEST_DIR}/chat_checkpoints.db"
+os.environ["WARM_SERVICES"] = ""
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from fastapi.testclient import TestClient
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from backend.main import app
+    from backend.services.registry import get_service
+
+    # the vector store's directory is relative to the working directory
+    monkeypatch.chdir(TEST_DIR)
+    get_service("embedding").embeddings = DeterministicFakeEmbedding(size=16)
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,24 @@
+from backend.services.vector_db import COLLECTION_NAME, get_vector_db
+
+
+RUNBOOK = b"Restart the worker when the queue backs up.\n" * 40
+
+
+def upload(client, project_id: int, filename: str = "runbook.txt") -> dict:
+    response = client.post(f"/documents/{COLLECTION_NAME}", params={"filename": filename, "project_id": project_id}, content=RUNBOOK)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_same_file_is_stored_for_each_project(client):
+    first, second = (client.post("/projects/", json={"project_name": name, "project_description": name}).json()["id"] for name in ("first", "second"))
+
+    added = upload(client, first)["added"]
+    assert added > 0
+    assert upload(client, second)["added"] == added
+    # the same file in the same project is already there
+    assert upload(client, first)["added"] == 0
+
+    collection = get_vector_db(COLLECTION_NAME)
+    for project_id in (first, second):
+        assert len(collection.get(where={"project_id": project_id})["ids"]) == added
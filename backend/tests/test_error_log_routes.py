@@ -0,0 +1,97 @@
+TRACEBACK = (
+    "Traceback (most recent call last):\n"
+    '  File "/app/worker.py", line {line}, in run\n'
+    "    handle(job)\n"
+    "ValueError: job {line} failed\n"
+)
+
+
+def create_project(client) -> int:
+    return client.post("/projects/", json={"project_name": "tests", "project_description": "tests"}).json()["id"]
+
+
+def report(client, project_id: int, count: int) -> list:
+    return [client.post(f"/error-logs/project_id/{project_id}", json={"traceback": TRACEBACK.format(line=line)}).json() for line in range(count)]
+
+
+def stats_by_status(client, project_id: int) -> dict:
+    stats = client.get(f"/projects/id/{project_id}/stats").json()
+    return {item["value"]: item["count"] for item in stats["by_status"]}
+
+
+def test_status_change_of_grouped_log_moves_its_group_in_stats(client):
+    project_id = create_project(client)
+    error_logs = report(client, project_id, 3)
+    assert stats_by_status(client, project_id) == {"pending": 3}
+
+    response = client.patch(f"/error-logs/id/{error_logs[0]['id']}", json={"project_id": project_id, "status": "ignored"})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "ignored"
+    assert stats_by_status(client, project_id) == {"ignored": 3}
+    groups = client.get(f"/error-logs/project_id/{project_id}/groups").json()
+    assert [group["status"] for group in groups] == ["ignored"]
+    assert {error_log["status"] for error_log in client.get(f"/error-logs/project_id/{project_id}").json()["items"]} == {"ignored"}
+
+
+def test_grouped_log_cant_move_to_another_project(client):
+    project_id = create_project(client)
+    other_project_id = create_project(client)
+    error_logs = report(client, project_id, 2)
+
+    response = client.patch(f"/error-logs/id/{error_logs[0]['id']}", json={"project_id": other_project_id, "status": "resolved"})
+
+    assert response.status_code == 409
+    assert stats_by_status(client, project_id) == {"pending": 2}
+    assert stats_by_status(client, other_project_id) == {}
+
+
+def test_unknown_status_is_rejected(client):
+    project_id = create_project(client)
+    error_log = report(client, project_id, 1)[0]
+
+    assert client.patch(f"/error-logs/groups/id/{error_log['group_id']}", json={"status": "closed"}).status_code == 422
+    assert client.patch(f"/error-logs/id/{error_log['id']}", json={"project_id": project_id, "status": "closed"}).status_code == 422
+    assert client.patch(f"/error-logs/groups/id/{error_log['group_id']}", json={"status": "resolved"}).status_code == 200
+    assert stats_by_status(client, project_id) == {"resolved": 1}
+
+
+CHAINED_TRACEBACK = (
+    "Traceback (most recent call last):\n"
+    '  File "/app/db.py", line 5, in load\n'
+    "    rows[0]\n"
+    "IndexError: list index out of range\n"
+    "\n"
+    "During handling of the above exception, another exception occurred:\n"
+    "\n"
+    + TRACEBACK
+)
+
+
+def test_backfill_groups_stored_logs_with_new_reports(client):
+    from backend.database import AsyncSessionLocal, SessionLocal
+    from backend.db_models.db_models import ErrorLog
+    from backend.helpers.traceback_parser import parse_python_traceback
+    from backend.services.error_groups import ERROR_GROUP_MAX_SAMPLES, backfill_error_groups
+
+    project_id = create_project(client)
+    error_log = client.post(f"/error-logs/project_id/{project_id}", json={"traceback": CHAINED_TRACEBACK.format(line=0)}).json()
+    # logs stored before error groups existed keep only the parsed traceback
+    with SessionLocal() as db:
+        for line in range(1, ERROR_GROUP_MAX_SAMPLES + 3):
+            parsed = parse_python_traceback(CHAINED_TRACEBACK.format(line=line))
+            db.add(ErrorLog(project_id=project_id, **parsed.model_dump(), status="resolved"))
+        db.commit()
+
+    async def backfill():
+        async with AsyncSessionLocal() as db:
+            return await backfill_error_groups(db)
+
+    stale_ids = client.portal.call(backfill)
+
+    groups = client.get(f"/error-logs/project_id/{project_id}/groups").json()
+    assert [(group["id"], group["occurrence_count"], group["status"]) for group in groups] == [(error_log["group_id"], ERROR_GROUP_MAX_SAMPLES + 3, "resolved")]
+    error_logs = client.get(f"/error-logs/project_id/{project_id}").json()["items"]
+    assert len(error_logs) == ERROR_GROUP_MAX_SAMPLES
+    assert len(stale_ids) == 3 and error_log["id"] in stale_ids
+    assert stats_by_status(client, project_id) == {"resolved": ERROR_GROUP_MAX_SAMPLES + 3}
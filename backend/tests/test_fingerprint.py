@@ -0,0 +1,97 @@
+from backend.helpers.fingerprint import fingerprint_traceback, normalize_path, normalize_text, rebase_cached_error_log
+from backend.helpers.traceback_parser import parse_python_traceback
+
+
+TRACEBACK = (
+    "Traceback (most recent call last):\n"
+    '  File "{root}/app/worker.py", line {line}, in run\n'
+    "    handle(job)\n"
+    '  File "{root}/app/jobs.py", line 12, in handle\n'
+    "    raise KeyError(job)\n"
+    "KeyError: 'job-{job}' at 0x{address}\n"
+)
+
+
+def traceback(root: str = "", line: int = 3, job: int = 1, address: str = "7f3a2b") -> str:
+    return TRACEBACK.format(root=root, line=line, job=job, address=address)
+
+
+def test_same_error_has_same_fingerprint():
+    assert fingerprint_traceback(traceback(line=3, job=1, address="7f3a2b")) == fingerprint_traceback(traceback(line=30, job=2, address="ffee01"))
+
+
+def test_host_paths_are_ignored():
+    first = traceback().replace("/app/jobs.py", "/home/ci/.venv/lib/python3.12/site-packages/jobs.py")
+    second = traceback().replace("/app/jobs.py", "/usr/local/lib/python3.11/site-packages/jobs.py")
+
+    assert fingerprint_traceback(first) == fingerprint_traceback(second)
+    assert fingerprint_traceback(traceback(root="/tmp/build-1a2b")) == fingerprint_traceback(traceback(root="/tmp/build-9f8e"))
+
+
+def test_different_errors_have_different_fingerprints():
+    base = fingerprint_traceback(traceback())
+
+    assert fingerprint_traceback(traceback().replace("KeyError:", "ValueError:")) != base
+    assert fingerprint_traceback(traceback().replace("in handle", "in process")) != base
+    assert fingerprint_traceback(traceback().replace("/app/jobs.py", "/app/tasks.py")) != base
+
+
+def test_text_without_frames_uses_its_normalized_content():
+    assert fingerprint_traceback("TimeoutError while calling 10.0.0.1 after 30s") == fingerprint_traceback("TimeoutError while calling 10.0.0.7 after 31s")
+    assert fingerprint_traceback("TimeoutError while calling the api") != fingerprint_traceback("ConnectionError while calling the api")
+
+
+def test_normalize_text_and_path():
+    assert normalize_text("id 550e8400-e29b-41d4-a716-446655440000 at 0xdeadbeef in /tmp/x1/y.py, line  12") == "id <uuid> at <address> in <tmp>/y.py, line <n>"
+    assert normalize_path("C:\\venv\\Lib\\site-packages\\requests\\api.py") == "site-packages/requests/api.py"
+
+
+def test_rebase_takes_message_and_line_from_new_report():
+    cached = parse_python_traceback(traceback(line=3, job=1))
+    text = traceback(line=30, job=2, address="ffee01").replace("line 12, in handle", "line 15, in handle")
+
+    rebased = rebase_cached_error_log(cached, text)
+
+    assert rebased.error_type == "KeyError"
+    assert rebased.error_message == "'job-2' at 0xffee01"
+    assert (rebased.source, rebased.line_number) == ("/app/jobs.py", 15)
+    assert rebased.traceback == text
+
+
+def test_rebase_keeps_new_report_source_path():
+    cached = parse_python_traceback(traceback(root="/tmp/build-1a2b"))
+    text = traceback(root="/tmp/build-9f8e")
+
+    assert rebase_cached_error_log(cached, text).source == "/tmp/build-9f8e/app/jobs.py"
+
+
+def test_rebase_finds_source_and_line_in_other_text():
+    cached = parse_python_traceback(traceback())
+    cached = cached.model_copy(update={"traceback": "worker: KeyError 'job-1' at 0x7f3a2b (/app/jobs.py:12)"})
+
+    rebased = rebase_cached_error_log(cached, "worker: KeyError 'job-8' at 0x1 (/app/jobs.py:40)")
+
+    assert rebased.error_message == "'job-8' at 0x1"
+    assert (rebased.source, rebased.line_number) == ("/app/jobs.py", 40)
+
+
+def test_rebase_returns_none_when_the_report_differs():
+    cached = parse_python_traceback(traceback())
+
+    assert rebase_cached_error_log(cached, traceback().replace("KeyError: 'job-1'", "KeyError: 'user-1'")) is None
+    assert rebase_cached_error_log(cached, "worker: KeyError 'job-8' at 0x1 somewhere else") is None
+
+
+def test_chained_traceback_matches_its_stored_traceback():
+    text = (
+        "Traceback (most recent call last):\n"
+        '  File "/app/db.py", line 5, in load\n'
+        "    rows[0]\n"
+        "IndexError: list index out of range\n"
+        "\n"
+        "During handling of the above exception, another exception occurred:\n"
+        "\n"
+        + traceback()
+    )
+
+    assert fingerprint_traceback(text) == fingerprint_traceback(parse_python_traceback(text).traceback) == fingerprint_traceback(traceback())
@@ -0,0 +1,44 @@
+import asyncio
+
+from backend.services import ingest_queue
+
+
+def test_worker_survives_database_errors(monkeypatch):
+    claims = iter([OSError("database is locked"), (1, "traceback"), (2, "traceback")])
+    failed, completed = [], []
+
+    async def claim_job():
+        claim = next(claims, None)
+        if isinstance(claim, Exception):
+            raise claim
+        return claim
+
+    async def parse_error_log_input(traceback):
+        return traceback
+
+    async def complete_job(job_id, parsed):
+        if job_id == 1:
+            raise OSError("disk I/O error")
+        completed.append(job_id)
+
+    async def fail_job(job_id, error):
+        failed.append((job_id, str(error)))
+
+    monkeypatch.setattr(ingest_queue, "claim_job", claim_job)
+    monkeypatch.setattr(ingest_queue, "parse_error_log_input", parse_error_log_input)
+    monkeypatch.setattr(ingest_queue, "complete_job", complete_job)
+    monkeypatch.setattr(ingest_queue, "fail_job", fail_job)
+    monkeypatch.setattr(ingest_queue, "INGEST_POLL_INTERVAL", 0.01)
+
+    async def run() -> int:
+        ingest_queue.start_ingest_workers(1)
+        while not completed:
+            await asyncio.sleep(0.01)
+        workers = sum(not worker.done() for worker in ingest_queue._workers)
+        await ingest_queue.stop_ingest_workers()
+        return workers
+
+    assert asyncio.run(run()) == 1
+    # the claimed job whose completion failed is released for another try
+    assert failed == [(1, "disk I/O error")]
+    assert completed == [2]
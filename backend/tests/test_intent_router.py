@@ -0,0 +1,194 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+import pytest
+
+from backend.services import intent_router
+from backend.services.intent_router import has_intent, learn_intent, match_intent
+
+
+@pytest.fixture(autouse=True)
+def clear_intents():
+    intent_router._intents.clear()
+    yield
+    intent_router._intents.clear()
+
+
+def toolbox_run(user_input: str, *tool_calls: tuple, status: str = "success") -> list:
+    # the messages of a toolbox run with a single round of tool calls
+    calls = [{"name": name, "args": args, "id": f"call_{index}"} for index, (name, args) in enumerate(tool_calls)]
+    return [
+        HumanMessage(content=user_input),
+        AIMessage(content="", tool_calls=calls),
+        *(ToolMessage(content="ok", tool_call_id=call["id"], status=status) for call in calls),
+    ]
+
+
+def learn(user_input: str, *tool_calls: tuple, success: bool = True) -> None:
+    learn_intent(user_input, toolbox_run(user_input, *tool_calls), success)
+
+
+def replayed(tool_calls) -> list:
+    return [(tool_call["name"], tool_call["args"]) for tool_call in tool_calls]
+
+
+def test_learns_pattern_with_slots():
+    learn("Show me project 5", ("get_project", {"project_id": 5}))
+
+    assert list(intent_router._intents) == ["show me project {0}"]
+
+
+def test_replays_only_after_min_agreements():
+    learn("show me project 5", ("get_project", {"project_id": 5}))
+    assert match_intent("show me project 12") is None
+
+    learn("show me project 7", ("get_project", {"project_id": 7}))
+    tool_calls = match_intent("Show me project 12")
+
+    assert replayed(tool_calls) == [("get_project", {"project_id": 12})]
+    assert tool_calls[0]["type"] == "tool_call"
+    assert tool_calls[0]["id"].startswith("call_")
+
+
+def test_fills_slots_with_learned_types():
+    learn("rename project 3 to billing", ("update_project", {"project_id": 3, "project_name": "billing"}))
+    learn("rename project 4 to billing", ("update_project", {"project_id": 4, "project_name": "billing"}))
+
+    # the name is a str slot of one or more words, the id has to be an int
+    assert replayed(match_intent("rename project 8 to payments api")) == [("update_project", {"project_id": 8, "project_name": "payments api"})]
+    assert match_intent("rename project eight to payments") is None
+
+
+def test_slot_values_keep_punctuation_and_filler_words():
+    learn("create project called alpha", ("create_project", {"project_name": "alpha"}))
+    learn("create project called beta", ("create_project", {"project_name": "beta"}))
+
+    assert replayed(match_intent("please create project called Bob's can opener!")) == [("create_project", {"project_name": "Bob's can opener"})]
+    assert replayed(match_intent("create project called hi there")) == [("create_project", {"project_name": "hi there"})]
+
+
+def test_learns_values_with_punctuation_and_filler_words():
+    learn("create project called Bob's can opener", ("create_project", {"project_name": "Bob's can opener"}))
+    learn("create project called gamma", ("create_project", {"project_name": "gamma"}))
+
+    assert list(intent_router._intents) == ["create project called {0}"]
+    assert replayed(match_intent("create project called you-know-what")) == [("create_project", {"project_name": "you-know-what"})]
+
+
+def test_fills_slots_inside_lists():
+    learn("delete project 5", ("delete_projects", {"project_ids": [5]}))
+    learn("delete project 6", ("delete_projects", {"project_ids": [6]}))
+
+    assert replayed(match_intent("delete project 9")) == [("delete_projects", {"project_ids": [9]})]
+
+
+def test_ignores_filler_words():
+    learn("show me project 5", ("get_project", {"project_id": 5}))
+    learn("show me project 6", ("get_project", {"project_id": 6}))
+
+    assert replayed(match_intent("Could you please show me project 7")) == [("get_project", {"project_id": 7})]
+
+
+def test_keeps_values_the_model_wrote_itself():
+    # "open" isn't in the request, it stays a literal argument
+    learn("how many projects are there", ("count_projects", {"status": "open"}))
+    learn("how many projects are there", ("count_projects", {"status": "open"}))
+
+    assert replayed(match_intent("How many projects are there?")) == [("count_projects", {"status": "open"})]
+
+
+def test_failed_run_lowers_confidence():
+    learn("show me project 5", ("get_project", {"project_id": 5}))
+    learn("show me project 6", ("get_project", {"project_id": 6}))
+    assert has_intent("show me project 7")
+
+    learn("show me project 7", ("get_project", {"project_id": 7}), success=False)
+
+    intent = intent_router._intents["show me project {0}"]
+    assert (intent.agreements, intent.outcomes) == (2, 3)
+    assert not has_intent("show me project 7")
+
+
+def test_tool_error_lowers_confidence():
+    learn("show me project 5", ("get_project", {"project_id": 5}))
+    learn("show me project 6", ("get_project", {"project_id": 6}))
+
+    learn_intent("show me project 7", toolbox_run("show me project 7", ("get_project", {"project_id": 7}), status="error"), True)
+
+    assert intent_router._intents["show me project {0}"].outcomes == 3
+    assert match_intent("show me project 7") is None
+
+
+def test_several_rounds_lower_confidence_and_are_not_learned():
+    learn("show me project 5", ("get_project", {"project_id": 5}))
+    messages = toolbox_run("show me project 6", ("get_project", {"project_id": 6})) + toolbox_run("", ("count_projects", {}))[1:]
+
+    learn_intent("show me project 6", messages, True)
+
+    assert list(intent_router._intents) == ["show me project {0}"]
+    assert intent_router._intents["show me project {0}"].outcomes == 2
+
+
+def test_different_tool_calls_start_over():
+    learn("show me project 5", ("get_project", {"project_id": 5}))
+    learn("show me project 6", ("get_project", {"project_id": 6}))
+
+    learn("show me project 7", ("query_projects", {"project_id": 7}))
+
+    intent = intent_router._intents["show me project {0}"]
+    assert intent.tool_calls == [{"name": "query_projects", "args": {"project_id": intent_router.Slot(0, int)}}]
+    assert (intent.agreements, intent.outcomes) == (1, 1)
+    assert match_intent("show me project 8") is None
+
+
+def test_rejects_partial_matches():
+    learn("show me project 5", ("get_project", {"project_id": 5}))
+    learn("show me project 6", ("get_project", {"project_id": 6}))
+
+    assert match_intent("show me project") is None
+    assert match_intent("then show me project 5") is None
+    # the slot would take "5 and 6", which isn't an int
+    assert match_intent("show me project 5 and 6") is None
+
+
+def test_value_inside_a_word_is_not_a_slot():
+    # 5 is part of "15", not a word of its own, so the request is learned as is
+    learn("show me project 15", ("get_project", {"project_id": 5}))
+    learn("show me project 15", ("get_project", {"project_id": 5}))
+
+    assert list(intent_router._intents) == ["show me project 15"]
+    assert match_intent("show me project 16") is None
+
+
+def test_pattern_of_only_slots_is_not_learned():
+    learn("5", ("get_project", {"project_id": 5}))
+
+    assert not intent_router._intents
+
+
+def test_most_specific_pattern_wins():
+    learn("show project 5", ("get_project", {"project_id": 5}))
+    learn("show project 6", ("get_project", {"project_id": 6}))
+    learn("show billing", ("query_projects", {"project_name": "billing"}))
+    learn("show payments", ("query_projects", {"project_name": "payments"}))
+
+    # both "show project {0}" and "show {0}" match, the one with more literal words is used
+    assert replayed(match_intent("show project 9")) == [("get_project", {"project_id": 9})]
+    assert replayed(match_intent("show invoices")) == [("query_projects", {"project_name": "invoices"})]
+
+
+def test_long_requests_are_not_learned():
+    words = " ".join(["word"] * intent_router.INTENT_ROUTER_MAX_TOKENS)
+
+    learn(f"{words} 5", ("get_project", {"project_id": 5}))
+
+    assert not intent_router._intents
+
+
+def test_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(intent_router, "INTENT_ROUTER_CACHE_SIZE", 2)
+    learn("show me project 5", ("get_project", {"project_id": 5}))
+    learn("delete project 5", ("delete_projects", {"project_ids": [5]}))
+    learn("show me project 6", ("get_project", {"project_id": 6}))
+
+    learn("count projects", ("count_projects", {}))
+
+    assert list(intent_router._intents) == ["show me project {0}", "count projects"]
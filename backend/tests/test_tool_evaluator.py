@@ -0,0 +1,83 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from backend.helpers.tool_evaluator import REMAINING_STEPS_FEEDBACK, evaluate_tool_messages
+
+
+TOOL_NAMES = ["get_project", "query_projects", "count_projects", "count", "get_current_date_time"]
+
+
+def tool_round(*results: tuple) -> list:
+    # an AIMessage with its tool calls and their ToolMessages, results are (name, content) or (name, content, status)
+    calls = [{"name": result[0], "args": {}, "id": f"call_{index}"} for index, result in enumerate(results)]
+    return [
+        AIMessage(content="", tool_calls=calls),
+        *(ToolMessage(content=result[1], name=result[0], tool_call_id=call["id"], status=result[2] if len(result) > 2 else "success") for call, result in zip(calls, results)),
+    ]
+
+
+def evaluate(*results: tuple, plan: str = "", history: list = None):
+    messages = [HumanMessage(content="question"), *(history or []), *tool_round(*results)]
+    return evaluate_tool_messages(messages, plan, TOOL_NAMES)
+
+
+def test_data_from_every_call_exits_with_success():
+    evaluation = evaluate(
+        ("get_project", "project_name='billing' project_description='invoices'"),
+        ("query_projects", '{"rows": [{"id": 1}], "next_cursor": null}'),
+        ("count_projects", "3"),
+        ("get_current_date_time", "2026-10-18 12:00:00"),
+    )
+
+    assert (evaluation.exit, evaluation.success) == (True, True)
+
+
+def test_model_lists_are_data():
+    evaluation = evaluate(("query_projects", "[ProjectResponse(project_name='a', project_description='b')]"))
+
+    assert (evaluation.exit, evaluation.success) == (True, True)
+
+
+def test_empty_results_exit_without_success():
+    evaluation = evaluate(("query_projects", "[]"), ("get_project", "null"), ("count_projects", '{"rows": [], "next_cursor": null}'))
+
+    assert (evaluation.exit, evaluation.success) == (True, False)
+
+
+def test_sends_back_tools_the_plan_still_calls():
+    evaluation = evaluate(("get_project", "project_name='a'"), plan="1. get_project for the id\n2. count_projects for the total")
+
+    assert not evaluation.exit
+    assert evaluation.response.startswith(f"{REMAINING_STEPS_FEEDBACK} count_projects.")
+
+
+def test_tools_called_in_earlier_rounds_are_done():
+    history = tool_round(("get_project", "project_name='a'"))
+
+    evaluation = evaluate(("count_projects", "2"), plan="get_project, then count_projects", history=history)
+
+    assert (evaluation.exit, evaluation.success) == (True, True)
+
+
+def test_plain_words_are_not_tool_names():
+    # "count" is only the tool when the plan calls it
+    assert evaluate(("get_project", "project_name='a'"), plan="get the project and count its logs").exit
+    assert not evaluate(("get_project", "project_name='a'"), plan="get the project, then use the count tool").exit
+    assert not evaluate(("get_project", "project_name='a'"), plan="then `count`").exit
+
+
+def test_remaining_steps_feedback_is_sent_once():
+    history = [HumanMessage(content=f"{REMAINING_STEPS_FEEDBACK} count_projects. Continue with the next step using the results above.")]
+
+    assert evaluate(("get_project", "project_name='a'"), plan="get_project then count_projects", history=history) is None
+
+
+def test_unclear_results_go_to_the_llm():
+    assert evaluate(("get_project", "No project id or uuid provided")) is None
+    assert evaluate(("get_project", "project_name='a'"), ("query_projects", "[]")) is None
+    assert evaluate(("query_projects", '{"total": 3}')) is None
+    assert evaluate(("query_projects", "{not json")) is None
+    assert evaluate(("get_project", "Error: boom\n Please fix your mistakes.", "error"), ("count_projects", "3")) is None
+
+
+def test_nothing_to_evaluate():
+    assert evaluate_tool_messages([HumanMessage(content="question"), AIMessage(content="hello")], "", TOOL_NAMES) is None
@@ -0,0 +1,122 @@
+from backend.helpers.traceback_parser import parse_python_traceback
+
+
+def test_parses_simple_traceback():
+    text = (
+        "Traceback (most recent call last):\n"
+        '  File "/app/main.py", line 10, in <module>\n'
+        "    run()\n"
+        '  File "/app/worker.py", line 42, in run\n'
+        "    raise ValueError(\"bad value\")\n"
+        "ValueError: bad value\n"
+    )
+
+    parsed = parse_python_traceback(text)
+
+    assert parsed.error_type == "ValueError"
+    assert parsed.error_message == "bad value"
+    assert (parsed.source, parsed.line_number) == ("/app/worker.py", 42)
+    assert parsed.traceback == text.rstrip()
+
+
+def test_uses_last_block_of_chained_exceptions():
+    text = (
+        "Traceback (most recent call last):\n"
+        '  File "/app/db.py", line 5, in load\n'
+        "    rows[0]\n"
+        "IndexError: list index out of range\n"
+        "\n"
+        "During handling of the above exception, another exception occurred:\n"
+        "\n"
+        "Traceback (most recent call last):\n"
+        '  File "/app/api.py", line 20, in get\n'
+        "    load()\n"
+        "app.errors.NotFound: no rows\n"
+    )
+
+    parsed = parse_python_traceback(text)
+
+    assert (parsed.error_type, parsed.error_message) == ("app.errors.NotFound", "no rows")
+    assert (parsed.source, parsed.line_number) == ("/app/api.py", 20)
+    assert parsed.traceback.startswith("Traceback (most recent call last):\n  File \"/app/api.py\"")
+
+
+def test_skips_library_frames():
+    text = (
+        "Traceback (most recent call last):\n"
+        '  File "/app/client.py", line 7, in fetch\n'
+        "    requests.get(url)\n"
+        '  File "/venv/lib/python3.12/site-packages/requests/api.py", line 73, in get\n'
+        "    return request(\"get\", url)\n"
+        '  File "/usr/lib/python3.12/socket.py", line 962, in getaddrinfo\n'
+        "    raise\n"
+        "socket.gaierror: [Errno -2] Name or service not known\n"
+    )
+
+    parsed = parse_python_traceback(text)
+
+    assert (parsed.source, parsed.line_number) == ("/app/client.py", 7)
+
+
+def test_falls_back_to_library_frame():
+    text = (
+        "Traceback (most recent call last):\n"
+        '  File "<frozen runpy>", line 198, in _run_module_as_main\n'
+        '  File "/usr/lib/python3.12/json/decoder.py", line 355, in raw_decode\n'
+        "json.decoder.JSONDecodeError: Expecting value: line 1 column 1 (char 0)\n"
+    )
+
+    parsed = parse_python_traceback(text)
+
+    assert (parsed.source, parsed.line_number) == ("/usr/lib/python3.12/json/decoder.py", 355)
+    assert parsed.error_message == "Expecting value: line 1 column 1 (char 0)"
+
+
+def test_keeps_multi_line_message_and_drops_what_follows():
+    text = (
+        "Traceback (most recent call last):\n"
+        '  File "/app/check.py", line 3, in check\n'
+        "    assert ok\n"
+        "AssertionError: first line\n"
+        "second line\n"
+        "\n"
+        "INFO shutting down\n"
+    )
+
+    parsed = parse_python_traceback(text)
+
+    assert parsed.error_message == "first line\nsecond line"
+    assert not parsed.traceback.endswith("shutting down")
+
+
+def test_parses_syntax_error_frame_and_exception_without_message():
+    syntax_error = (
+        "Traceback (most recent call last):\n"
+        '  File "/app/config.py", line 4\n'
+        "    x = = 1\n"
+        "        ^\n"
+        "SyntaxError: invalid syntax\n"
+    )
+    interrupt = (
+        "Traceback (most recent call last):\n"
+        '  File "/app/loop.py", line 9, in main\n'
+        "    time.sleep(1)\n"
+        "KeyboardInterrupt\n"
+    )
+
+    parsed = parse_python_traceback(syntax_error)
+    assert (parsed.error_type, parsed.source, parsed.line_number) == ("SyntaxError", "/app/config.py", 4)
+    parsed = parse_python_traceback(interrupt)
+    assert (parsed.error_type, parsed.error_message) == ("KeyboardInterrupt", "")
+
+
+def test_returns_none_for_other_text():
+    assert parse_python_traceback("worker crashed running job 12") is None
+    assert parse_python_traceback("Traceback (most recent call last):\nValueError: no frames\n") is None
+    assert parse_python_traceback("Traceback (most recent call last):\n  File \"/app/a.py\", line 1, in f\n") is None
+    assert parse_python_traceback(
+        "  + Exception Group Traceback (most recent call last):\n"
+        "Traceback (most recent call last):\n"
+        '  File "/app/a.py", line 1, in f\n'
+        "ValueError: x\n"
+    ) is None